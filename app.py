@@ -1,205 +1,1642 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import (
+    Flask, render_template, request, redirect, url_for, flash, g, session, make_response, jsonify, abort,
+    stream_with_context, send_from_directory, has_app_context, has_request_context,
+)
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import is_resource_modified
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from collections import OrderedDict
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+from datetime import date, datetime, timedelta, timezone
+import ast
+import click
+import csv
+import gzip
+import hashlib
+import http.client
+import io
+import json
+import math
+import mimetypes
 import sqlite3
 import os
+import queue
+import re
+import socket
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 app = Flask(__name__)
 app.secret_key = "secretkey"
 
 
 # =========================
-# 📦 قاعدة البيانات
+# 🎨 القوالب
 # =========================
-DB_PATH = os.environ.get("DB_PATH") or os.path.join("database", "farm.db") if os.path.isdir("database") else "poultry.db"
+# compiled templates are kept on disk, so a fresh worker loads bytecode instead of recompiling;
+# entries are keyed by the template source, an edited template simply compiles again
+app.config["JINJA_CACHE_DIR"] = os.environ.get("JINJA_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "poultry-jinja")
+os.makedirs(app.config["JINJA_CACHE_DIR"], exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config["JINJA_CACHE_DIR"])
 
 
-def get_db():
-    # Ensure directory exists if using nested path
-    db_dir = os.path.dirname(DB_PATH)
-    if db_dir and not os.path.exists(db_dir):
-        os.makedirs(db_dir, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+def warm_templates():
+    names = app.jinja_env.list_templates(extensions=["html"])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+@app.cli.command("compile-templates")
+def compile_templates_command():
+    """Compile every template into the bytecode cache before the first request."""
+    click.echo(f"{warm_templates()} templates compiled into {app.config['JINJA_CACHE_DIR']}")
+
+
+# =========================
+# 🗂️ الملفات الثابتة والضغط
+# =========================
+# `flask build-static` writes content-hashed copies to static/dist; url_for('static', ...) then
+# points at them and they are served as immutable, precompressed when the client allows it
+STATIC_DIST = "dist"
+STATIC_COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map"}
+app.config.update(
+    GZIP_MIN_SIZE=int(os.environ.get("GZIP_MIN_SIZE", 500)),
+    GZIP_LEVEL=int(os.environ.get("GZIP_LEVEL", 6)),
+)
+_static_manifest = {}
+
+
+def static_manifest():
+    # loaded once per process; rerun build-static and restart after changing a static file
+    if "files" not in _static_manifest:
+        try:
+            with open(os.path.join(app.static_folder, STATIC_DIST, "manifest.json")) as fh:
+                _static_manifest["files"] = json.load(fh)
+        except (OSError, ValueError):
+            _static_manifest["files"] = {}
+    return _static_manifest["files"]
+
+
+def build_static():
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    out = os.path.join(app.static_folder, STATIC_DIST)
+    manifest = {}
+    for root, dirs, files in os.walk(app.static_folder):
+        if os.path.abspath(root) == os.path.abspath(app.static_folder):
+            dirs[:] = [d for d in dirs if d != STATIC_DIST]
+        for name in files:
+            rel = os.path.relpath(os.path.join(root, name), app.static_folder).replace(os.sep, "/")
+            with open(os.path.join(root, name), "rb") as fh:
+                data = fh.read()
+            stem, ext = os.path.splitext(rel)
+            hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+            target = os.path.join(out, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # older hashed files stay: pages cached before a deploy still point at them
+            with open(target, "wb") as fh:
+                fh.write(data)
+            if ext.lower() in STATIC_COMPRESSIBLE:
+                with open(target + ".gz", "wb") as fh:
+                    fh.write(gzip.compress(data, 9, mtime=0))
+                if brotli is not None:
+                    with open(target + ".br", "wb") as fh:
+                        fh.write(brotli.compress(data, quality=11))
+            manifest[rel] = f"{STATIC_DIST}/{hashed}"
+    with open(os.path.join(out, "manifest.json"), "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    _static_manifest.clear()
+    return manifest, brotli is not None
+
+
+@app.cli.command("build-static")
+def build_static_command():
+    """Fingerprint static files into static/dist and precompress them (.gz, and .br with brotli)."""
+    manifest, with_brotli = build_static()
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f"{name} -> {hashed}")
+    if not with_brotli:
+        click.echo("brotli is not installed, only .gz files were written")
+
+
+@app.url_defaults
+def hashed_static_url(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        values["filename"] = static_manifest().get(values["filename"], values["filename"])
+
+
+def serve_static(filename):
+    if not filename.startswith(STATIC_DIST + "/"):
+        return app.send_static_file(filename)
+    # the name changes with the content, so the browser never needs to ask again
+    mimetype = mimetypes.guess_type(filename)[0]
+    encoding = None
+    for coding, ext in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[coding] and os.path.isfile(os.path.join(app.static_folder, filename + ext)):
+            encoding, filename = coding, filename + ext
+            break
+    response = send_from_directory(app.static_folder, filename, mimetype=mimetype, max_age=365 * 24 * 3600)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+app.view_functions["static"] = serve_static
+
+
+@app.after_request
+def gzip_response(response):
+    if response.mimetype not in ("text/html", "application/json"):
+        return response
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or not request.accept_encodings["gzip"]
+    ):
+        return response
+    data = response.get_data()
+    if len(data) < app.config["GZIP_MIN_SIZE"]:
+        return response
+    response.set_data(gzip.compress(data, app.config["GZIP_LEVEL"]))
+    response.headers["Content-Encoding"] = "gzip"
+    # the bytes differ per encoding; a weak tag still matches If-None-Match for 304s
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# =========================
+# 📦 قاعدة البيانات
+# =========================
+DB_PATH = os.environ.get("DB_PATH") or (os.path.join("database", "farm.db") if os.path.isdir("database") else "poultry.db")
+
+app.config.update(
+    DB_PATH=DB_PATH,
+    # idle connections kept warm per worker process
+    DB_POOL_SIZE=int(os.environ.get("DB_POOL_SIZE", 8)),
+    # negative cache_size is in KiB (sqlite convention)
+    SQLITE_CACHE_SIZE=int(os.environ.get("SQLITE_CACHE_SIZE", -16000)),
+    SQLITE_MMAP_SIZE=int(os.environ.get("SQLITE_MMAP_SIZE", 64 * 1024 * 1024)),
+    SQLITE_BUSY_TIMEOUT=int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000)),
+    # cold storage for completed batches; defaults to <db name>.archive.db next to the database
+    ARCHIVE_PATH=os.environ.get("ARCHIVE_PATH"),
+    ARCHIVE_AFTER_DAYS=int(os.environ.get("ARCHIVE_AFTER_DAYS", 30)),
+    # multi-farm mode: one database per farm in this directory, see the farms section
+    FARMS_DIR=os.environ.get("FARMS_DIR"),
+    # warm pools kept across farms; the least recently used farm's connections are closed first
+    DB_MAX_TENANTS=int(os.environ.get("DB_MAX_TENANTS", 32)),
+)
+
+
+def archive_path(path):
+    # a single ARCHIVE_PATH cannot be shared by several farms
+    if app.config["ARCHIVE_PATH"] and not app.config["FARMS_DIR"]:
+        return app.config["ARCHIVE_PATH"]
+    return os.path.splitext(path)[0] + ".archive.db"
+
+
+def current_db_path():
+    # the farm picked for this request, otherwise the single DB_PATH
+    if has_app_context() and g.get("db_path"):
+        return g.db_path
+    return app.config["DB_PATH"]
+
+
+def connect_db(path=None):
+    path = path or app.config["DB_PATH"]
+    factory = TimedConnection if app.config["METRICS_ENABLED"] else sqlite3.Connection
+    conn = sqlite3.connect(path, check_same_thread=False, factory=factory)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA cache_size=%d" % int(app.config["SQLITE_CACHE_SIZE"]))
+    conn.execute("PRAGMA mmap_size=%d" % int(app.config["SQLITE_MMAP_SIZE"]))
+    conn.execute("PRAGMA busy_timeout=%d" % int(app.config["SQLITE_BUSY_TIMEOUT"]))
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path(path),))
+    conn.execute("PRAGMA archive.journal_mode=WAL")
     return conn
 
 
-def init_db():
-    conn = get_db()
-    c = conn.cursor()
+class ConnectionPool:
+    def __init__(self, path, size, connect=None):
+        self.path = path
+        self.size = size
+        self._connect = connect or connect_db
+        # Ensure directory exists if using nested path (checked once, not per request)
+        db_dir = os.path.dirname(path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # sqlite connections must not cross a fork; a child starts with an empty pool
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=self.size)
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect(self.path)
 
-    # جدول الدفعات
-    c.execute('''CREATE TABLE IF NOT EXISTS batches (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        breed TEXT NOT NULL,
-        start_date TEXT NOT NULL,
-        initial_count INTEGER NOT NULL,
-        chick_price REAL DEFAULT 0
-    )''')
+    def release(self, conn):
+        if self._pid != os.getpid():
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# path -> pool, least recently used first
+_pools = OrderedDict()
+_pools_lock = threading.Lock()
+# databases whose schema this process has already created or checked
+_initialized = set()
+# path -> lock held while that database's pool is opened and its schema checked
+_open_locks = {}
+
+
+def get_pool(path=None):
+    path = path or current_db_path()
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is not None:
+            _pools.move_to_end(path)
+            return pool
+        open_lock = _open_locks.setdefault(path, threading.Lock())
+    # a migration can take a while; it holds up requests for its own database, not for the others
+    with open_lock:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is not None:
+                _pools.move_to_end(path)
+                return pool
+        pool = ConnectionPool(path, app.config["DB_POOL_SIZE"])
+        if path not in _initialized:
+            # the schema check runs on the pool's first connection, which then stays warm
+            conn = pool.acquire()
+            try:
+                migrate(conn)
+            finally:
+                pool.release(conn)
+            _initialized.add(path)
+        with _pools_lock:
+            _pools[path] = pool
+            while len(_pools) > app.config["DB_MAX_TENANTS"]:
+                # connections still checked out go back to the evicted pool and close with it
+                _pools.popitem(last=False)[1].close_all()
+    return pool
 
-    # ensure new columns exist for backward compatibility
-    c.execute("PRAGMA table_info(batches)")
-    cols = [row[1] for row in c.fetchall()]
-    if 'is_completed' not in cols:
+
+def get_db():
+    # one pooled connection per app context, returned in release_db()
+    if "db" not in g:
+        g.db_pool = snapshot_pool() or get_pool()
+        g.db = g.db_pool.acquire()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop("db", None)
+    if conn is not None:
+        g.pop("db_pool").release(conn)
+
+
+# =========================
+# 🏘️ المزارع
+# =========================
+# with FARMS_DIR set every farm is its own database, <FARMS_DIR>/<farm>.db, picked per request from
+# <farm>.<FARM_DOMAIN> or from a /f/<farm>/ prefix; nothing is shared between farms but the process.
+# CLI commands still work on one database: DB_PATH=<FARMS_DIR>/<farm>.db flask ...
+FARM_PREFIX = "/f"
+FARM_NAME = re.compile(r"[a-z0-9][a-z0-9_-]{0,63}")
+# process-wide endpoints, answered without a farm
+FARMLESS_ENDPOINTS = {"static", "metrics"}
+
+app.config.update(
+    FARM_DOMAIN=(os.environ.get("FARM_DOMAIN") or "").lower() or None,
+    # farm served on / and on hosts without a farm subdomain; unset lists the farms there
+    DEFAULT_FARM=os.environ.get("DEFAULT_FARM"),
+)
+
+
+def farm_path(name):
+    return os.path.join(app.config["FARMS_DIR"], name + ".db")
+
+
+def list_farms():
+    if not os.path.isdir(app.config["FARMS_DIR"]):
+        return []
+    names = (os.path.splitext(n) for n in os.listdir(app.config["FARMS_DIR"]))
+    return sorted(stem for stem, ext in names if ext == ".db" and FARM_NAME.fullmatch(stem))
+
+
+class FarmDispatcher:
+    # the /f/<farm> prefix moves into SCRIPT_NAME, so routes stay as they are and url_for keeps the prefix
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        farm = None
+        if app.config["FARMS_DIR"]:
+            domain = app.config["FARM_DOMAIN"]
+            host = environ.get("HTTP_HOST", "").rsplit(":", 1)[0].lower()
+            path = environ.get("PATH_INFO", "")
+            if domain and host.endswith("." + domain):
+                farm = host[: -len(domain) - 1]
+            elif path.startswith(FARM_PREFIX + "/"):
+                farm, _, rest = path[len(FARM_PREFIX) + 1:].partition("/")
+                environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + f"{FARM_PREFIX}/{farm}"
+                environ["PATH_INFO"] = "/" + rest
+        environ["poultry.farm"] = farm
+        return self.wsgi_app(environ, start_response)
+
+
+app.wsgi_app = FarmDispatcher(app.wsgi_app)
+
+
+@app.before_request
+def select_farm():
+    if not app.config["FARMS_DIR"] or request.endpoint in FARMLESS_ENDPOINTS:
+        return None
+    farm = request.environ.get("poultry.farm") or app.config["DEFAULT_FARM"]
+    if not farm:
+        if request.path == "/":
+            return render_template("farms.html", farms=list_farms(), prefix=FARM_PREFIX)
+        abort(404)
+    # farms are created with `flask create-farm`, a typo in the URL must not make a new database
+    if not FARM_NAME.fullmatch(farm) or not os.path.isfile(farm_path(farm)):
+        abort(404)
+    g.farm = farm
+    g.db_path = farm_path(farm)
+    return None
+
+
+@app.cli.command("create-farm")
+@click.argument("name")
+def create_farm_command(name):
+    """Create an empty database for a farm under FARMS_DIR."""
+    if not app.config["FARMS_DIR"]:
+        raise click.UsageError("FARMS_DIR is not set")
+    if not FARM_NAME.fullmatch(name):
+        raise click.BadParameter("lowercase letters, digits, - and _ only", param_hint="NAME")
+    os.makedirs(app.config["FARMS_DIR"], exist_ok=True)
+    init_db(farm_path(name))
+    click.echo(f"{name}: {farm_path(name)}")
+
+
+def database_paths():
+    # every database this process serves: one per farm, or the single DB_PATH
+    if app.config["FARMS_DIR"]:
+        return [farm_path(farm) for farm in list_farms()]
+    return [app.config["DB_PATH"]]
+
+
+# =========================
+# ✍️ كاتب واحد
+# =========================
+# serve.py runs one writer process on a unix socket and sets WRITER_SOCKET in the reader
+# workers; they hand every writing request to it unchanged, so two processes never race
+# for the write lock. Without WRITER_SOCKET each process writes itself.
+app.config.update(
+    WRITER_SOCKET=os.environ.get("WRITER_SOCKET"),
+    WRITER_TIMEOUT=float(os.environ.get("WRITER_TIMEOUT", 60)),
+)
+
+# GET routes that write; every other write comes as POST, PUT or DELETE
+WRITE_GET_ENDPOINTS = ("delete_", "archive_batch_view", "restore_batch_view")
+# POSTs that only compute
+READ_ONLY_POSTS = {"report"}
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "proxy-connection"}
+
+
+def is_write_request():
+    if request.endpoint is None:
+        return False
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        return request.endpoint.startswith(WRITE_GET_ENDPOINTS)
+    return request.endpoint not in READ_ONLY_POSTS
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+@app.before_request
+def forward_writes():
+    if not app.config["WRITER_SOCKET"] or not is_write_request():
+        return None
+    uri = request.script_root + request.path
+    if request.query_string:
+        uri += "?" + request.query_string.decode("latin-1")
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+    conn = UnixHTTPConnection(app.config["WRITER_SOCKET"], app.config["WRITER_TIMEOUT"])
+    try:
+        # the body is passed through as a stream, an upload is never held in memory here
+        body = request.stream if request.content_length or "Transfer-Encoding" in request.headers else None
+        conn.request(request.method, uri, body=body, headers=headers)
+        upstream = conn.getresponse()
+        body = upstream.read()
+    except OSError:
+        app.logger.exception("writer at %s did not answer", app.config["WRITER_SOCKET"])
+        abort(503)
+    finally:
+        conn.close()
+    headers = [(k, v) for k, v in upstream.getheaders() if k.lower() not in HOP_HEADERS]
+    return app.response_class(body, status=upstream.status, headers=headers)
+
+
+# =========================
+# ⏱️ قياس الأداء
+# =========================
+app.config.update(
+    METRICS_ENABLED=os.environ.get("METRICS_ENABLED", "1") != "0",
+    # log requests slower than this many milliseconds; 0 keeps the log off
+    SLOW_REQUEST_MS=float(os.environ.get("SLOW_REQUEST_MS", 0)),
+    METRICS_TOP_STATEMENTS=int(os.environ.get("METRICS_TOP_STATEMENTS", 20)),
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_MAX_STATEMENTS = 500
+
+# per-thread stats of the request being served; None outside requests (CLI, init_db)
+_request_sql = threading.local()
+_metrics_lock = threading.Lock()
+# (endpoint, method, status) -> counters and latency buckets
+_endpoint_metrics = {}
+# normalized sql -> [calls, seconds, max seconds within one request]
+_statement_metrics = {}
+
+
+def _record_sql(sql, elapsed, executed):
+    stats = getattr(_request_sql, "stats", None)
+    if stats is None:
+        return
+    stats["statements"] += executed
+    stats["seconds"] += elapsed
+    s = stats["by_sql"].get(sql)
+    if s is None:
+        s = stats["by_sql"][sql] = [0, 0.0]
+    s[0] += executed
+    s[1] += elapsed
+
+
+class TimedCursor(sqlite3.Cursor):
+    # execute and fetch calls are timed; row-by-row iteration is left alone to stay cheap
+    def execute(self, sql, parameters=()):
+        self.sql = sql
+        started = time.perf_counter()
         try:
-            c.execute("ALTER TABLE batches ADD COLUMN is_completed INTEGER DEFAULT 0")
-        except Exception:
-            pass
-    if 'end_date' not in cols:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(sql, time.perf_counter() - started, 1)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.sql = sql
+        started = time.perf_counter()
         try:
-            c.execute("ALTER TABLE batches ADD COLUMN end_date TEXT DEFAULT NULL")
-        except Exception:
-            pass
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_sql(sql, time.perf_counter() - started, 1)
 
-    # جدول العلف
-    c.execute('''CREATE TABLE IF NOT EXISTS feed (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        batch_id INTEGER,
-        date TEXT,
-        feed_type TEXT,
-        quantity REAL,
-        price REAL,
-        FOREIGN KEY(batch_id) REFERENCES batches(id)
-    )''')
+    def _timed_fetch(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            _record_sql(getattr(self, "sql", ""), time.perf_counter() - started, 0)
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(super().fetchmany, size or self.arraysize)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # the C implementations of these bypass cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+@app.before_request
+def start_request_metrics():
+    if app.config["METRICS_ENABLED"]:
+        _request_sql.stats = {"started": time.perf_counter(), "statements": 0, "seconds": 0.0, "by_sql": {}}
+
+
+@app.after_request
+def note_response_status(response):
+    stats = getattr(_request_sql, "stats", None)
+    if stats is not None:
+        stats["status"] = response.status_code
+    return response
+
+
+# teardown runs after a stream_with_context body is sent, so exports are timed in full
+@app.teardown_request
+def finish_request_metrics(exc):
+    stats = getattr(_request_sql, "stats", None)
+    if stats is None:
+        return
+    _request_sql.stats = None
+    elapsed = time.perf_counter() - stats["started"]
+    key = (request.endpoint or "unmatched", request.method, stats.get("status", 500))
+    by_sql = {" ".join(sql.split()): v for sql, v in stats["by_sql"].items()}
+
+    with _metrics_lock:
+        m = _endpoint_metrics.get(key)
+        if m is None:
+            m = _endpoint_metrics[key] = {
+                "count": 0, "seconds": 0.0, "statements": 0, "max_statements": 0, "sql_seconds": 0.0,
+                "buckets": [0] * len(LATENCY_BUCKETS),
+            }
+        m["count"] += 1
+        m["seconds"] += elapsed
+        m["statements"] += stats["statements"]
+        m["max_statements"] = max(m["max_statements"], stats["statements"])
+        m["sql_seconds"] += stats["seconds"]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                m["buckets"][i] += 1
+        for sql, (calls, seconds) in by_sql.items():
+            s = _statement_metrics.get(sql)
+            if s is None:
+                if len(_statement_metrics) >= METRICS_MAX_STATEMENTS:
+                    continue
+                s = _statement_metrics[sql] = [0, 0.0, 0.0]
+            s[0] += calls
+            s[1] += seconds
+            s[2] = max(s[2], seconds)
+
+    threshold = app.config["SLOW_REQUEST_MS"]
+    if threshold and elapsed * 1000 >= threshold:
+        slowest = max(by_sql.items(), key=lambda kv: kv[1][1], default=None)
+        app.logger.warning(
+            "slow request: %s %s took %.1f ms, %d statements, %.1f ms in sqlite%s",
+            request.method, request.full_path.rstrip("?"), elapsed * 1000, stats["statements"], stats["seconds"] * 1000,
+            "; slowest %.1f ms x%d: %s" % (slowest[1][1] * 1000, slowest[1][0], slowest[0][:300]) if slowest else "",
+        )
 
-    # جدول الأدوية
-    c.execute('''CREATE TABLE IF NOT EXISTS medications (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        batch_id INTEGER,
-        date TEXT,
-        name TEXT,
-        purpose TEXT,
-        price REAL,
-        FOREIGN KEY(batch_id) REFERENCES batches(id)
-    )''')
 
-    # جدول المصروفات الإضافية
-    c.execute('''CREATE TABLE IF NOT EXISTS extra_expenses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        batch_id INTEGER,
-        date TEXT,
-        name TEXT,
-        price REAL,
-        FOREIGN KEY(batch_id) REFERENCES batches(id)
-    )''')
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics():
+    with _metrics_lock:
+        endpoints = sorted((k, dict(v, buckets=list(v["buckets"]))) for k, v in _endpoint_metrics.items())
+        statements = sorted(_statement_metrics.items(), key=lambda kv: kv[1][1], reverse=True)
+    statements = statements[: app.config["METRICS_TOP_STATEMENTS"]]
+
+    out = []
+
+    def family(name, kind, help_text, samples):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(samples)
+
+    def labels(endpoint, method, status):
+        return f'endpoint="{_label(endpoint)}",method="{method}",status="{status}"'
+
+    family("poultry_http_requests_total", "counter", "Requests served, by endpoint, method and status.", [
+        f"poultry_http_requests_total{{{labels(*k)}}} {m['count']}" for k, m in endpoints
+    ])
+    samples = []
+    for k, m in endpoints:
+        for bound, n in zip(LATENCY_BUCKETS, m["buckets"]):
+            samples.append(f'poultry_http_request_duration_seconds_bucket{{{labels(*k)},le="{bound}"}} {n}')
+        samples.append(f'poultry_http_request_duration_seconds_bucket{{{labels(*k)},le="+Inf"}} {m["count"]}')
+        samples.append(f"poultry_http_request_duration_seconds_sum{{{labels(*k)}}} {m['seconds']:.6f}")
+        samples.append(f"poultry_http_request_duration_seconds_count{{{labels(*k)}}} {m['count']}")
+    family("poultry_http_request_duration_seconds", "histogram", "Wall time per request, body included.", samples)
+    family("poultry_sql_statements_total", "counter", "SQL statements executed while serving requests.", [
+        f"poultry_sql_statements_total{{{labels(*k)}}} {m['statements']}" for k, m in endpoints
+    ])
+    family("poultry_sql_statements_max", "gauge", "Most SQL statements seen in a single request.", [
+        f"poultry_sql_statements_max{{{labels(*k)}}} {m['max_statements']}" for k, m in endpoints
+    ])
+    family("poultry_sql_seconds_total", "counter", "Time spent in sqlite execute and fetch calls.", [
+        f"poultry_sql_seconds_total{{{labels(*k)}}} {m['sql_seconds']:.6f}" for k, m in endpoints
+    ])
+    family("poultry_sql_statement_calls_total", "counter", "Executions of the statements with the most total time.", [
+        f'poultry_sql_statement_calls_total{{statement="{_label(sql)}"}} {s[0]}' for sql, s in statements
+    ])
+    family("poultry_sql_statement_seconds_total", "counter", "Total time of the statements with the most total time.", [
+        f'poultry_sql_statement_seconds_total{{statement="{_label(sql)}"}} {s[1]:.6f}' for sql, s in statements
+    ])
+    family("poultry_sql_statement_request_seconds_max", "gauge", "Longest time one request spent in the statement.", [
+        f'poultry_sql_statement_request_seconds_max{{statement="{_label(sql)}"}} {s[2]:.6f}' for sql, s in statements
+    ])
+    return "\n".join(out) + "\n"
+
+
+@app.route("/metrics")
+def metrics():
+    if not app.config["METRICS_ENABLED"]:
+        abort(404)
+    return app.response_class(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+LEDGER_TABLES = ("feed", "medications", "extra_expenses", "mortality", "sales")
+
+# queries built at import time from table names; `flask check-plans` checks
+# these alongside the literal ones it finds in this file and the trigger bodies
+PLAN_QUERIES = []
+# query -> why it reads a whole table (or sorts without an index) on purpose. Anything else
+# that does fails `flask check-plans` and tests/test_query_plans.py, which also fails an entry
+# that no longer scans.
+PLAN_SCAN_ALLOWED = {}
+
+
+def plan_query(sql):
+    # register a query kept in a constant so check-plans knows about it
+    sql = " ".join(sql.split())
+    PLAN_QUERIES.append(sql)
+    return sql
+
+
+def full_scan_query(sql, reason):
+    # a query that reads every row on purpose; the reason is reviewed along with it
+    sql = plan_query(sql)
+    PLAN_SCAN_ALLOWED[sql] = reason
+    return sql
+
+
+# schema -> does a table exist
+TABLE_EXISTS = {
+    schema: full_scan_query(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?",
+        "sqlite_master has no index; it holds one row per table, index and trigger",
+    )
+    for schema in ("main", "archive")
+}
 
-    # جدول النافق اليومي
-    c.execute('''CREATE TABLE IF NOT EXISTS mortality (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        batch_id INTEGER,
-        date TEXT,
-        count INTEGER,
-        note TEXT,
-        FOREIGN KEY(batch_id) REFERENCES batches(id)
-    )''')
 
-    # جدول المبيعات الفعلية
-    c.execute('''CREATE TABLE IF NOT EXISTS sales (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        batch_id INTEGER,
-        date TEXT,
-        quantity INTEGER,
-        average_weight_kg REAL,
-        price_per_kg REAL,
-        total_weight_kg REAL,
-        total_price REAL,
-        note TEXT,
-        FOREIGN KEY(batch_id) REFERENCES batches(id)
-    )''')
+def table_exists(c, name, schema="main"):
+    return c.execute(TABLE_EXISTS[schema], (name,)).fetchone() is not None
 
-    conn.commit()
+
+# =========================
+# 🧱 ترحيل المخطط
+# =========================
+# PRAGMA user_version is the number of steps a database has run. A step runs once, in the
+# transaction that records its number, so a worker starting on a current database only reads
+# the version (of main and of the archive). Steps are written with IF NOT EXISTS and column
+# checks because databases from before the versions start at 0 with some of the tables already
+# there. Each step's SQL is frozen in migrations/NNNN_<step>.sql as it shipped, so editing a
+# trigger helper below never rewrites an old step; a schema change is a new step at the end,
+# its file written from the helpers' output (tests/test_migrations.py checks that they agree).
+MIGRATIONS = []
+MIGRATIONS_DIR = os.path.join(app.root_path, "migrations")
+
+
+def migration(fn):
+    MIGRATIONS.append(fn)
+    return fn
+
+
+def run_migration_sql(c, step):
+    number = [fn.__name__ for fn in MIGRATIONS].index(step) + 1
+    statement = ""
+    with open(os.path.join(MIGRATIONS_DIR, f"{number:04d}_{step}.sql"), encoding="utf-8") as fh:
+        for line in fh:
+            statement += line
+            if sqlite3.complete_statement(statement):
+                c.execute(statement)
+                statement = ""
+
+
+@migration
+def create_ledgers(c):
+    # الدفعات والعلف والأدوية والمصروفات والنافق والمبيعات، مع فهارس (batch_id, date, id)
+    run_migration_sql(c, "create_ledgers")
+    # columns added after the first release
+    cols = [row[1] for row in c.execute("PRAGMA table_info(batches)")]
+    if 'is_completed' not in cols:
+        c.execute("ALTER TABLE batches ADD COLUMN is_completed INTEGER DEFAULT 0")
+    if 'end_date' not in cols:
+        c.execute("ALTER TABLE batches ADD COLUMN end_date TEXT DEFAULT NULL")
+
+
+@migration
+def create_batch_totals(c):
+    # جدول الإجماليات المجمعة لكل دفعة (تحدثه الـ triggers)
+    run_migration_sql(c, "create_batch_totals")
+
+
+@migration
+def create_growth(c):
+    # جدول متابعة النمو (عينات الوزن) مع القيم المشتقة التي تحدثها الـ triggers
+    run_migration_sql(c, "create_growth")
+
+
+@migration
+def create_table_versions(c):
+    # عداد التعديلات لكل جدول (يستخدم لإبطال الكاش)
+    run_migration_sql(c, "create_table_versions")
+
+
+@migration
+def create_jobs(c):
+    # المهام الخلفية (حذف دفعة، استيراد ملف، إعادة حساب)
+    run_migration_sql(c, "create_jobs")
+
+
+@migration
+def create_changes(c):
+    # سجل التغييرات للمزامنة (يكتبه trigger لكل إضافة وتعديل وحذف)
+    run_migration_sql(c, "create_changes")
+
+
+@migration
+def create_search_index(c):
+    # فهرس البحث النصي (FTS5) على الأسماء والملاحظات
+    run_migration_sql(c, "create_search_index")
+
+
+@migration
+def create_period_totals(c):
+    # إجماليات يومية لكل دفعة (تحدثها الـ triggers) لتقارير الفترات
+    run_migration_sql(c, "create_period_totals")
+
+
+@migration
+def create_forecasts(c):
+    # نموذج النمو والعلف لكل دفعة نشطة (تحدثه الـ triggers) لتوقعات لوحة التحكم
+    run_migration_sql(c, "create_forecasts")
+
+
+@migration
+def queue_forecast_refits(c):
+    # the forecast triggers queue a batch instead of refitting it for every written row, and the
+    # dashboard cache follows forecasts; fits from before this step may hold a last_date that does not parse
+    run_migration_sql(c, "queue_forecast_refits")
+
+
+@migration
+def quiet_archive_moves(c):
+    # a batch moving to or from the archive is not deleted; its rows stay out of the change log
+    run_migration_sql(c, "quiet_archive_moves")
+
+
+@migration
+def keep_search_text(c):
+    # the index matches folded text and keeps the text as written for the results
+    run_migration_sql(c, "keep_search_text")
+
+
+def migrate_archive(c):
+    # الأرشيف: نفس الجداول في ملف منفصل، تتبع نسخة main
+    had_period = table_exists(c, "period_totals", "archive")
+    init_archive(c)
+    if not had_period:
+        rebuild_period_totals(c, "archive")
+
+
+def migrate(conn):
+    target = len(MIGRATIONS)
+    # the archive is its own file, which can be swapped or made anew under a current main
+    if conn.execute("PRAGMA user_version").fetchone()[0] == conn.execute("PRAGMA archive.user_version").fetchone()[0] == target:
+        return 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # another process may have migrated while this one waited for the lock
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > target:
+            raise RuntimeError(f"database schema version {version} is newer than this code ({target})")
+        c = conn.cursor()
+        for step in MIGRATIONS[version:]:
+            step(c)
+        conn.execute(f"PRAGMA user_version = {target}")
+        if conn.execute("PRAGMA archive.user_version").fetchone()[0] != target:
+            migrate_archive(c)
+            conn.execute(f"PRAGMA archive.user_version = {target}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return target - version
+
+
+def init_db(path=None):
+    conn = connect_db(path)
+    try:
+        applied = migrate(conn)
+    finally:
+        conn.close()
+    _initialized.add(path or app.config["DB_PATH"])
+    return applied
+
+
+@app.cli.command("migrate")
+def migrate_command():
+    """Bring the database schema to the latest version."""
+    applied = init_db()
+    click.echo(f"schema at version {len(MIGRATIONS)}, {applied} steps applied")
+
+
+# =========================
+# 📈 إجماليات الدفعات
+# =========================
+# ledger table -> ((batch_totals column, ledger column), ...)
+ROLLUP_COLUMNS = {
+    "feed": (("feed_cost", "price"),),
+    "medications": (("med_cost", "price"),),
+    "extra_expenses": (("extra_cost", "price"),),
+    "mortality": (("mortality_count", "count"),),
+    "sales": (("sold_qty", "quantity"), ("sold_weight", "total_weight_kg"), ("sales_revenue", "total_price")),
+}
+
+
+def create_totals_triggers(c):
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_batches_totals_ins AFTER INSERT ON batches BEGIN
+        INSERT OR IGNORE INTO batch_totals (batch_id) VALUES (NEW.id);
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_batches_totals_del AFTER DELETE ON batches BEGIN
+        DELETE FROM batch_totals WHERE batch_id = OLD.id;
+    END''')
+    for table, columns in ROLLUP_COLUMNS.items():
+        add = ", ".join(f"{tc} = {tc} + COALESCE(NEW.{lc}, 0)" for tc, lc in columns)
+        sub = ", ".join(f"{tc} = {tc} - COALESCE(OLD.{lc}, 0)" for tc, lc in columns)
+        watched = ", ".join(["batch_id"] + [lc for _, lc in columns])
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_totals_ins AFTER INSERT ON {table} BEGIN
+            UPDATE batch_totals SET {add} WHERE batch_id = NEW.batch_id;
+        END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_totals_del AFTER DELETE ON {table} BEGIN
+            UPDATE batch_totals SET {sub} WHERE batch_id = OLD.batch_id;
+        END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_totals_upd AFTER UPDATE OF {watched} ON {table} BEGIN
+            UPDATE batch_totals SET {sub} WHERE batch_id = OLD.batch_id;
+            UPDATE batch_totals SET {add} WHERE batch_id = NEW.batch_id;
+        END''')
+
+
+def create_version_triggers(c, tables=("batches",) + LEDGER_TABLES + ("growth",)):
+    for table in tables:
+        c.execute("INSERT OR IGNORE INTO table_versions (name, changed_at) VALUES (?, strftime('%s','now'))", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event[:3].lower()} AFTER {event} ON {table} BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = '{table}';
+            END''')
+
+
+TABLE_VERSIONS_SQL = full_scan_query(
+    "SELECT name, version, changed_at FROM table_versions", "one row per tracked table, read as a whole for cache keys"
+)
+
+
+def get_table_versions(c):
+    c.execute(TABLE_VERSIONS_SQL)
+    return {r["name"]: (r["version"], r["changed_at"]) for r in c.fetchall()}
+
+
+# =========================
+# ⚖️ متابعة النمو
+# =========================
+# Each growth sample stores the previous sample, the feed used since it and the
+# live birds on its date. Triggers refresh only the samples a write touches,
+# so the time series is read straight from the table.
+_GROWTH_PREV = (
+    "SELECT p.{col} FROM growth p WHERE p.batch_id = growth.batch_id "
+    "AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1"
+)
+_GROWTH_RECOMPUTE = f"""UPDATE growth SET
+    prev_date = ({_GROWTH_PREV.format(col="date")}),
+    prev_weight = ({_GROWTH_PREV.format(col="avg_weight")}),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE(({_GROWTH_PREV.format(col="date")}), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE {{where}};"""
+
+
+def _growth_next(row):
+    # the sample right after row's (date, id) in the same batch
+    return (f"(SELECT n.id FROM growth n WHERE n.batch_id = {row}.batch_id "
+            f"AND (n.date, n.id) > ({row}.date, {row}.id) ORDER BY n.date, n.id LIMIT 1)")
+
+
+def _growth_containing(row):
+    # the first sample on or after a ledger row's date: its interval holds that row
+    return (f"(SELECT g.id FROM growth g WHERE g.batch_id = {row}.batch_id "
+            f"AND g.date >= {row}.date ORDER BY g.date, g.id LIMIT 1)")
+
+
+def create_growth_triggers(c):
+    def trigger(name, event, where):
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {_GROWTH_RECOMPUTE.format(where=where)} END")
+
+    trigger("trg_growth_ins", "AFTER INSERT ON growth", f"id IN (NEW.id, {_growth_next('NEW')})")
+    trigger("trg_growth_upd", "AFTER UPDATE OF batch_id, date, avg_weight ON growth",
+            f"id IN (NEW.id, {_growth_next('NEW')}, {_growth_next('OLD')})")
+    trigger("trg_growth_del", "AFTER DELETE ON growth", f"id = {_growth_next('OLD')}")
+    trigger("trg_feed_growth_ins", "AFTER INSERT ON feed", f"id = {_growth_containing('NEW')}")
+    trigger("trg_feed_growth_upd", "AFTER UPDATE OF batch_id, date, quantity ON feed",
+            f"id IN ({_growth_containing('NEW')}, {_growth_containing('OLD')})")
+    trigger("trg_feed_growth_del", "AFTER DELETE ON feed", f"id = {_growth_containing('OLD')}")
+    # live birds change for every sample on or after a mortality/sale date
+    for table, column in (("mortality", "count"), ("sales", "quantity")):
+        trigger(f"trg_{table}_growth_ins", f"AFTER INSERT ON {table}", "batch_id = NEW.batch_id AND date >= NEW.date")
+        trigger(f"trg_{table}_growth_upd", f"AFTER UPDATE OF batch_id, date, {column} ON {table}",
+                "(batch_id = NEW.batch_id AND date >= NEW.date) OR (batch_id = OLD.batch_id AND date >= OLD.date)")
+        trigger(f"trg_{table}_growth_del", f"AFTER DELETE ON {table}", "batch_id = OLD.batch_id AND date >= OLD.date")
+    trigger("trg_batches_growth_upd", "AFTER UPDATE OF initial_count ON batches", "batch_id = NEW.id")
+
+
+def growth_series(c, batch_id):
+    # feed_to_gain = flock feed in the interval / (gain per bird * live birds)
+    c.execute(
+        """
+        SELECT g.id, g.date, CAST(julianday(g.date) - julianday(b.start_date) AS INTEGER) AS age,
+               g.avg_weight, g.avg_weight - g.prev_weight AS gain,
+               julianday(g.date) - julianday(g.prev_date) AS days,
+               (g.avg_weight - g.prev_weight) / NULLIF(julianday(g.date) - julianday(g.prev_date), 0) AS daily_gain,
+               g.feed_kg, g.birds,
+               g.feed_kg / NULLIF((g.avg_weight - g.prev_weight) * g.birds, 0) AS feed_to_gain
+        FROM growth g JOIN batches b ON b.id = g.batch_id
+        WHERE g.batch_id = ?
+        ORDER BY g.date, g.id
+        """,
+        (batch_id,),
+    )
+    return c.fetchall()
+
+
+def _totals_select():
+    # the same numbers the rollup should hold, computed from the ledgers
+    exprs = []
+    for table, columns in ROLLUP_COLUMNS.items():
+        for tc, lc in columns:
+            exprs.append(f"(SELECT COALESCE(SUM({lc}), 0) FROM {table} WHERE batch_id = b.id) AS {tc}")
+    return "SELECT b.id AS batch_id, " + ", ".join(exprs) + " FROM batches b"
+
+
+def rebuild_batch_totals(conn):
+    columns = [tc for cols in ROLLUP_COLUMNS.values() for tc, _ in cols]
+    conn.execute("DELETE FROM batch_totals")
+    conn.execute(f"INSERT INTO batch_totals (batch_id, {', '.join(columns)}) " + _totals_select())
+
+
+BATCH_TOTALS_ALL = full_scan_query("SELECT * FROM batch_totals", "verify-totals compares every batch's totals")
+
+
+def verify_batch_totals(conn, tolerance=1e-6):
+    stored = {r["batch_id"]: r for r in conn.execute(BATCH_TOTALS_ALL)}
+    mismatches = []
+    for actual in conn.execute(_totals_select()):
+        row = stored.pop(actual["batch_id"], None)
+        for key in actual.keys()[1:]:
+            have = row[key] if row is not None else None
+            if have is None or abs(have - actual[key]) > tolerance * max(1.0, abs(actual[key])):
+                mismatches.append((actual["batch_id"], key, have, actual[key]))
+    for batch_id in stored:
+        mismatches.append((batch_id, "batch_id", batch_id, None))
+    return mismatches
+
+
+@app.cli.command("rebuild-totals")
+def rebuild_totals_command():
+    """Recompute batch_totals, period_totals and the archive totals from the ledger tables."""
+    conn = connect_db()
+    with conn:
+        rebuild_batch_totals(conn)
+        rebuild_period_totals(conn, "main")
+        rebuild_period_totals(conn, "archive")
+        conn.execute(ARCHIVE_TOTALS_REFRESH)
     conn.close()
 
 
+@app.cli.command("verify-totals")
+def verify_totals_command():
+    """Compare batch_totals with a fresh aggregation and fail on drift."""
+    conn = connect_db()
+    mismatches = verify_batch_totals(conn)
+    conn.close()
+    for batch_id, column, stored, actual in mismatches:
+        click.echo(f"batch {batch_id}: {column} stored={stored} actual={actual}", err=True)
+    if mismatches:
+        raise SystemExit(1)
+    click.echo("batch_totals is consistent with the ledgers")
+
+
 # =========================
-# 🏠 الصفحة الرئيسية
+# 📅 الإجماليات حسب الفترة
 # =========================
-@app.route("/")
-def index():
-    from datetime import datetime
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT * FROM batches")
-    rows = c.fetchall()
+# period_totals holds one row per (day, batch) with the same sums as batch_totals plus the chick
+# cost on the batch's start date. Weeks and months are added up from the days in a range, which
+# is a primary-key range scan; the ledgers are never read for a period report. Rows whose date
+# does not parse are left out (see `flask normalize-dates`).
+PERIOD_COLUMNS = ("chick_cost",) + tuple(tc for cols in ROLLUP_COLUMNS.values() for tc, _ in cols)
+# granularity -> SQL for the first day (or month) of the period holding `day`
+PERIOD_GRANULARITIES = {
+    "month": "substr(day, 1, 7)",
+    "week": "date(day, '-6 days', 'weekday 1')",
+}
+# (schema, granularity) -> per-batch sums for the periods in a day range
+PERIOD_QUERIES = {
+    (schema, gran): full_scan_query(
+        f"SELECT {bucket} AS period, batch_id, {', '.join(f'SUM({col}) AS {col}' for col in PERIOD_COLUMNS)} "
+        f"FROM {schema}.period_totals WHERE day >= ? AND day <= ? GROUP BY period, batch_id",
+        "a primary key range search; the temp b-tree groups only the days in the range",
+    )
+    for schema in ("main", "archive") for gran, bucket in PERIOD_GRANULARITIES.items()
+}
+
+
+def _period_add(day, batch, values):
+    # values: ((period column, expression), ...)
+    cols = ", ".join(col for col, _ in values)
+    exprs = ", ".join(expr for _, expr in values)
+    sets = ", ".join(f"{col} = {col} + excluded.{col}" for col, _ in values)
+    return (
+        f"INSERT INTO period_totals (day, batch_id, {cols}) SELECT date({day}), {batch}, {exprs} "
+        f"WHERE date({day}) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET {sets};"
+    )
 
-    # build list of dicts and compute age in days for each batch
-    batches = []
-    now = datetime.now().date()
-    for r in rows:
-        b = dict(r)
-        start = b.get('start_date')
-        end = b.get('end_date')
-        is_completed = b.get('is_completed')
-        age = None
-        if start:
-            try:
-                start_date = datetime.strptime(start, '%Y-%m-%d').date()
-                # if an end date is provided use it to compute a fixed age
-                if end:
-                    try:
-                        end_date = datetime.strptime(end, '%Y-%m-%d').date()
-                        age = (end_date - start_date).days
-                    except Exception:
-                        # fallback to now if end date cannot be parsed
-                        age = (now - start_date).days
-                else:
-                    # no end date -> compute age up to today
-                    age = (now - start_date).days
-            except Exception:
-                age = None
-        b['age'] = age
-        batches.append(b)
 
-    # Dashboard quick stats
-    c.execute("SELECT COUNT(*) FROM batches")
-    total_batches = c.fetchone()[0] or 0
+def _period_sub(day, batch, values):
+    sets = ", ".join(f"{col} = {col} - {expr}" for col, expr in values)
+    return f"UPDATE period_totals SET {sets} WHERE day = date({day}) AND batch_id = {batch};"
+
+
+def create_period_triggers(c):
+    def chick(row):
+        return (("chick_cost", f"COALESCE({row}.chick_price, 0) * COALESCE({row}.initial_count, 0)"),)
+
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_batches_period_ins AFTER INSERT ON batches BEGIN
+        {_period_add("NEW.start_date", "NEW.id", chick("NEW"))}
+    END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_batches_period_upd AFTER UPDATE OF start_date, initial_count, chick_price ON batches BEGIN
+        {_period_sub("OLD.start_date", "OLD.id", chick("OLD"))}
+        {_period_add("NEW.start_date", "NEW.id", chick("NEW"))}
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_batches_period_del AFTER DELETE ON batches BEGIN
+        DELETE FROM period_totals WHERE batch_id = OLD.id;
+    END''')
+    for table, columns in ROLLUP_COLUMNS.items():
+        def values(row):
+            return tuple((tc, f"COALESCE({row}.{lc}, 0)") for tc, lc in columns)
+
+        watched = ", ".join(["batch_id", "date"] + [lc for _, lc in columns])
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_period_ins AFTER INSERT ON {table} BEGIN
+            {_period_add("NEW.date", "NEW.batch_id", values("NEW"))}
+        END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_period_del AFTER DELETE ON {table} BEGIN
+            {_period_sub("OLD.date", "OLD.batch_id", values("OLD"))}
+        END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_period_upd AFTER UPDATE OF {watched} ON {table} BEGIN
+            {_period_sub("OLD.date", "OLD.batch_id", values("OLD"))}
+            {_period_add("NEW.date", "NEW.batch_id", values("NEW"))}
+        END''')
+
+
+def rebuild_period_totals(conn, schema="main"):
+    conn.execute(f"DELETE FROM {schema}.period_totals")
+    conn.execute(
+        f"INSERT INTO {schema}.period_totals (day, batch_id, chick_cost) "
+        f"SELECT date(start_date), id, COALESCE(chick_price, 0) * COALESCE(initial_count, 0) "
+        f"FROM {schema}.batches WHERE date(start_date) IS NOT NULL"
+    )
+    for table, columns in ROLLUP_COLUMNS.items():
+        cols = ", ".join(tc for tc, _ in columns)
+        sums = ", ".join(f"COALESCE(SUM({lc}), 0)" for _, lc in columns)
+        sets = ", ".join(f"{tc} = {tc} + excluded.{tc}" for tc, _ in columns)
+        conn.execute(
+            f"INSERT INTO {schema}.period_totals (day, batch_id, {cols}) "
+            f"SELECT date(date) AS d, batch_id, {sums} FROM {schema}.{table} WHERE d IS NOT NULL GROUP BY d, batch_id "
+            f"ON CONFLICT (day, batch_id) DO UPDATE SET {sets}"
+        )
 
-    c.execute("SELECT COALESCE(SUM(initial_count),0) FROM batches")
-    total_chicks = c.fetchone()[0] or 0
 
-    # Expenses = chicks + feed + meds + extras
-    c.execute("SELECT COALESCE(SUM(chick_price * initial_count),0) FROM batches")
-    total_chicks_cost = c.fetchone()[0] or 0
+def _pnl(row):
+    row["expenses"] = row["chick_cost"] + row["feed_cost"] + row["med_cost"] + row["extra_cost"]
+    row["profit"] = row["sales_revenue"] - row["expenses"]
+    return row
+
+
+def period_report(c, start, end, granularity="month"):
+    # archived batches keep their days in archive.period_totals
+    periods, names = {}, {}
+    for schema in ("main", "archive"):
+        rows = c.execute(PERIOD_QUERIES[(schema, granularity)], (start, end)).fetchall()
+        ids = sorted({r["batch_id"] for r in rows})
+        if ids:
+            names.update(c.execute(
+                f"SELECT id, name FROM {schema}.batches WHERE id IN ({', '.join('?' * len(ids))})", ids
+            ).fetchall())
+        for r in rows:
+            batch = periods.setdefault(r["period"], {}).setdefault(r["batch_id"], dict.fromkeys(PERIOD_COLUMNS, 0))
+            for col in PERIOD_COLUMNS:
+                batch[col] += r[col]
+
+    report = []
+    for key in sorted(periods):
+        total = dict.fromkeys(PERIOD_COLUMNS, 0)
+        batches = []
+        for batch_id, sums in sorted(periods[key].items()):
+            for col in PERIOD_COLUMNS:
+                total[col] += sums[col]
+            batches.append(_pnl(dict(sums, batch_id=batch_id, name=names.get(batch_id))))
+        report.append(_pnl(dict(total, period=key, batches=batches)))
+    grand = _pnl({col: sum(p[col] for p in report) for col in PERIOD_COLUMNS})
+    return report, grand
+
+
+@app.route("/reports/period")
+def period_report_view():
+    today = date.today()
+    granularity = request.args.get("granularity", "month")
+    try:
+        start = parse_date(request.args.get("from") or today.replace(month=1, day=1).isoformat())
+        end = parse_date(request.args.get("to") or today.isoformat())
+    except ValueError:
+        abort(400)
+    if granularity not in PERIOD_GRANULARITIES:
+        abort(400)
+    periods, grand = period_report(get_db().cursor(), start, end, granularity)
+    if request.args.get("format") == "json":
+        return jsonify(start=start, end=end, granularity=granularity, periods=periods, total=grand)
+    return render_template(
+        "period_report.html", start=start, end=end, granularity=granularity,
+        granularities=PERIOD_GRANULARITIES, periods=periods, total=grand,
+    )
 
-    c.execute("SELECT COALESCE(SUM(price),0) FROM feed")
-    total_feed = c.fetchone()[0] or 0
 
-    c.execute("SELECT COALESCE(SUM(price),0) FROM medications")
-    total_meds = c.fetchone()[0] or 0
+@app.cli.command("normalize-dates")
+def normalize_dates_command():
+    """Rewrite dates entered in other formats (2026/10/18, 18/10/2026, Arabic digits) as YYYY-MM-DD."""
+    conn = connect_db()
+    fixed, bad = 0, []
+    columns = [("batches", "start_date"), ("batches", "end_date")] + [(t, "date") for t in LEDGER_TABLES + ("growth",)]
+    with conn:
+        for table, col in columns:
+            for row in conn.execute(
+                f"SELECT id, {col} FROM {table} WHERE {col} IS NOT NULL AND {col} != '' AND {col} IS NOT date({col})"
+            ).fetchall():
+                try:
+                    value = parse_date(row[1])
+                except ValueError:
+                    bad.append((table, row[0], row[1]))
+                    continue
+                conn.execute(f"UPDATE {table} SET {col} = ? WHERE id = ?", (value, row[0]))
+                fixed += 1
+        refit_forecasts(conn)
+    conn.close()
+    for table, id, value in bad:
+        click.echo(f"{table} {id}: cannot read date {value!r}", err=True)
+    click.echo(f"{fixed} dates rewritten, {len(bad)} left as they were")
 
-    c.execute("SELECT COALESCE(SUM(price),0) FROM extra_expenses")
-    total_extras = c.fetchone()[0] or 0
 
-    total_expenses = (total_chicks_cost or 0) + (total_feed or 0) + (total_meds or 0) + (total_extras or 0)
+# =========================
+# 🔮 توقعات الدفعات النشطة
+# =========================
+# forecasts holds a fitted model per active batch: a least-squares line through the weighings of
+# the last FORECAST_WINDOW_DAYS (daily gain and the smoothed weight on the last weighing), the feed
+# conversion over the same samples and the batch's feed price per kg. Triggers queue a batch in
+# forecast_stale whenever its batch, feed or growth rows change (growth rows follow mortality and
+# sales); the queued batches are refit together once the write is done: after each writing request,
+# import chunk and job. `flask rebuild-forecasts` refits every active batch. Days to market, feed
+# still needed and expected profit follow from the model, today's date and batch_totals when read.
+app.config.update(
+    # market weight per bird, kg
+    FORECAST_TARGET_WEIGHT=float(os.environ.get("FORECAST_TARGET_WEIGHT", 2.0)),
+    # sale price per kg for batches without sales yet; without it their profit is not estimated
+    FORECAST_PRICE_PER_KG=float(os.environ["FORECAST_PRICE_PER_KG"]) if os.environ.get("FORECAST_PRICE_PER_KG") else None,
+)
+FORECAST_WINDOW_DAYS = 14
+# x is days before the batch's last weighing, y the weight; weighings whose date does not parse are left out
+_FORECAST_FIT = f"""INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(date(w.date)) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                    AND date(w.date) IS NOT NULL
+                WHERE b.end_date IS NULL AND {{where}}
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND date(g.date) >= date(l.last_date, '-{FORECAST_WINDOW_DAYS} days')
+        )
+        GROUP BY id
+    ) s"""
+FORECAST_CLEAR = full_scan_query("DELETE FROM forecasts", "rebuild-forecasts empties the whole table")
+FORECAST_ALL = full_scan_query(_FORECAST_FIT.format(where="1"), "rebuild-forecasts refits every active batch")
+FORECAST_STALE_FIRST = plan_query("SELECT MIN(batch_id) FROM forecast_stale")
+FORECAST_STALE_DROP = plan_query("DELETE FROM forecasts WHERE batch_id IN (SELECT batch_id FROM forecast_stale)")
+FORECAST_STALE_FIT = full_scan_query(
+    _FORECAST_FIT.format(where="b.id IN (SELECT batch_id FROM forecast_stale)"),
+    "every queued batch is refit; the temp b-tree groups their recent weighings",
+)
+FORECAST_STALE_CLEAR = plan_query("DELETE FROM forecast_stale")
+FORECAST_TRIGGERS = tuple(
+    f"trg_{table}_forecast_{event}" for table, events in (("batches", ("ins", "upd", "del")), ("growth", ("ins", "del", "upd", "move")),
+                                                          ("feed", ("ins", "del", "upd", "move")))
+    for event in events
+)
+
+
+def create_forecast_triggers(c):
+    def trigger(name, event, batch):
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN
+            INSERT OR IGNORE INTO forecast_stale (batch_id) VALUES ({batch});
+        END""")
+
+    trigger("trg_batches_forecast_ins", "AFTER INSERT ON batches", "NEW.id")
+    trigger("trg_batches_forecast_upd", "AFTER UPDATE OF start_date, end_date ON batches", "NEW.id")
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_batches_forecast_del AFTER DELETE ON batches BEGIN
+        DELETE FROM forecasts WHERE batch_id = OLD.id;
+    END''')
+    for table, columns in (("growth", "date, avg_weight, prev_weight, feed_kg, birds"), ("feed", "date, quantity, price")):
+        trigger(f"trg_{table}_forecast_ins", f"AFTER INSERT ON {table}", "NEW.batch_id")
+        trigger(f"trg_{table}_forecast_del", f"AFTER DELETE ON {table}", "OLD.batch_id")
+        # the growth triggers rewrite feed_kg and birds of later samples, mostly to the same values
+        changed = " OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in ("batch_id", *columns.split(", ")))
+        trigger(f"trg_{table}_forecast_upd", f"AFTER UPDATE OF batch_id, {columns} ON {table} WHEN {changed}", "NEW.batch_id")
+        trigger(f"trg_{table}_forecast_move", f"AFTER UPDATE OF batch_id ON {table} WHEN OLD.batch_id IS NOT NEW.batch_id",
+                "OLD.batch_id")
+
+
+def rebuild_forecasts(conn):
+    conn.execute(FORECAST_CLEAR)
+    conn.execute(FORECAST_STALE_CLEAR)
+    return conn.execute(FORECAST_ALL).rowcount
+
+
+def refit_forecasts(conn):
+    # the batches queued since the last refit, in one grouped pass; the caller commits
+    if conn.execute(FORECAST_STALE_FIRST).fetchone()[0] is None:
+        return 0
+    conn.execute(FORECAST_STALE_DROP)
+    count = conn.execute(FORECAST_STALE_FIT).rowcount
+    conn.execute(FORECAST_STALE_CLEAR)
+    return count
+
+
+@app.after_request
+def refit_written_forecasts(response):
+    # once per writing request, however many rows it wrote; a failed refit stays queued for the next one
+    if "db" in g and not g.get("snapshot") and is_write_request():
+        try:
+            with g.db:
+                refit_forecasts(g.db)
+        except sqlite3.Error:
+            app.logger.exception("could not refit the queued forecasts")
+    return response
+
+
+@app.cli.command("rebuild-forecasts")
+def rebuild_forecasts_command():
+    """Refit the growth and feed model of every active batch."""
+    conn = connect_db()
+    with conn:
+        count = rebuild_forecasts(conn)
     conn.close()
-    return render_template(
-        "index.html",
+    click.echo(f"{count} active batches fitted")
+
+
+def project_batch(b, today=None):
+    # b: a dashboard row (batch, batch_totals and forecasts columns)
+    gain = b["daily_gain"]
+    if b["end_date"] or b["weight"] is None or not gain or gain <= 0:
+        return None
+    try:
+        last_date = date.fromisoformat(b["last_date"])
+    except (TypeError, ValueError):
+        # a fit from before the weighing dates were normalized; `flask rebuild-forecasts` redoes it
+        return None
+    today = today or date.today()
+    target = app.config["FORECAST_TARGET_WEIGHT"]
+    weight = b["weight"] + gain * max((today - last_date).days, 0)
+    days = max(math.ceil((target - weight) / gain), 0)
+    birds = max(b["initial_count"] - b["mortality_count"] - b["sold_qty"], 0)
+    feed_kg = b["fcr"] * max(target - weight, 0) * birds if b["fcr"] else None
+    price = b["sales_revenue"] / b["sold_weight"] if b["sold_weight"] else app.config["FORECAST_PRICE_PER_KG"]
+    profit = None
+    if price is not None:
+        costs = (b["chick_price"] or 0) * b["initial_count"] + b["ledger_cost"] + (feed_kg or 0) * (b["feed_price"] or 0)
+        profit = b["sales_revenue"] + birds * target * price - costs
+    return dict(
+        weight=round(weight, 3), days=days, market_date=(today + timedelta(days=days)).isoformat(),
+        birds=birds, feed_kg=feed_kg, price=price, profit=profit,
+    )
+
+
+# =========================
+# ✅ قراءة المدخلات
+# =========================
+# Parsers take request.form or any mapping (a CSV/JSON row) and apply the
+# same rules as the form handlers; bad input raises KeyError/ValueError.
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d/%m/%Y", "%d-%m-%Y", "%Y.%m.%d", "%d.%m.%Y")
+ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "0123456789" * 2)
+
+
+def parse_date(value):
+    # dates are stored as YYYY-MM-DD so date() and range scans work on them
+    value = str(value).strip().translate(ARABIC_DIGITS)
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognized date: {value!r}")
+
+
+def parse_batch(form):
+    return (form["name"], form["breed"], parse_date(form["start_date"]), int(form["initial_count"]), float(form["chick_price"]))
+
+
+def parse_batch_edit(form):
+    initial_count = int(form.get("initial_count", 0) or 0)
+    chick_price = float(form.get("chick_price", 0) or 0)
+    # handle completion and optional end date
+    end_date = parse_date(form["end_date"]) if form.get("end_date") else None
+    # if user provided an end date, treat batch as completed as well
+    is_completed = 1 if form.get("is_completed") or end_date else 0
+    return (form["name"], form["breed"], parse_date(form["start_date"]), initial_count, chick_price, is_completed, end_date)
+
+
+def parse_feed(form):
+    return (parse_date(form["date"]), form["feed_type"], float(form["quantity"]), float(form["price"]))
+
+
+def parse_med(form):
+    return (parse_date(form["date"]), form["name"], form["purpose"], float(form["price"]))
+
+
+def parse_extra(form):
+    return (parse_date(form["date"]), form["name"], float(form["price"]))
+
+
+def parse_mortality(form):
+    count = int(form["count"]) if form.get("count") else 0
+    return (parse_date(form["date"]), count, form.get("note", ""))
+
+
+def parse_sale(form):
+    quantity = int(form.get("quantity", 0) or 0)
+    average_weight_kg = float(form.get("average_weight_kg", 0) or 0)
+    price_per_kg = float(form.get("price_per_kg", 0) or 0)
+    total_weight_kg = quantity * average_weight_kg
+    total_price = total_weight_kg * price_per_kg
+    return (parse_date(form["date"]), quantity, average_weight_kg, price_per_kg, total_weight_kg, total_price, form.get("note", ""))
+
+
+def parse_growth(form):
+    dead_count = int(form["dead_count"]) if form.get("dead_count") else 0
+    return (parse_date(form["date"]), float(form["avg_weight"]), dead_count, form.get("notes", ""))
+
+
+def parse_form(parse):
+    # the parsed request.form, or None once the error is flashed for the form to show again
+    try:
+        return parse(request.form)
+    except (KeyError, ValueError):
+        flash("المدخلات غير صحيحة.", "danger")
+        return None
+
+
+def save_form(sql, params):
+    # False once the error is flashed, like parse_form: the constraints turned the row away
+    # (a batch deleted while the form was open)
+    conn = get_db()
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        flash("المدخلات غير صحيحة.", "danger")
+        return False
+    return True
+
+
+def require_batch(batch_id):
+    # ledger rows go to batches in main; with foreign keys on, any other id would fail the insert
+    if missing_batches(get_db().cursor(), [batch_id]):
+        abort(404)
+
+
+# ledger table -> (parser, INSERT taking batch_id followed by the parsed values)
+LEDGER_INSERTS = {
+    "feed": (parse_feed, "INSERT INTO feed (batch_id, date, feed_type, quantity, price) VALUES (?, ?, ?, ?, ?)"),
+    "medications": (parse_med, "INSERT INTO medications (batch_id, date, name, purpose, price) VALUES (?, ?, ?, ?, ?)"),
+    "extra_expenses": (parse_extra, "INSERT INTO extra_expenses (batch_id, date, name, price) VALUES (?, ?, ?, ?)"),
+    "mortality": (parse_mortality, "INSERT INTO mortality (batch_id, date, count, note) VALUES (?, ?, ?, ?)"),
+    "sales": (
+        parse_sale,
+        "INSERT INTO sales (batch_id, date, quantity, average_weight_kg, price_per_kg, total_weight_kg, total_price, note) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    ),
+    "growth": (parse_growth, "INSERT INTO growth (batch_id, date, avg_weight, dead_count, notes) VALUES (?, ?, ?, ?, ?)"),
+}
+BATCH_INSERT = "INSERT INTO batches (name, breed, start_date, initial_count, chick_price) VALUES (?, ?, ?, ?, ?)"
+BATCH_UPDATE = "UPDATE batches SET name=?, breed=?, start_date=?, initial_count=?, chick_price=?, is_completed=?, end_date=? WHERE id=?"
+
+# columns in the order the parsers return them
+LEDGER_COLUMNS = {
+    "feed": ("date", "feed_type", "quantity", "price"),
+    "medications": ("date", "name", "purpose", "price"),
+    "extra_expenses": ("date", "name", "price"),
+    "mortality": ("date", "count", "note"),
+    "sales": ("date", "quantity", "average_weight_kg", "price_per_kg", "total_weight_kg", "total_price", "note"),
+    "growth": ("date", "avg_weight", "dead_count", "notes"),
+}
+LEDGER_UPDATES = {
+    table: f"UPDATE {table} SET {', '.join(col + '=?' for col in columns)} WHERE id=?"
+    for table, columns in LEDGER_COLUMNS.items()
+}
+PLAN_QUERIES.extend(LEDGER_UPDATES.values())
+
+
+# growth goes first, otherwise every feed/mortality/sales delete recomputes its weighings
+BATCH_CHILD_TABLES = ("growth",) + LEDGER_TABLES
+CHUNK_DELETES = {
+    t: f"DELETE FROM {t} WHERE id IN (SELECT id FROM {t} WHERE batch_id=? LIMIT ?)" for t in BATCH_CHILD_TABLES
+}
+CHILD_COUNT = "SELECT " + " + ".join(f"(SELECT COUNT(*) FROM {t} WHERE batch_id=?)" for t in BATCH_CHILD_TABLES)
+PLAN_QUERIES.extend(CHUNK_DELETES.values())
+PLAN_QUERIES.append(CHILD_COUNT)
+
+
+def delete_batch_rows(conn, batch_id, chunk_size=None, progress=None):
+    # نحذف الدفعة وكل بياناتها التابعة على دفعات صغيرة، كل دفعة في معاملة مستقلة
+    # حتى لا يبقى قفل الكتابة محجوزاً طوال الحذف
+    chunk_size = chunk_size or app.config["JOB_DELETE_CHUNK"]
+    total = conn.execute(CHILD_COUNT, (batch_id,) * len(BATCH_CHILD_TABLES)).fetchone()[0] + 1
+    done = 0
+    for table in BATCH_CHILD_TABLES:
+        while True:
+            n = conn.execute(CHUNK_DELETES[table], (batch_id, chunk_size)).rowcount
+            done += n
+            if progress:
+                progress(done, total)
+            conn.commit()
+            if n < chunk_size:
+                break
+    found = conn.execute("DELETE FROM batches WHERE id=?", (batch_id,)).rowcount
+    if progress:
+        progress(total, total)
+    conn.commit()
+    return {"batch_id": batch_id, "rows_deleted": done, "found": bool(found)}
+
+
+# =========================
+# 🏠 الصفحة الرئيسية
+# =========================
+DASHBOARD_TABLES = ("batches", "growth", "forecasts") + LEDGER_TABLES
+
+# database path -> ((table versions, today), dashboard data), least recently used first;
+# capped like the pools, at DB_MAX_TENANTS farms
+_dashboard_cache = OrderedDict()
+_dashboard_lock = threading.Lock()
+
+
+# age in days: up to end_date if it parses, otherwise up to today
+DASHBOARD_SQL = full_scan_query(
+    """
+    SELECT b.*,
+           CAST(COALESCE(julianday(b.end_date), julianday('now', 'localtime', 'start of day'))
+                - julianday(b.start_date) AS INTEGER) AS age,
+           COALESCE(t.feed_cost + t.med_cost + t.extra_cost, 0) AS ledger_cost,
+           COALESCE(t.mortality_count, 0) AS mortality_count, COALESCE(t.sold_qty, 0) AS sold_qty,
+           COALESCE(t.sold_weight, 0) AS sold_weight, COALESCE(t.sales_revenue, 0) AS sales_revenue,
+           f.last_date, f.weight, f.daily_gain, f.fcr, f.feed_price
+    FROM batches b LEFT JOIN batch_totals t ON t.batch_id = b.id LEFT JOIN forecasts f ON f.batch_id = b.id
+    """,
+    "the dashboard lists every batch in main; completed ones move to the archive",
+)
+
+
+def load_dashboard(c):
+    c.execute(DASHBOARD_SQL)
+    today = date.today()
+    batches = [dict(r, forecast=project_batch(r, today)) for r in c.fetchall()]
+    # archived batches count through their pre-rolled totals, their rows are never read here
+    archive = c.execute("SELECT * FROM archive.archive_totals WHERE id = 1").fetchone()
+
+    # Dashboard quick stats: expenses = chicks + feed + meds + extras
+    return dict(
         batches=batches,
-        total_batches=total_batches,
-        total_chicks=total_chicks,
-        total_expenses=total_expenses,
+        archive=dict(archive),
+        total_batches=len(batches) + archive["batches"],
+        total_chicks=sum(b["initial_count"] or 0 for b in batches) + archive["chicks"],
+        total_expenses=sum((b["chick_price"] or 0) * (b["initial_count"] or 0) + b["ledger_cost"] for b in batches)
+        + archive["expenses"],
     )
 
 
+@app.route("/")
+def index():
+    conn = get_db()
+    c = conn.cursor()
+
+    # the page only changes when one of its tables is written or the day rolls over
+    versions = get_table_versions(c)
+    today = date.today()
+    key = (tuple(versions.get(t) for t in DASHBOARD_TABLES), today)
+    etag = hashlib.sha1(repr((current_db_path(), key)).encode()).hexdigest()
+    midnight = datetime.combine(today, datetime.min.time()).timestamp()
+    changed_at = max([v[1] for v in key[0] if v] + [midnight])
+    last_modified = datetime.fromtimestamp(changed_at, timezone.utc)
+
+    # pending flash messages must reach the page, so never answer 304 then
+    if not session.get("_flashes") and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = app.response_class(status=304)
+    else:
+        path = current_db_path()
+        with _dashboard_lock:
+            cached = _dashboard_cache.get(path)
+            if cached is not None:
+                _dashboard_cache.move_to_end(path)
+        if cached is not None and cached[0] == key:
+            data = cached[1]
+        else:
+            data = load_dashboard(c)
+            with _dashboard_lock:
+                _dashboard_cache[path] = (key, data)
+                _dashboard_cache.move_to_end(path)
+                while len(_dashboard_cache) > app.config["DB_MAX_TENANTS"]:
+                    _dashboard_cache.popitem(last=False)
+        response = make_response(render_template("index.html", **data))
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
 # =========================
 # ➕ إضافة دفعة جديدة
 # =========================
 @app.route("/batches/add", methods=["GET", "POST"])
 def add_batch():
     if request.method == "POST":
-        name = request.form["name"]
-        breed = request.form["breed"]
-        start_date = request.form["start_date"]
-        initial_count = int(request.form["initial_count"])
-        chick_price = float(request.form["chick_price"])
-
-        conn = get_db()
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO batches (name, breed, start_date, initial_count, chick_price) VALUES (?, ?, ?, ?, ?)",
-            (name, breed, start_date, initial_count, chick_price),
-        )
-        conn.commit()
-        conn.close()
+        values = parse_form(parse_batch)
+        if values is None or not save_form(BATCH_INSERT, values):
+            return render_template("add_batch.html"), 400
 
         flash("✅ تمت إضافة الدفعة بنجاح", "success")
         return redirect(url_for("index"))
@@ -210,6 +1647,90 @@ def add_batch():
 # =========================
 # 📋 عرض تفاصيل دفعة
 # =========================
+# tab -> (ledger table, sort direction); keyset pagination follows (date, id)
+BATCH_TABS = {
+    "feed": ("feed", "ASC"),
+    "meds": ("medications", "ASC"),
+    "extras": ("extra_expenses", "ASC"),
+    "mortality": ("mortality", "DESC"),
+    "sales": ("sales", "DESC"),
+    "growth": ("growth", "DESC"),
+}
+app.config["TAB_PAGE_SIZE"] = int(os.environ.get("TAB_PAGE_SIZE", 50))
+
+
+def _tab_queries(schema, table, order):
+    op = ">" if order == "ASC" else "<"
+    first = f"SELECT * FROM {schema}.{table} WHERE batch_id = ? ORDER BY date {order}, id {order} LIMIT ?"
+    after = (
+        f"SELECT * FROM {schema}.{table} WHERE batch_id = ? AND (date, id) {op} (?, ?) "
+        f"ORDER BY date {order}, id {order} LIMIT ?"
+    )
+    return first, after
+
+
+# (schema, tab) -> (first page, next page); archived batches read from the attached archive
+TAB_QUERIES = {
+    (schema, tab): _tab_queries(schema, *spec) for schema in ("main", "archive") for tab, spec in BATCH_TABS.items()
+}
+PLAN_QUERIES.extend(sql for pair in TAB_QUERIES.values() for sql in pair)
+
+
+def fetch_tab_page(c, batch_id, tab, after=None, limit=None, schema="main"):
+    limit = limit or app.config["TAB_PAGE_SIZE"]
+    first, after_sql = TAB_QUERIES[(schema, tab)]
+    # one extra row tells us whether another page exists
+    if after:
+        c.execute(after_sql, (batch_id, after[0], after[1], limit + 1))
+    else:
+        c.execute(first, (batch_id, limit + 1))
+    rows = c.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1]["date"], rows[-1]["id"])
+    return rows, next_cursor
+
+
+def tab_page_url(batch_id, tab, cursor, **kwargs):
+    if cursor is None:
+        return None
+    return url_for("batch_tab", batch_id=batch_id, tab=tab, after_date=cursor[0], after_id=cursor[1], **kwargs)
+
+
+app.config["FRAGMENT_CACHE_SIZE"] = int(os.environ.get("FRAGMENT_CACHE_SIZE", 1024))
+
+# (database path, schema, batch, tab, page, table version) -> (rendered rows, any rows, next cursor)
+_fragment_cache = OrderedDict()
+_fragment_lock = threading.Lock()
+
+
+def render_tab_rows(c, batch_id, tab, after=None, limit=None, schema="main"):
+    # a page of rendered <tr> rows, reused until its own ledger table changes:
+    # a new mortality entry leaves the feed and sales fragments alone. The links in it
+    # carry the farm's /f/<farm> prefix or host, so those are part of the key too.
+    limit = limit or app.config["TAB_PAGE_SIZE"]
+    version = c.execute("SELECT version FROM table_versions WHERE name = ?", (BATCH_TABS[tab][0],)).fetchone()
+    key = (
+        current_db_path(), request.script_root, request.host,
+        schema, batch_id, tab, after, limit, version[0] if version else None,
+    )
+    with _fragment_lock:
+        hit = _fragment_cache.get(key)
+        if hit is not None:
+            _fragment_cache.move_to_end(key)
+            return hit
+
+    rows, cursor = fetch_tab_page(c, batch_id, tab, after, limit, schema)
+    html = Markup(render_template("batch_rows.html", tab=tab, rows=rows, batch_id=batch_id, archived=schema == "archive"))
+    fragment = (html, bool(rows), cursor)
+    with _fragment_lock:
+        _fragment_cache[key] = fragment
+        while len(_fragment_cache) > app.config["FRAGMENT_CACHE_SIZE"]:
+            _fragment_cache.popitem(last=False)
+    return fragment
+
+
 @app.route("/batch/<int:batch_id>")
 def view_batch(batch_id):
     conn = get_db()
@@ -217,56 +1738,67 @@ def view_batch(batch_id):
 
     c.execute("SELECT * FROM batches WHERE id = ?", (batch_id,))
     batch = c.fetchone()
+    schema = "main"
+    if batch is None:
+        c.execute("SELECT * FROM archive.batches WHERE id = ?", (batch_id,))
+        batch, schema = c.fetchone(), "archive"
+    if batch is None:
+        abort(404)
+
+    # only the visible tab is rendered; the others load through batch_tab()
+    active_tab = request.args.get("tab", "feed")
+    if active_tab not in BATCH_TABS:
+        active_tab = "feed"
+    rows_html, has_rows, cursor = render_tab_rows(c, batch_id, active_tab, schema=schema)
 
-    c.execute("SELECT * FROM feed WHERE batch_id = ?", (batch_id,))
-    feeds = c.fetchall()
-
-    c.execute("SELECT * FROM medications WHERE batch_id = ?", (batch_id,))
-    meds = c.fetchall()
-
-    c.execute("SELECT * FROM extra_expenses WHERE batch_id = ?", (batch_id,))
-    extras = c.fetchall()
-
-    c.execute("SELECT * FROM mortality WHERE batch_id = ? ORDER BY date DESC, id DESC", (batch_id,))
-    mortalities = c.fetchall()
-
-    c.execute("SELECT * FROM sales WHERE batch_id = ? ORDER BY date DESC, id DESC", (batch_id,))
-    sales = c.fetchall()
-
-    conn.close()
     return render_template(
         "view_batch.html",
         batch=batch,
-        feeds=feeds,
-        meds=meds,
-        extras=extras,
-        mortalities=mortalities,
-        sales=sales
+        archived=schema == "archive",
+        active_tab=active_tab,
+        rows_html=rows_html,
+        has_rows=has_rows,
+        next_url=tab_page_url(batch_id, active_tab, cursor),
     )
 
 
+@app.route("/batch/<int:batch_id>/tab/<tab>")
+def batch_tab(batch_id, tab):
+    if tab not in BATCH_TABS:
+        abort(404)
+    after = None
+    if request.args.get("after_id"):
+        after = (request.args.get("after_date", ""), request.args.get("after_id", type=int))
+    limit = min(request.args.get("limit", app.config["TAB_PAGE_SIZE"], type=int), 500)
+
+    c = get_db().cursor()
+    schema = batch_schema(c, batch_id) or "main"
+    if request.args.get("format") == "json":
+        rows, cursor = fetch_tab_page(c, batch_id, tab, after, max(limit, 1), schema)
+        return jsonify(rows=[dict(r) for r in rows], next=tab_page_url(batch_id, tab, cursor, format="json"))
+
+    rows_html, _, cursor = render_tab_rows(c, batch_id, tab, after, max(limit, 1), schema)
+    response = make_response(rows_html)
+    next_url = tab_page_url(batch_id, tab, cursor)
+    if next_url:
+        response.headers["X-Next-Page"] = next_url
+    return response
+
+
 # =========================
 # ➕ إضافة علف
 # =========================
 @app.route("/feed/add/<int:batch_id>", methods=["GET", "POST"])
 def add_feed(batch_id):
+    require_batch(batch_id)
     if request.method == "POST":
-        date = request.form["date"]
-        feed_type = request.form["feed_type"]
-        quantity = float(request.form["quantity"])
-        price = float(request.form["price"])
-
-        conn = get_db()
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO feed (batch_id, date, feed_type, quantity, price) VALUES (?, ?, ?, ?, ?)",
-            (batch_id, date, feed_type, quantity, price),
-        )
-        conn.commit()
-        conn.close()
+        parse, sql = LEDGER_INSERTS["feed"]
+        values = parse_form(parse)
+        if values is None or not save_form(sql, (batch_id,) + values):
+            return render_template("add_feed.html", batch_id=batch_id), 400
 
         flash("✅ تمت إضافة العلف", "success")
-        return redirect(url_for("view_batch", batch_id=batch_id))
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="feed"))
 
     return render_template("add_feed.html", batch_id=batch_id)
 
@@ -276,18 +1808,13 @@ def edit_feed(id, batch_id):
     conn = get_db()
     c = conn.cursor()
     if request.method == "POST":
-        date = request.form["date"]
-        feed_type = request.form["feed_type"]
-        quantity = float(request.form["quantity"]) if request.form.get("quantity") else 0
-        price = float(request.form["price"]) if request.form.get("price") else 0
-        c.execute("UPDATE feed SET date=?, feed_type=?, quantity=?, price=? WHERE id=?", (date, feed_type, quantity, price, id))
-        conn.commit()
-        conn.close()
+        values = parse_form(parse_feed)
+        if values is None or not save_form(LEDGER_UPDATES["feed"], values + (id,)):
+            return render_template("edit_feed.html", record=request.form, batch_id=batch_id), 400
         flash("✅ تم تحديث سجل العلف", "success")
-        return redirect(url_for("view_batch", batch_id=batch_id))
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="feed"))
     c.execute("SELECT * FROM feed WHERE id=?", (id,))
     rec = c.fetchone()
-    conn.close()
     return render_template("edit_feed.html", record=rec, batch_id=batch_id)
 
 # =========================
@@ -295,23 +1822,15 @@ def edit_feed(id, batch_id):
 # =========================
 @app.route("/med/add/<int:batch_id>", methods=["GET", "POST"])
 def add_med(batch_id):
+    require_batch(batch_id)
     if request.method == "POST":
-        date = request.form["date"]
-        name = request.form["name"]
-        purpose = request.form["purpose"]
-        price = float(request.form["price"])
-
-        conn = get_db()
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO medications (batch_id, date, name, purpose, price) VALUES (?, ?, ?, ?, ?)",
-            (batch_id, date, name, purpose, price),
-        )
-        conn.commit()
-        conn.close()
+        parse, sql = LEDGER_INSERTS["medications"]
+        values = parse_form(parse)
+        if values is None or not save_form(sql, (batch_id,) + values):
+            return render_template("add_med.html", batch_id=batch_id), 400
 
         flash("✅ تمت إضافة الدواء", "success")
-        return redirect(url_for("view_batch", batch_id=batch_id))
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="meds"))
 
     return render_template("add_med.html", batch_id=batch_id)
 
@@ -321,18 +1840,13 @@ def edit_med(id, batch_id):
     conn = get_db()
     c = conn.cursor()
     if request.method == "POST":
-        date = request.form["date"]
-        name = request.form["name"]
-        purpose = request.form["purpose"]
-        price = float(request.form["price"]) if request.form.get("price") else 0
-        c.execute("UPDATE medications SET date=?, name=?, purpose=?, price=? WHERE id=?", (date, name, purpose, price, id))
-        conn.commit()
-        conn.close()
+        values = parse_form(parse_med)
+        if values is None or not save_form(LEDGER_UPDATES["medications"], values + (id,)):
+            return render_template("edit_med.html", record=request.form, batch_id=batch_id), 400
         flash("✅ تم تحديث سجل الدواء", "success")
-        return redirect(url_for("view_batch", batch_id=batch_id))
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="meds"))
     c.execute("SELECT * FROM medications WHERE id=?", (id,))
     rec = c.fetchone()
-    conn.close()
     return render_template("edit_med.html", record=rec, batch_id=batch_id)
 
 # =========================
@@ -340,22 +1854,15 @@ def edit_med(id, batch_id):
 # =========================
 @app.route("/extra/add/<int:batch_id>", methods=["GET", "POST"])
 def add_extra(batch_id):
+    require_batch(batch_id)
     if request.method == "POST":
-        date = request.form["date"]
-        name = request.form["name"]
-        price = float(request.form["price"])
-
-        conn = get_db()
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO extra_expenses (batch_id, date, name, price) VALUES (?, ?, ?, ?)",
-            (batch_id, date, name, price),
-        )
-        conn.commit()
-        conn.close()
+        parse, sql = LEDGER_INSERTS["extra_expenses"]
+        values = parse_form(parse)
+        if values is None or not save_form(sql, (batch_id,) + values):
+            return render_template("add_extra.html", batch_id=batch_id), 400
 
         flash("✅ تمت إضافة المصروف", "success")
-        return redirect(url_for("view_batch", batch_id=batch_id))
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="extras"))
 
     return render_template("add_extra.html", batch_id=batch_id)
 
@@ -365,17 +1872,13 @@ def edit_extra(id, batch_id):
     conn = get_db()
     c = conn.cursor()
     if request.method == "POST":
-        date = request.form["date"]
-        name = request.form["name"]
-        price = float(request.form["price"]) if request.form.get("price") else 0
-        c.execute("UPDATE extra_expenses SET date=?, name=?, price=? WHERE id=?", (date, name, price, id))
-        conn.commit()
-        conn.close()
+        values = parse_form(parse_extra)
+        if values is None or not save_form(LEDGER_UPDATES["extra_expenses"], values + (id,)):
+            return render_template("edit_extra.html", record=request.form, batch_id=batch_id), 400
         flash("✅ تم تحديث المصروف", "success")
-        return redirect(url_for("view_batch", batch_id=batch_id))
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="extras"))
     c.execute("SELECT * FROM extra_expenses WHERE id=?", (id,))
     rec = c.fetchone()
-    conn.close()
     return render_template("edit_extra.html", record=rec, batch_id=batch_id)
 
 # =========================
@@ -383,21 +1886,9 @@ def edit_extra(id, batch_id):
 # =========================
 @app.route("/batch/delete/<int:batch_id>")
 def delete_batch(batch_id):
-    conn = get_db()
-    c = conn.cursor()
-
-    # نحذف الدفعة وكل بياناتها التابعة
-    c.execute("DELETE FROM feed WHERE batch_id=?", (batch_id,))
-    c.execute("DELETE FROM medications WHERE batch_id=?", (batch_id,))
-    c.execute("DELETE FROM extra_expenses WHERE batch_id=?", (batch_id,))
-    c.execute("DELETE FROM mortality WHERE batch_id=?", (batch_id,))
-    c.execute("DELETE FROM sales WHERE batch_id=?", (batch_id,))
-    c.execute("DELETE FROM batches WHERE id=?", (batch_id,))
-
-    conn.commit()
-    conn.close()
+    job_id = enqueue_job(get_db(), "delete_batch", batch_id=batch_id)
 
-    flash("🗑️ تم حذف الدفعة وكل بياناتها", "warning")
+    flash(f"🗑️ جارِ حذف الدفعة وكل بياناتها في الخلفية (مهمة رقم {job_id})", "warning")
     return redirect(url_for("index"))
 
 
@@ -410,9 +1901,8 @@ def delete_feed(id, batch_id):
     c = conn.cursor()
     c.execute("DELETE FROM feed WHERE id=?", (id,))
     conn.commit()
-    conn.close()
     flash("تم حذف العلف", "warning")
-    return redirect(url_for("view_batch", batch_id=batch_id))
+    return redirect(url_for("view_batch", batch_id=batch_id, tab="feed"))
 
 
 @app.route("/med/delete/<int:id>/<int:batch_id>")
@@ -421,9 +1911,8 @@ def delete_med(id, batch_id):
     c = conn.cursor()
     c.execute("DELETE FROM medications WHERE id=?", (id,))
     conn.commit()
-    conn.close()
     flash("تم حذف الدواء", "warning")
-    return redirect(url_for("view_batch", batch_id=batch_id))
+    return redirect(url_for("view_batch", batch_id=batch_id, tab="meds"))
 
 
 @app.route("/extra/delete/<int:id>/<int:batch_id>")
@@ -432,9 +1921,8 @@ def delete_extra(id, batch_id):
     c = conn.cursor()
     c.execute("DELETE FROM extra_expenses WHERE id=?", (id,))
     conn.commit()
-    conn.close()
     flash("تم حذف المصروف", "warning")
-    return redirect(url_for("view_batch", batch_id=batch_id))
+    return redirect(url_for("view_batch", batch_id=batch_id, tab="extras"))
 
 
 # =========================
@@ -442,21 +1930,14 @@ def delete_extra(id, batch_id):
 # =========================
 @app.route("/mortality/add/<int:batch_id>", methods=["GET", "POST"])
 def add_mortality(batch_id):
+    require_batch(batch_id)
     if request.method == "POST":
-        date = request.form["date"]
-        count = int(request.form["count"]) if request.form.get("count") else 0
-        note = request.form.get("note", "")
-
-        conn = get_db()
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO mortality (batch_id, date, count, note) VALUES (?, ?, ?, ?)",
-            (batch_id, date, count, note),
-        )
-        conn.commit()
-        conn.close()
+        parse, sql = LEDGER_INSERTS["mortality"]
+        values = parse_form(parse)
+        if values is None or not save_form(sql, (batch_id,) + values):
+            return render_template("add_mortality.html", batch_id=batch_id), 400
         flash("✅ تم تسجيل النافق", "success")
-        return redirect(url_for("view_batch", batch_id=batch_id))
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="mortality"))
 
     return render_template("add_mortality.html", batch_id=batch_id)
 
@@ -466,17 +1947,13 @@ def edit_mortality(id, batch_id):
     conn = get_db()
     c = conn.cursor()
     if request.method == "POST":
-        date = request.form["date"]
-        count = int(request.form.get("count", 0) or 0)
-        note = request.form.get("note", "")
-        c.execute("UPDATE mortality SET date=?, count=?, note=? WHERE id=?", (date, count, note, id))
-        conn.commit()
-        conn.close()
+        values = parse_form(parse_mortality)
+        if values is None or not save_form(LEDGER_UPDATES["mortality"], values + (id,)):
+            return render_template("edit_mortality.html", record=request.form, batch_id=batch_id), 400
         flash("✅ تم تحديث سجل النافق", "success")
-        return redirect(url_for("view_batch", batch_id=batch_id))
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="mortality"))
     c.execute("SELECT * FROM mortality WHERE id=?", (id,))
     rec = c.fetchone()
-    conn.close()
     return render_template("edit_mortality.html", record=rec, batch_id=batch_id)
 
 @app.route("/mortality/delete/<int:id>/<int:batch_id>")
@@ -485,9 +1962,8 @@ def delete_mortality(id, batch_id):
     c = conn.cursor()
     c.execute("DELETE FROM mortality WHERE id=?", (id,))
     conn.commit()
-    conn.close()
     flash("تم حذف سجل النافق", "warning")
-    return redirect(url_for("view_batch", batch_id=batch_id))
+    return redirect(url_for("view_batch", batch_id=batch_id, tab="mortality"))
 
 
 # =========================
@@ -495,29 +1971,14 @@ def delete_mortality(id, batch_id):
 # =========================
 @app.route("/sales/add/<int:batch_id>", methods=["GET", "POST"])
 def add_sale(batch_id):
+    require_batch(batch_id)
     if request.method == "POST":
-        date = request.form["date"]
-        quantity = int(request.form.get("quantity", 0) or 0)
-        average_weight_kg = float(request.form.get("average_weight_kg", 0) or 0)
-        price_per_kg = float(request.form.get("price_per_kg", 0) or 0)
-        note = request.form.get("note", "")
-
-        total_weight_kg = quantity * average_weight_kg
-        total_price = total_weight_kg * price_per_kg
-
-        conn = get_db()
-        c = conn.cursor()
-        c.execute(
-            """
-            INSERT INTO sales (batch_id, date, quantity, average_weight_kg, price_per_kg, total_weight_kg, total_price, note)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (batch_id, date, quantity, average_weight_kg, price_per_kg, total_weight_kg, total_price, note),
-        )
-        conn.commit()
-        conn.close()
+        parse, sql = LEDGER_INSERTS["sales"]
+        values = parse_form(parse)
+        if values is None or not save_form(sql, (batch_id,) + values):
+            return render_template("add_sale.html", batch_id=batch_id), 400
         flash("✅ تم تسجيل عملية البيع", "success")
-        return redirect(url_for("view_batch", batch_id=batch_id))
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="sales"))
 
     return render_template("add_sale.html", batch_id=batch_id)
 
@@ -527,24 +1988,13 @@ def edit_sale(id, batch_id):
     conn = get_db()
     c = conn.cursor()
     if request.method == "POST":
-        date = request.form["date"]
-        quantity = int(request.form.get("quantity", 0) or 0)
-        average_weight_kg = float(request.form.get("average_weight_kg", 0) or 0)
-        price_per_kg = float(request.form.get("price_per_kg", 0) or 0)
-        total_weight_kg = quantity * average_weight_kg
-        total_price = total_weight_kg * price_per_kg
-        note = request.form.get("note", "")
-        c.execute(
-            "UPDATE sales SET date=?, quantity=?, average_weight_kg=?, price_per_kg=?, total_weight_kg=?, total_price=?, note=? WHERE id=?",
-            (date, quantity, average_weight_kg, price_per_kg, total_weight_kg, total_price, note, id),
-        )
-        conn.commit()
-        conn.close()
+        values = parse_form(parse_sale)
+        if values is None or not save_form(LEDGER_UPDATES["sales"], values + (id,)):
+            return render_template("edit_sale.html", record=request.form, batch_id=batch_id), 400
         flash("✅ تم تحديث عملية البيع", "success")
-        return redirect(url_for("view_batch", batch_id=batch_id))
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="sales"))
     c.execute("SELECT * FROM sales WHERE id=?", (id,))
     rec = c.fetchone()
-    conn.close()
     return render_template("edit_sale.html", record=rec, batch_id=batch_id)
 
 
@@ -556,26 +2006,13 @@ def edit_batch(batch_id):
     conn = get_db()
     c = conn.cursor()
     if request.method == "POST":
-        name = request.form["name"]
-        breed = request.form["breed"]
-        start_date = request.form["start_date"]
-        initial_count = int(request.form.get("initial_count", 0) or 0)
-        chick_price = float(request.form.get("chick_price", 0) or 0)
-        # handle completion and optional end date
-        end_date = request.form.get("end_date") or None
-        # if user provided an end date, treat batch as completed as well
-        is_completed = 1 if request.form.get("is_completed") or end_date else 0
-        c.execute(
-            "UPDATE batches SET name=?, breed=?, start_date=?, initial_count=?, chick_price=?, is_completed=?, end_date=? WHERE id=?",
-            (name, breed, start_date, initial_count, chick_price, is_completed, end_date, batch_id),
-        )
-        conn.commit()
-        conn.close()
+        values = parse_form(parse_batch_edit)
+        if values is None or not save_form(BATCH_UPDATE, values + (batch_id,)):
+            return render_template("edit_batch.html", batch=dict(request.form.to_dict(), id=batch_id)), 400
         flash("✅ تم تحديث بيانات الدفعة", "success")
         return redirect(url_for("index", batch_id=batch_id))
     c.execute("SELECT * FROM batches WHERE id=?", (batch_id,))
     batch = c.fetchone()
-    conn.close()
     return render_template("edit_batch.html", batch=batch)
 
 @app.route("/sales/delete/<int:id>/<int:batch_id>")
@@ -584,42 +2021,104 @@ def delete_sale(id, batch_id):
     c = conn.cursor()
     c.execute("DELETE FROM sales WHERE id=?", (id,))
     conn.commit()
-    conn.close()
     flash("تم حذف عملية البيع", "warning")
-    return redirect(url_for("view_batch", batch_id=batch_id))
+    return redirect(url_for("view_batch", batch_id=batch_id, tab="sales"))
+
+# =========================
+# ⚖️ إضافة/تعديل/حذف عينات النمو
+# =========================
+@app.route("/growth/add/<int:batch_id>", methods=["GET", "POST"])
+def add_growth(batch_id):
+    require_batch(batch_id)
+    if request.method == "POST":
+        parse, sql = LEDGER_INSERTS["growth"]
+        values = parse_form(parse)
+        if values is None or not save_form(sql, (batch_id,) + values):
+            return render_template("add_growth.html", batch_id=batch_id), 400
+        flash("✅ تم تسجيل عينة النمو", "success")
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="growth"))
+
+    return render_template("add_growth.html", batch_id=batch_id)
+
+
+@app.route("/growth/edit/<int:id>/<int:batch_id>", methods=["GET", "POST"])
+def edit_growth(id, batch_id):
+    conn = get_db()
+    c = conn.cursor()
+    if request.method == "POST":
+        values = parse_form(parse_growth)
+        if values is None or not save_form(LEDGER_UPDATES["growth"], values + (id,)):
+            return render_template("edit_growth.html", record=request.form, batch_id=batch_id), 400
+        flash("✅ تم تحديث عينة النمو", "success")
+        return redirect(url_for("view_batch", batch_id=batch_id, tab="growth"))
+    c.execute("SELECT * FROM growth WHERE id=?", (id,))
+    rec = c.fetchone()
+    return render_template("edit_growth.html", record=rec, batch_id=batch_id)
+
+
+@app.route("/growth/delete/<int:id>/<int:batch_id>")
+def delete_growth(id, batch_id):
+    conn = get_db()
+    c = conn.cursor()
+    c.execute("DELETE FROM growth WHERE id=?", (id,))
+    conn.commit()
+    flash("تم حذف عينة النمو", "warning")
+    return redirect(url_for("view_batch", batch_id=batch_id, tab="growth"))
+
+
+@app.route("/api/v1/batches/<int:batch_id>/growth/series")
+def api_growth_series(batch_id):
+    rows = growth_series(get_db().cursor(), batch_id)
+    return jsonify(columns=list(rows[0].keys()) if rows else [], rows=[list(r) for r in rows])
+
 
 # =========================
 # 📊 التقارير
 # =========================
+REPORT_QUERIES = {
+    schema: f"""
+        SELECT b.*, COALESCE(t.feed_cost,0) AS feed_cost, COALESCE(t.med_cost,0) AS med_cost,
+               COALESCE(t.extra_cost,0) AS extra_cost, COALESCE(t.mortality_count,0) AS mortality_count,
+               COALESCE(t.sold_qty,0) AS sold_qty, COALESCE(t.sold_weight,0) AS sold_weight,
+               COALESCE(t.sales_revenue,0) AS sales_revenue
+        FROM {schema}.batches b LEFT JOIN {schema}.batch_totals t ON t.batch_id = b.id
+        WHERE b.id=?
+        """
+    for schema in ("main", "archive")
+}
+PLAN_QUERIES.extend(REPORT_QUERIES.values())
+
+
+def report_batch(c, batch_id):
+    return (c.execute(REPORT_QUERIES["main"], (batch_id,)).fetchone()
+            or c.execute(REPORT_QUERIES["archive"], (batch_id,)).fetchone())
+
+
 @app.route("/report/<int:batch_id>", methods=["GET", "POST"])
 def report(batch_id):
     conn = get_db()
     c = conn.cursor()
 
-    c.execute("SELECT * FROM batches WHERE id=?", (batch_id,))
-    batch = c.fetchone()
-
-    c.execute("SELECT SUM(price) FROM feed WHERE batch_id=?", (batch_id,))
-    feed_total = c.fetchone()[0] or 0
-
-    c.execute("SELECT SUM(price) FROM medications WHERE batch_id=?", (batch_id,))
-    meds_total = c.fetchone()[0] or 0
+    batch = report_batch(c, batch_id)
+    if batch is None and g.get("snapshot"):
+        # added after the snapshot was taken
+        c = live_db().cursor()
+        batch = report_batch(c, batch_id)
+    if batch is None:
+        abort(404)
 
-    c.execute("SELECT SUM(price) FROM extra_expenses WHERE batch_id=?", (batch_id,))
-    extra_total = c.fetchone()[0] or 0
+    feed_total = batch["feed_cost"]
+    meds_total = batch["med_cost"]
+    extra_total = batch["extra_cost"]
 
     chicks_total = batch["chick_price"] * batch["initial_count"]
     total_expenses = feed_total + meds_total + extra_total + chicks_total
 
     # جمع بيانات النافق والمبيعات
-    c.execute("SELECT COALESCE(SUM(count),0) FROM mortality WHERE batch_id=?", (batch_id,))
-    total_mortality = c.fetchone()[0] or 0
-
-    c.execute("SELECT COALESCE(SUM(quantity),0), COALESCE(SUM(total_weight_kg),0), COALESCE(SUM(total_price),0) FROM sales WHERE batch_id=?", (batch_id,))
-    row = c.fetchone()
-    total_sold_qty = row[0] if row else 0
-    total_sold_weight = row[1] if row else 0
-    sales_total = row[2] if row else 0
+    total_mortality = batch["mortality_count"]
+    total_sold_qty = batch["sold_qty"]
+    total_sold_weight = batch["sold_weight"]
+    sales_total = batch["sales_revenue"]
 
     birds_remaining = max(batch["initial_count"] - total_mortality - total_sold_qty, 0)
 
@@ -630,8 +2129,14 @@ def report(batch_id):
     birds_available = None
     revenue_estimate = None
     profit_estimate = None
+    grid = None
 
-    if request.method == "POST":
+    if request.method == "POST" and request.form.get("mode") == "grid":
+        try:
+            grid = scenario_grid(request.form, birds_remaining, sales_total, total_expenses)
+        except ValueError:
+            flash("المدخلات غير صحيحة.", "danger")
+    elif request.method == "POST":
         try:
             avg_weight = float(request.form.get("average_weight_kg", "0") or 0)
             price_per_kg = float(request.form.get("price_per_kg", "0") or 0)
@@ -649,7 +2154,6 @@ def report(batch_id):
             revenue_estimate = birds_available * avg_weight * price_per_kg
             profit_estimate = revenue_estimate - total_expenses
 
-    conn.close()
     return render_template(
         "report.html",
         batch=batch,
@@ -669,13 +2173,1737 @@ def report(batch_id):
         birds_available=birds_available,
         revenue_estimate=revenue_estimate,
         profit_estimate=profit_estimate,
+        grid=grid,
     )
 
 
+GRID_MAX_STEPS = 50
+GRID_MAX_LEVELS = 10
+
+
+def _steps(lo, hi, n):
+    n = max(1, min(int(n), GRID_MAX_STEPS))
+    if n == 1 or hi == lo:
+        return [lo]
+    return [lo + (hi - lo) * i / (n - 1) for i in range(n)]
+
+
+def scenario_grid(form, birds_remaining, sales_total, total_expenses):
+    # profit = recorded sales + birds * weight * price - expenses; the weight x
+    # price revenue table is built once and scaled per extra mortality level
+    weights = _steps(float(form["weight_from"]), float(form["weight_to"]), form.get("weight_steps") or 10)
+    prices = _steps(float(form["price_from"]), float(form["price_to"]), form.get("price_steps") or 10)
+    levels = sorted({max(int(v), 0) for v in (form.get("mortality_levels") or "0").replace("،", ",").split(",") if v.strip()})
+    levels = levels[:GRID_MAX_LEVELS] or [0]
+
+    per_bird = [[w * p for p in prices] for w in weights]
+    base = sales_total - total_expenses
+    surfaces = []
+    for extra in levels:
+        birds = max(birds_remaining - extra, 0)
+        profit = [[base + birds * r for r in row] for row in per_bird]
+        # price per kg at which this weight breaks even
+        break_even = [max(-base / (birds * w), 0) if birds and w else None for w in weights]
+        surfaces.append({"mortality": extra, "birds": birds, "profit": profit, "break_even": break_even})
+    scale = max((abs(v) for s in surfaces for row in s["profit"] for v in row), default=0) or 1
+    return {"weights": weights, "prices": prices, "surfaces": surfaces, "scale": scale}
+
+
+# =========================
+# 📊 تحليلات المزرعة
+# =========================
+# Every batch in one pass each: FCR = feed kg / sold kg, cost per sold kg, and
+# the cumulative mortality curve by day of age (window SUM over each batch).
+# schema -> query; archived batches are compared too
+ANALYTICS_BATCHES = {
+    schema: full_scan_query(
+        f"""
+    WITH feed_kg AS (SELECT batch_id, SUM(quantity) AS feed_kg FROM {schema}.feed GROUP BY batch_id)
+    SELECT b.id, b.name, b.breed, b.start_date, b.end_date, b.initial_count,
+           COALESCE(f.feed_kg, 0) AS feed_kg,
+           COALESCE(t.sold_weight, 0) AS sold_weight,
+           COALESCE(t.mortality_count, 0) AS mortality_count,
+           b.chick_price * b.initial_count + COALESCE(t.feed_cost + t.med_cost + t.extra_cost, 0) AS total_cost,
+           COALESCE(t.sales_revenue, 0) AS sales_revenue,
+           f.feed_kg / NULLIF(t.sold_weight, 0) AS fcr,
+           (b.chick_price * b.initial_count + COALESCE(t.feed_cost + t.med_cost + t.extra_cost, 0))
+               / NULLIF(t.sold_weight, 0) AS cost_per_kg,
+           COALESCE(t.mortality_count, 0) * 100.0 / NULLIF(b.initial_count, 0) AS mortality_pct
+    FROM {schema}.batches b
+    LEFT JOIN {schema}.batch_totals t ON t.batch_id = b.id
+    LEFT JOIN feed_kg f ON f.batch_id = b.id
+    ORDER BY b.start_date DESC, b.id DESC
+        """,
+        "farm-wide analytics compare every batch",
+    )
+    for schema in ("main", "archive")
+}
+ANALYTICS_MORTALITY = {
+    schema: full_scan_query(
+        f"""
+    SELECT m.batch_id,
+           CAST(julianday(m.date) - julianday(b.start_date) AS INTEGER) AS age,
+           SUM(SUM(m.count)) OVER (PARTITION BY m.batch_id ORDER BY CAST(julianday(m.date) - julianday(b.start_date) AS INTEGER))
+               * 100.0 / NULLIF(b.initial_count, 0) AS cumulative_pct
+    FROM {schema}.mortality m JOIN {schema}.batches b ON b.id = m.batch_id
+    WHERE julianday(m.date) IS NOT NULL AND julianday(b.start_date) IS NOT NULL
+    GROUP BY m.batch_id, age
+    ORDER BY m.batch_id, age
+        """,
+        "farm-wide analytics draw every batch's mortality curve",
+    )
+    for schema in ("main", "archive")
+}
+
+
+def farm_analytics(c):
+    batches, curves = [], {}
+    for schema in ("main", "archive"):
+        batches += [dict(r) for r in c.execute(ANALYTICS_BATCHES[schema])]
+        for batch_id, age, pct in c.execute(ANALYTICS_MORTALITY[schema]).fetchall():
+            curves.setdefault(batch_id, []).append([age, round(pct or 0, 3)])
+    # newest first across both; a batch lives in exactly one of them
+    batches.sort(key=lambda b: (b["start_date"] or "", b["id"]), reverse=True)
+    return {"batches": batches, "mortality_curves": curves}
+
+
+@app.route("/analytics")
+def analytics():
+    data = farm_analytics(get_db().cursor())
+    # the chart stays readable with the most recent batches only
+    chart_batches = data["batches"][:12]
+    return render_template("analytics.html", chart_batches=chart_batches, **data)
+
+
+@app.route("/api/v1/analytics")
+def api_analytics():
+    return jsonify(farm_analytics(get_db().cursor()))
+
+
+# =========================
+# 🔌 واجهة JSON للأجهزة الميدانية
+# =========================
+# Lists are sent as {"columns": [...], "rows": [[...], ...]} to keep payloads
+# small; every write request is applied in a single transaction.
+app.json.ensure_ascii = False
+app.json.compact = True
+TABLE_TABS = {table: tab for tab, (table, _) in BATCH_TABS.items()}
+
+
+def api_error(status, message, **extra):
+    response = jsonify(error=message, **extra)
+    response.status_code = status
+    return response
+
+
+@app.errorhandler(HTTPException)
+def handle_http_error(e):
+    if request.path.startswith("/api/"):
+        return api_error(e.code, e.name)
+    return e
+
+
+def api_records():
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not all(isinstance(r, dict) for r in data):
+        abort(400)
+    return data
+
+
+def api_rows(cursor):
+    return {"columns": [d[0] for d in cursor.description], "rows": [list(r) for r in cursor.fetchall()]}
+
+
+def parse_api_records(records, parse, table=None):
+    values, errors = [], []
+    for index, record in enumerate(records):
+        try:
+            values.append(parse(record))
+        except (KeyError, ValueError, TypeError) as e:
+            message = f"missing field {e}" if isinstance(e, KeyError) else str(e)
+            errors.append({"index": index, "error": message, **({"table": table} if table else {})})
+    return values, errors
+
+
+def missing_batches(c, batch_ids):
+    missing = []
+    for batch_id in sorted(set(batch_ids)):
+        c.execute("SELECT 1 FROM batches WHERE id = ?", (batch_id,))
+        if c.fetchone() is None:
+            missing.append(batch_id)
+    return missing
+
+
+def insert_ledger_rows(c, grouped):
+    # grouped: {table: [(batch_id, parsed values), ...]} -> {table: [new ids]}
+    ids = {}
+    for table, rows in grouped.items():
+        sql = LEDGER_INSERTS[table][1]
+        ids[table] = []
+        for batch_id, values in rows:
+            c.execute(sql, (batch_id,) + values)
+            ids[table].append(c.lastrowid)
+    return ids
+
+
+def write_ledger_rows(grouped):
+    conn = get_db()
+    c = conn.cursor()
+    missing = missing_batches(c, [b for rows in grouped.values() for b, _ in rows])
+    if missing:
+        return api_error(404, "unknown batch", batch_ids=missing)
+    with conn:
+        ids = insert_ledger_rows(c, grouped)
+    return jsonify(ids=ids), 201
+
+
+API_BATCHES = full_scan_query(
+    "SELECT b.*, t.* FROM batches b LEFT JOIN batch_totals t ON t.batch_id = b.id ORDER BY b.id",
+    "field devices download every batch in main with its totals",
+)
+
+
+@app.route("/api/v1/batches", methods=["GET", "POST"])
+def api_batches():
+    conn = get_db()
+    c = conn.cursor()
+    if request.method == "GET":
+        c.execute(API_BATCHES)
+        return jsonify(api_rows(c))
+
+    values, errors = parse_api_records(api_records(), parse_batch)
+    if errors:
+        return api_error(400, "invalid records", errors=errors)
+    ids = []
+    with conn:
+        for v in values:
+            c.execute(BATCH_INSERT, v)
+            ids.append(c.lastrowid)
+    return jsonify(ids=ids), 201
+
+
+@app.route("/api/v1/batches/<int:batch_id>", methods=["GET", "PUT", "DELETE"])
+def api_batch(batch_id):
+    conn = get_db()
+    c = conn.cursor()
+    if request.method == "PUT":
+        records = api_records()
+        values, errors = parse_api_records(records[:1], parse_batch_edit)
+        if errors or len(records) != 1:
+            return api_error(400, "invalid record", errors=errors)
+        with conn:
+            c.execute(BATCH_UPDATE, values[0] + (batch_id,))
+        if c.rowcount == 0:
+            abort(404)
+    elif request.method == "DELETE":
+        if c.execute("SELECT 1 FROM batches WHERE id = ?", (batch_id,)).fetchone() is None:
+            abort(404)
+        job_id = enqueue_job(conn, "delete_batch", batch_id=batch_id)
+        return api_job_accepted(job_id)
+
+    c.execute("SELECT b.*, t.* FROM batches b LEFT JOIN batch_totals t ON t.batch_id = b.id WHERE b.id = ?", (batch_id,))
+    row = c.fetchone()
+    if row is None:
+        # archived batches read the same, from the archive
+        c.execute(
+            "SELECT b.*, t.* FROM archive.batches b LEFT JOIN archive.batch_totals t ON t.batch_id = b.id WHERE b.id = ?",
+            (batch_id,),
+        )
+        row = c.fetchone()
+    if row is None:
+        abort(404)
+    return jsonify(dict(row))
+
+
+@app.route("/api/v1/batches/<int:batch_id>/<table>", methods=["GET", "POST"])
+def api_batch_ledger(batch_id, table):
+    if table not in LEDGER_INSERTS:
+        abort(404)
+    if request.method == "GET":
+        after = None
+        if request.args.get("after_id"):
+            after = (request.args.get("after_date", ""), request.args.get("after_id", type=int))
+        limit = min(max(request.args.get("limit", app.config["TAB_PAGE_SIZE"], type=int), 1), 500)
+        c = get_db().cursor()
+        # archived batches page through the archive's copy of the ledger
+        schema = batch_schema(c, batch_id)
+        if schema is None:
+            abort(404)
+        rows, cursor = fetch_tab_page(c, batch_id, TABLE_TABS[table], after, limit, schema)
+        return jsonify(
+            columns=list(rows[0].keys()) if rows else [],
+            rows=[list(r) for r in rows],
+            next={"after_date": cursor[0], "after_id": cursor[1]} if cursor else None,
+        )
+
+    values, errors = parse_api_records(api_records(), LEDGER_INSERTS[table][0], table)
+    if errors:
+        return api_error(400, "invalid records", errors=errors)
+    return write_ledger_rows({table: [(batch_id, v) for v in values]})
+
+
+@app.route("/api/v1/records", methods=["POST"])
+def api_bulk_records():
+    # {"feed": [{"batch_id": 1, ...}], "mortality": [...], ...} in one transaction
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not set(data) <= set(LEDGER_INSERTS):
+        return api_error(400, "expected an object keyed by ledger", ledgers=list(LEDGER_INSERTS))
+    grouped, errors = {}, []
+    for table, records in data.items():
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            return api_error(400, "expected a list of records", table=table)
+        parse = LEDGER_INSERTS[table][0]
+        values, table_errors = parse_api_records(records, lambda r: (int(r["batch_id"]), parse(r)), table)
+        errors += table_errors
+        grouped[table] = values
+    if errors:
+        return api_error(400, "invalid records", errors=errors)
+    return write_ledger_rows(grouped)
+
+
+@app.route("/api/v1/<table>/<int:id>", methods=["GET", "PUT", "DELETE"])
+def api_ledger_record(table, id):
+    if table not in LEDGER_INSERTS:
+        abort(404)
+    conn = get_db()
+    c = conn.cursor()
+    if request.method == "PUT":
+        records = api_records()
+        values, errors = parse_api_records(records[:1], LEDGER_INSERTS[table][0], table)
+        if errors or len(records) != 1:
+            return api_error(400, "invalid record", errors=errors)
+        with conn:
+            c.execute(LEDGER_UPDATES[table], values[0] + (id,))
+        if c.rowcount == 0:
+            abort(404)
+    elif request.method == "DELETE":
+        with conn:
+            c.execute(f"DELETE FROM {table} WHERE id=?", (id,))
+        if c.rowcount == 0:
+            abort(404)
+        return "", 204
+
+    c.execute(f"SELECT * FROM {table} WHERE id=?", (id,))
+    row = c.fetchone()
+    if row is None:
+        abort(404)
+    return jsonify(dict(row))
+
+
+# =========================
+# 📥 استيراد السجلات
+# =========================
+app.config["IMPORT_CHUNK_SIZE"] = int(os.environ.get("IMPORT_CHUNK_SIZE", 500))
+# only the first errors are kept so a bad file cannot grow the report without bound
+IMPORT_MAX_ERRORS = 100
+
+
+def iter_import_rows(stream, fmt):
+    # yields (line number, row mapping or parse error) without reading the whole file
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {k.strip(): v for k, v in row.items() if k}
+    else:
+        for lineno, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield lineno, e
+                continue
+            yield lineno, row if isinstance(row, dict) else ValueError("expected a JSON object")
+
+
+def import_records(conn, table, rows, batch_id=None, chunk_size=None, progress=None):
+    parse, sql = LEDGER_INSERTS[table]
+    chunk_size = chunk_size or app.config["IMPORT_CHUNK_SIZE"]
+    # batch id -> exists, looked up once per batch the file mentions
+    known = {}
+    report = {"table": table, "inserted": 0, "failed": 0, "errors": []}
+    # (line, values) waiting for the next insert
+    chunk = []
+
+    def fail(lineno, message):
+        report["failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS:
+            report["errors"].append({"line": lineno, "error": message})
+
+    def exists(batch):
+        if batch not in known:
+            known[batch] = conn.execute("SELECT 1 FROM batches WHERE id = ?", (batch,)).fetchone() is not None
+        return known[batch]
+
+    def flush():
+        try:
+            conn.executemany(sql, [values for _, values in chunk])
+        except sqlite3.IntegrityError:
+            # a batch deleted since it was looked up: its rows fail like any unknown batch's
+            conn.rollback()
+            known.clear()
+            for lineno, values in chunk:
+                if not exists(values[0]):
+                    fail(lineno, f"unknown batch {values[0]}")
+            chunk[:] = [(lineno, values) for lineno, values in chunk if known[values[0]]]
+            conn.executemany(sql, [values for _, values in chunk])
+        report["inserted"] += len(chunk)
+        refit_forecasts(conn)
+        if progress:
+            progress(report["inserted"])
+        conn.commit()
+        chunk.clear()
+
+    for lineno, row in rows:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            row_batch = int(row.get("batch_id") or batch_id or 0)
+            if not exists(row_batch):
+                raise ValueError(f"unknown batch {row_batch}")
+            chunk.append((lineno, (row_batch,) + parse(row)))
+        except (KeyError, ValueError, TypeError) as e:
+            fail(lineno, f"missing field {e}" if isinstance(e, KeyError) else str(e))
+            continue
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return report
+
+
+def import_format(filename, default="csv"):
+    ext = os.path.splitext(filename or "")[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(ext, default)
+
+
+@app.route("/import", methods=["GET", "POST"])
+def import_view():
+    batch_id = request.values.get("batch_id", type=int)
+    if request.method == "GET":
+        return render_template("import.html", batch_id=batch_id, tables=LEDGER_INSERTS, report=None)
+
+    table = request.values.get("table", "")
+    if table not in LEDGER_INSERTS:
+        abort(400)
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, fmt = upload.stream, import_format(upload.filename)
+    else:
+        # raw body upload, e.g. curl --data-binary @feed.jsonl -H "Content-Type: application/x-ndjson"
+        stream = request.stream
+        fmt = "csv" if request.mimetype in ("text/csv", "application/csv") else "jsonl"
+    fmt = request.values.get("format") or fmt
+
+    if request.values.get("background"):
+        # the upload is spooled to disk so the job can read it after this request ends
+        upload_dir = job_upload_dir(current_db_path())
+        os.makedirs(upload_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix="." + fmt, dir=upload_dir)
+        with os.fdopen(fd, "wb") as fh:
+            while chunk := stream.read(64 * 1024):
+                fh.write(chunk)
+        job_id = enqueue_job(get_db(), "import_records", table=table, path=path, format=fmt, batch_id=batch_id)
+        if request.accept_mimetypes.best == "text/html":
+            flash(f"📥 جارِ الاستيراد في الخلفية (مهمة رقم {job_id})", "info")
+            return redirect(url_for("jobs_view"))
+        return api_job_accepted(job_id)
+
+    report = import_records(get_db(), table, iter_import_rows(stream, fmt), batch_id)
+    if request.accept_mimetypes.best == "text/html":
+        return render_template("import.html", batch_id=batch_id, tables=LEDGER_INSERTS, report=report)
+    return jsonify(report)
+
+
+@app.cli.command("import-records")
+@click.argument("table", type=click.Choice(list(LEDGER_INSERTS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-id", type=int, help="Batch for rows without a batch_id column.")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+def import_records_command(table, path, batch_id, fmt):
+    """Stream-import ledger rows from a CSV or JSONL file."""
+    conn = connect_db()
+    with open(path, "rb") as fh:
+        report = import_records(conn, table, iter_import_rows(fh, fmt or import_format(path)), batch_id)
+    conn.close()
+    click.echo(json.dumps(report, ensure_ascii=False, indent=2))
+    if report["failed"]:
+        raise SystemExit(1)
+
+
+# =========================
+# 📤 تصدير البيانات
+# =========================
+EXPORT_TABLES = ("batches",) + LEDGER_TABLES + ("growth",)
+app.config["EXPORT_FETCH_SIZE"] = int(os.environ.get("EXPORT_FETCH_SIZE", 1000))
+
+
+EXPORT_BATCHES = {
+    schema: full_scan_query(f"SELECT * FROM {schema}.batches ORDER BY id", "a farm export holds every batch")
+    for schema in ("main", "archive")
+}
+
+
+def export_query(table, batch_id=None, schema="main"):
+    if table == "batches":
+        if batch_id:
+            return f"SELECT * FROM {schema}.batches WHERE id = ?", (batch_id,)
+        return EXPORT_BATCHES[schema], ()
+    if batch_id:
+        return f"SELECT * FROM {schema}.{table} WHERE batch_id = ? ORDER BY date, id", (batch_id,)
+    return f"SELECT * FROM {schema}.{table} ORDER BY batch_id, date, id", ()
+
+
+PLAN_QUERIES.extend(
+    export_query(t, b, schema)[0] for t in EXPORT_TABLES for b in (None, 1) for schema in ("main", "archive")
+)
+
+
+def iter_export_chunks(conn, table, batch_id=None):
+    # header first, then lists of rows pulled from the cursor with fetchmany(); archived
+    # batches follow the ones still in main (init_archive keeps their columns the same)
+    cursors = [conn.execute(*export_query(table, batch_id, schema)) for schema in ("main", "archive")]
+    yield [d[0] for d in cursors[0].description]
+    for cur in cursors:
+        while True:
+            rows = cur.fetchmany(app.config["EXPORT_FETCH_SIZE"])
+            if not rows:
+                break
+            yield rows
+
+
+def stream_csv(conn, table, batch_id=None):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    # BOM so spreadsheet apps open the Arabic text as UTF-8
+    yield "\ufeff"
+    chunks = iter_export_chunks(conn, table, batch_id)
+    writer.writerow(next(chunks))
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+
+class _ZipSink:
+    # write-only target for ZipFile; without tell()/seek() it writes entries
+    # with data descriptors, so finished bytes can be handed out right away
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{sheets}</Types>'
+)
+_XLSX_SHEET_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>{sheets}</sheets></workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>'
+)
+_XLSX_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_XLSX_SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def _xlsx_row(values):
+    cells = []
+    for v in values:
+        if v is None:
+            cells.append("<c/>")
+        elif isinstance(v, (int, float)):
+            cells.append(f"<c><v>{v!r}</v></c>")
+        else:
+            text = escape("".join(ch for ch in str(v) if ch >= " " or ch in "\t\n"))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return "<row>" + "".join(cells) + "</row>"
+
+
+def stream_xlsx(conn, tables, batch_id=None):
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        numbered = list(enumerate(tables, 1))
+        zf.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES.format(
+            sheets="".join(_XLSX_SHEET_TYPE.format(n=n) for n, _ in numbered)))
+        zf.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _XLSX_WORKBOOK.format(sheets="".join(
+            f'<sheet name="{t}" sheetId="{n}" r:id="rId{n}"/>' for n, t in numbered)))
+        zf.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS.format(rels="".join(
+            f'<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{n}.xml"/>' for n, _ in numbered)))
+        # all sheets come from one read transaction so the workbook is consistent
+        conn.execute("BEGIN")
+        try:
+            for n, table in numbered:
+                with zf.open(f"xl/worksheets/sheet{n}.xml", "w", force_zip64=True) as fh:
+                    fh.write(_XLSX_SHEET_HEAD.encode())
+                    chunks = iter_export_chunks(conn, table, batch_id)
+                    fh.write(_xlsx_row(next(chunks)).encode())
+                    for rows in chunks:
+                        fh.write("".join(_xlsx_row(r) for r in rows).encode())
+                        yield sink.drain()
+                    fh.write(_XLSX_SHEET_TAIL.encode())
+                yield sink.drain()
+        finally:
+            conn.rollback()
+    yield sink.drain()
+
+
+def _attachment(name):
+    return {"Content-Disposition": f"attachment; filename={name}"}
+
+
+@app.route("/export.xlsx", defaults={"batch_id": None})
+@app.route("/batch/<int:batch_id>/export.xlsx")
+def export_xlsx(batch_id):
+    name = f"batch-{batch_id}.xlsx" if batch_id else f"farm-{date.today().isoformat()}.xlsx"
+    return app.response_class(
+        stream_with_context(stream_xlsx(get_db(), EXPORT_TABLES, batch_id)),
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers=_attachment(name),
+    )
+
+
+@app.route("/export/<table>.csv", defaults={"batch_id": None})
+@app.route("/batch/<int:batch_id>/export/<table>.csv")
+def export_csv(table, batch_id):
+    if table not in EXPORT_TABLES:
+        abort(404)
+    name = f"batch-{batch_id}-{table}.csv" if batch_id else f"{table}.csv"
+    return app.response_class(
+        stream_with_context(stream_csv(get_db(), table, batch_id)),
+        mimetype="text/csv",
+        headers=_attachment(name),
+    )
+
+
+# =========================
+# 🔍 البحث
+# =========================
+# one FTS5 table over every searchable text; the rowid encodes the source row as id * 8 + table
+# code, so triggers reach an entry without scanning. unicode61 splits Arabic words at harakat,
+# so the indexed column holds the text folded (no harakat or tatweel, one alef, ه for ة, ي for ى)
+# and queries are folded the same way. Folding only unifies spellings of a letter; it never drops
+# a letter such as the ال of a word. Results show the text as written: the snippet is cut from
+# the unfolded body, with the matched words found through the folded copy.
+# Search covers main only: archived rows leave the index with the batch and return on restore.
+SEARCH_SOURCES = {
+    # table: (code, text columns)
+    "batches": (1, ("name", "breed")),
+    "feed": (2, ("feed_type",)),
+    "medications": (3, ("name", "purpose")),
+    "extra_expenses": (4, ("name",)),
+    "mortality": (5, ("note",)),
+    "sales": (6, ("note",)),
+}
+SEARCH_CODES = {code: table for table, (code, _) in SEARCH_SOURCES.items()}
+ARABIC_FOLD = dict(
+    [(chr(c), "") for c in range(0x064B, 0x0653)]
+    + [("\u0670", ""), ("\u0640", ""), ("أ", "ا"), ("إ", "ا"), ("آ", "ا"), ("ٱ", "ا"), ("ة", "ه"), ("ى", "ي")]
+)
+ARABIC_FOLD_TABLE = str.maketrans(ARABIC_FOLD)
+app.config["SEARCH_PAGE_SIZE"] = int(os.environ.get("SEARCH_PAGE_SIZE", 20))
+
+SEARCH_QUERY = (
+    "SELECT s.rowid, s.batch_id, s.date, b.name AS batch_name, s.body "
+    "FROM search_index s LEFT JOIN batches b ON b.id = s.batch_id "
+    "WHERE search_index MATCH ? ORDER BY s.rank LIMIT ? OFFSET ?"
+)
+# words around the first match in a snippet, as FTS5's snippet() would give
+SNIPPET_WORDS = 12
+SEARCH_COUNT = "SELECT COUNT(*) FROM search_index WHERE search_index MATCH ?"
+SEARCH_CLEAR = full_scan_query("DELETE FROM search_index", "rebuild-search empties the whole index")
+PLAN_QUERIES.extend([SEARCH_QUERY, SEARCH_COUNT])
+
+
+def fold_sql(expr):
+    for char, repl in ARABIC_FOLD.items():
+        expr = f"replace({expr}, '{char}', '{repl}')"
+    return expr
+
+
+def _search_entry(table, row):
+    # (rowid, folded text, text, batch_id, date) expressions for NEW/OLD or a plain table alias
+    code, columns = SEARCH_SOURCES[table]
+    text = " || ' ' || ".join(f"COALESCE({row}.{col}, '')" for col in columns)
+    batch, day = ("id", "start_date") if table == "batches" else ("batch_id", "date")
+    return f"{row}.id * 8 + {code}", fold_sql(text), text, f"{row}.{batch}", f"{row}.{day}"
+
+
+def _search_insert(table, row, source=""):
+    rowid, folded, body, batch, day = _search_entry(table, row)
+    return (
+        f"INSERT INTO search_index (rowid, folded, body, batch_id, date) "
+        f"SELECT {rowid}, {folded}, {body}, {batch}, {day} {source} WHERE trim({folded}) != ''"
+    )
+
+
+def create_search_triggers(c):
+    for table, (code, columns) in SEARCH_SOURCES.items():
+        watched = ", ".join(columns + (("start_date",) if table == "batches" else ("batch_id", "date")))
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_search_ins AFTER INSERT ON {table} BEGIN
+            {_search_insert(table, "NEW")};
+        END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_search_del AFTER DELETE ON {table} BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + {code};
+        END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_search_upd AFTER UPDATE OF {watched} ON {table} BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + {code};
+            {_search_insert(table, "NEW")};
+        END''')
+
+
+def rebuild_search_index(conn):
+    conn.execute(SEARCH_CLEAR)
+    for table in SEARCH_SOURCES:
+        conn.execute(_search_insert(table, "t", f"FROM {table} t"))
+    conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+
+@app.cli.command("rebuild-search")
+def rebuild_search_command():
+    """Rebuild the full-text search index from the source tables."""
+    conn = connect_db()
+    with conn:
+        rebuild_search_index(conn)
+    conn.close()
+    click.echo("search index rebuilt")
+
+
+def search_words(q):
+    return q.translate(ARABIC_FOLD_TABLE).replace('"', " ").split()
+
+
+def search_match(q):
+    # every word must appear, as a word or the start of one; quoting keeps FTS5 syntax out
+    return " ".join(f'"{w}"*' for w in search_words(q))
+
+
+def search_snippet(text, words):
+    # the text as written, cut to SNIPPET_WORDS words around the first match, matched words
+    # between \x02 and \x03. Folding maps a character to one or none, so each folded
+    # character remembers where it came from.
+    folded, origin = [], []
+    for i, char in enumerate(text):
+        char = char.translate(ARABIC_FOLD_TABLE)
+        if char:
+            folded.append(char)
+            origin.append(i)
+    folded = "".join(folded).lower()
+    prefixes = tuple(w.lower() for w in words)
+    tokens = [m.span() for m in re.finditer(r"[^\W_]+", folded)]
+    if not tokens:
+        return text
+    hits = [i for i, (a, _) in enumerate(tokens) if folded.startswith(prefixes, a)]
+    first = max(0, min((hits or [0])[0] - 2, len(tokens) - SNIPPET_WORDS))
+    last = min(first + SNIPPET_WORDS, len(tokens))
+
+    def end(b):
+        # past the harakat and tatweel that follow the token's last letter
+        b = origin[b - 1] + 1
+        while b < len(text) and not text[b].translate(ARABIC_FOLD_TABLE):
+            b += 1
+        return b
+
+    out = ["…" if first else ""]
+    pos = origin[tokens[first][0]]
+    for i in range(first, last):
+        a, b = origin[tokens[i][0]], end(tokens[i][1])
+        if i in hits:
+            out += [text[pos:a], "\x02", text[a:b], "\x03"]
+            pos = b
+    out.append(text[pos:end(tokens[last - 1][1])])
+    out.append("…" if last < len(tokens) else "")
+    return "".join(out)
+
+
+def _snippet_html(text):
+    return Markup(escape(text or "").replace("\x02", "<mark>").replace("\x03", "</mark>"))
+
+
+def search_records(c, q, page=1, limit=None):
+    limit = limit or app.config["SEARCH_PAGE_SIZE"]
+    words = search_words(q)
+    match = search_match(q)
+    if not match:
+        return [], 0
+    total = c.execute(SEARCH_COUNT, (match,)).fetchone()[0]
+    results = []
+    for r in c.execute(SEARCH_QUERY, (match, limit, (page - 1) * limit)).fetchall():
+        table = SEARCH_CODES[r["rowid"] % 8]
+        results.append({
+            "table": table,
+            "id": r["rowid"] // 8,
+            "batch_id": r["batch_id"],
+            "batch_name": r["batch_name"],
+            "date": r["date"],
+            "snippet": search_snippet(r["body"], words),
+        })
+    return results, total
+
+
+@app.route("/search")
+def search():
+    q = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    limit = min(max(request.args.get("limit", app.config["SEARCH_PAGE_SIZE"], type=int), 1), 100)
+    results, total = search_records(get_db().cursor(), q, page, limit)
+    if request.args.get("format") == "json":
+        return jsonify(q=q, page=page, total=total, results=[
+            dict(r, snippet=r["snippet"].replace("\x02", "").replace("\x03", "")) for r in results
+        ])
+    for r in results:
+        r["snippet_html"] = _snippet_html(r["snippet"])
+        r["tab"] = TABLE_TABS.get(r["table"])
+    pages = (total + limit - 1) // limit
+    return render_template("search.html", q=q, page=page, pages=pages, total=total, results=results)
+
+
+# =========================
+# 🔄 المزامنة
+# =========================
+# triggers append (seq, table, row id, op) to `changes` on every write; /sync?since=<seq> sends the
+# current version of each row touched after seq, so a client catches up in proportion to what
+# changed. since=0, or a seq older than the pruned log, gets every row instead ("reset").
+SYNC_TABLES = ("batches",) + LEDGER_TABLES + ("growth",)
+SYNC_OPS = {"INSERT": "i", "UPDATE": "u", "DELETE": "d"}
+app.config["SYNC_KEEP_DAYS"] = int(os.environ.get("SYNC_KEEP_DAYS", 90))
+
+# one MIN or MAX reads a single end of the primary key; both in one SELECT scan the table
+SYNC_RANGE = "SELECT (SELECT MIN(seq) FROM changes) AS first, (SELECT MAX(seq) FROM changes) AS last"
+SYNC_CHANGED = {
+    t: f"SELECT * FROM {t} WHERE id IN (SELECT row_id FROM changes WHERE tbl = '{t}' AND seq > ? AND seq <= ?)"
+    for t in SYNC_TABLES
+}
+SYNC_DELETED = {
+    t: f"SELECT row_id FROM changes ch WHERE tbl = '{t}' AND seq > ? AND seq <= ? AND op = 'd' "
+    f"AND NOT EXISTS (SELECT 1 FROM {t} WHERE id = ch.row_id)"
+    for t in SYNC_TABLES
+}
+PLAN_QUERIES.extend(list(SYNC_CHANGED.values()) + list(SYNC_DELETED.values()))
+
+
+def create_change_triggers(c):
+    for table in SYNC_TABLES:
+        # growth's derived columns are rewritten wholesale; only rows that really differ are logged
+        columns = [r[1] for r in c.execute(f"PRAGMA table_info({table})").fetchall()]
+        differs = " OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in columns)
+        batch = "id" if table == "batches" else "batch_id"
+        for event, op in SYNC_OPS.items():
+            row = "OLD" if event == "DELETE" else "NEW"
+            when = f"WHEN {differs}" if event == "UPDATE" else ""
+            if event == "DELETE":
+                when = f"WHEN NOT EXISTS (SELECT 1 FROM archive_moves WHERE batch_id = OLD.{batch})"
+            c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_{op} AFTER {event} ON {table} {when} BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('{table}', {row}.id, '{op}');
+            END''')
+
+
+def _sync_line(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def stream_changes(conn, since):
+    # NDJSON: a header, then per table its column names, row value arrays and deleted ids;
+    # the last line carries the seq to ask from next time, a stream without it was cut off
+    conn.execute("BEGIN")
+    try:
+        first, last = conn.execute(SYNC_RANGE).fetchone()
+        last = last or 0
+        # a seq this database never handed out (restored from a backup, another farm) resyncs too
+        reset = since <= 0 or since > last or (first is not None and since + 1 < first)
+        yield _sync_line({"since": since, "reset": reset})
+        for table in SYNC_TABLES:
+            if reset:
+                chunks = iter_export_chunks(conn, table)
+            else:
+                cur = conn.execute(SYNC_CHANGED[table], (since, last))
+                chunks = iter([[d[0] for d in cur.description], cur.fetchall()])
+            columns = next(chunks)
+            for i, rows in enumerate(r for r in chunks if r):
+                if i == 0:
+                    yield _sync_line({"table": table, "columns": columns})
+                yield "".join(_sync_line(list(r)) for r in rows)
+            if not reset:
+                deleted = list(dict.fromkeys(r[0] for r in conn.execute(SYNC_DELETED[table], (since, last))))
+                if deleted:
+                    yield _sync_line({"table": table, "deleted": deleted})
+        yield _sync_line({"seq": last})
+    finally:
+        conn.rollback()
+
+
+@app.route("/sync")
+def sync():
+    since = request.args.get("since", 0, type=int)
+    if since < 0:
+        abort(400)
+    return app.response_class(stream_with_context(stream_changes(get_db(), since)), mimetype="application/x-ndjson")
+
+
+def prune_changes(conn, days=None):
+    days = app.config["SYNC_KEEP_DAYS"] if days is None else days
+    # the newest entry always stays, it is what tells an old client its seq was pruned
+    with conn:
+        return conn.execute(
+            "DELETE FROM changes WHERE at < strftime('%s','now') - ? AND seq < (SELECT MAX(seq) FROM changes)",
+            (days * 86400,),
+        ).rowcount
+
+
+@app.cli.command("prune-changes")
+@click.option("--days", type=int, help="Keep this many days of changes (default SYNC_KEEP_DAYS).")
+def prune_changes_command(days):
+    """Drop old entries from the sync change log; clients further behind resync in full."""
+    conn = connect_db()
+    click.echo(f"{prune_changes(conn, days)} changes pruned")
+    conn.close()
+
+
+# =========================
+# 🧵 المهام الخلفية
+# =========================
+app.config.update(
+    JOB_WORKERS=int(os.environ.get("JOB_WORKERS", 2)),
+    # rows per transaction when a job deletes a batch
+    JOB_DELETE_CHUNK=int(os.environ.get("JOB_DELETE_CHUNK", 500)),
+    JOB_UPLOAD_DIR=os.environ.get("JOB_UPLOAD_DIR") or os.path.join(tempfile.gettempdir(), "poultry-jobs"),
+)
+
+# kind -> (handler(conn, params, progress), safe to run again after a crash)
+JOB_HANDLERS = {}
+JOBS_PENDING = "SELECT params FROM jobs WHERE status IN ('queued', 'running')"
+# kinds the JSON API may enqueue directly; imports need an upload and go through /import
+JOB_API_KINDS = ("delete_batch", "rebuild_totals", "rebuild_forecasts", "archive_batches", "snapshot")
+
+_job_executor = None
+_job_executor_pid = None
+_job_executor_lock = threading.Lock()
+
+
+def job_handler(kind, resumable=False):
+    def register(fn):
+        JOB_HANDLERS[kind] = (fn, resumable)
+        return fn
+    return register
+
+
+def job_executor():
+    global _job_executor, _job_executor_pid
+    with _job_executor_lock:
+        # worker threads do not survive a fork; a child starts its own
+        if _job_executor is None or _job_executor_pid != os.getpid():
+            _job_executor = ThreadPoolExecutor(app.config["JOB_WORKERS"], thread_name_prefix="job")
+            _job_executor_pid = os.getpid()
+        return _job_executor
+
+
+def job_upload_dir(path):
+    # one directory per database, so sweeping one farm's spools leaves the others alone
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+    return os.path.join(app.config["JOB_UPLOAD_DIR"], digest)
+
+
+def discard_job_upload(params):
+    # an import's spooled upload goes once its job is done, failed or interrupted
+    try:
+        os.remove(params["path"])
+    except (KeyError, FileNotFoundError):
+        pass
+
+
+def sweep_job_uploads(conn, path):
+    # spools no queued or running job points at, e.g. left by a crash between spooling and enqueueing
+    upload_dir = job_upload_dir(path)
+    if not os.path.isdir(upload_dir):
+        return 0
+    pending = {json.loads(r["params"]).get("path") for r in conn.execute(JOBS_PENDING)}
+    removed = 0
+    for entry in os.scandir(upload_dir):
+        if entry.is_file() and entry.path not in pending:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+def submit_job(path, job_id):
+    future = job_executor().submit(run_job, path, job_id)
+    # errors inside a handler are stored on the job; this catches the ones before it could be claimed
+    future.add_done_callback(lambda f: f.exception() and app.logger.error("job %d could not run: %r", job_id, f.exception()))
+
+
+def enqueue_job(conn, kind, db_path=None, **params):
+    with conn:
+        job_id = conn.execute("INSERT INTO jobs (kind, params) VALUES (?, ?)", (kind, json.dumps(params))).lastrowid
+    submit_job(db_path or current_db_path(), job_id)
+    return job_id
+
+
+def run_job(path, job_id):
+    pool = get_pool(path)
+    conn = pool.acquire()
+    try:
+        with conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status='running', started_at=datetime('now') WHERE id=? AND status='queued'", (job_id,)
+            ).rowcount
+        if not claimed:
+            return
+        job = conn.execute("SELECT kind, params FROM jobs WHERE id=?", (job_id,)).fetchone()
+        params = json.loads(job["params"])
+
+        def progress(done, total=None):
+            # handlers call this before committing, so progress lands with the work it describes
+            conn.execute("UPDATE jobs SET done=?, total=COALESCE(?, total) WHERE id=?", (done, total, job_id))
+
+        try:
+            result = JOB_HANDLERS[job["kind"]][0](conn, params, progress)
+        except Exception as e:
+            conn.rollback()
+            app.logger.exception("job %d (%s) failed", job_id, job["kind"])
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET status='failed', error=?, finished_at=datetime('now') WHERE id=?",
+                    (f"{type(e).__name__}: {e}", job_id),
+                )
+        else:
+            with conn:
+                refit_forecasts(conn)
+                conn.execute(
+                    "UPDATE jobs SET status='done', result=?, finished_at=datetime('now') WHERE id=?",
+                    (json.dumps(result, ensure_ascii=False), job_id),
+                )
+        discard_job_upload(params)
+    finally:
+        pool.release(conn)
+
+
+def resume_jobs(path=None):
+    # jobs cut off by a restart: rerun the ones that are safe to repeat, fail the rest.
+    # Runs before this process serves requests, so no upload is being spooled meanwhile.
+    path = path or app.config["DB_PATH"]
+    conn = connect_db(path)
+    with conn:
+        for job in conn.execute("SELECT id, kind, params FROM jobs WHERE status = 'running'").fetchall():
+            if JOB_HANDLERS.get(job["kind"], (None, False))[1]:
+                conn.execute("UPDATE jobs SET status='queued' WHERE id=?", (job["id"],))
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status='failed', error='interrupted by a restart', finished_at=datetime('now') WHERE id=?",
+                    (job["id"],),
+                )
+                discard_job_upload(json.loads(job["params"]))
+    sweep_job_uploads(conn, path)
+    queued = [r["id"] for r in conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id")]
+    conn.close()
+    for job_id in queued:
+        submit_job(path, job_id)
+    return len(queued)
+
+
+@job_handler("delete_batch", resumable=True)
+def delete_batch_job(conn, params, progress):
+    return delete_batch_rows(conn, params["batch_id"], progress=progress)
+
+
+@job_handler("rebuild_totals", resumable=True)
+def rebuild_totals_job(conn, params, progress):
+    rebuild_batch_totals(conn)
+    rebuild_period_totals(conn, "main")
+    rebuild_period_totals(conn, "archive")
+    conn.execute(ARCHIVE_TOTALS_REFRESH)
+    progress(1, 1)
+    conn.commit()
+    return {}
+
+
+@job_handler("rebuild_forecasts", resumable=True)
+def rebuild_forecasts_job(conn, params, progress):
+    count = rebuild_forecasts(conn)
+    progress(count, count)
+    conn.commit()
+    return {"batches": count}
+
+
+@job_handler("import_records")
+def import_records_job(conn, params, progress):
+    # run_job removes the spooled upload afterwards
+    with open(params["path"], "rb") as fh:
+        rows = iter_import_rows(fh, params["format"])
+        return import_records(conn, params["table"], rows, params.get("batch_id"), progress=progress)
+
+
+def job_dict(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["progress"] = round(job["done"] / job["total"], 4) if job["total"] else None
+    return job
+
+
+JOBS_RECENT = full_scan_query(
+    "SELECT * FROM jobs ORDER BY id DESC LIMIT ?", "walks the rowid backwards and stops after LIMIT rows"
+)
+
+
+def api_job_accepted(job_id):
+    response = jsonify(id=job_id, status="queued", url=url_for("api_job", job_id=job_id))
+    response.status_code = 202
+    response.headers["Location"] = url_for("api_job", job_id=job_id)
+    return response
+
+
+@app.route("/jobs")
+def jobs_view():
+    jobs = [job_dict(r) for r in get_db().execute(JOBS_RECENT, (50,))]
+    busy = any(j["status"] in ("queued", "running") for j in jobs)
+    return render_template("jobs.html", jobs=jobs, busy=busy)
+
+
+@app.route("/api/v1/jobs", methods=["GET", "POST"])
+def api_jobs():
+    conn = get_db()
+    if request.method == "GET":
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+        return jsonify([job_dict(r) for r in conn.execute(JOBS_RECENT, (limit,))])
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or data.get("kind") not in JOB_API_KINDS:
+        return api_error(400, "expected {\"kind\": ..., \"params\": {...}}", kinds=list(JOB_API_KINDS))
+    params = data.get("params") or {}
+    if data["kind"] == "delete_batch":
+        if not isinstance(params.get("batch_id"), int):
+            return api_error(400, "delete_batch needs an integer batch_id")
+        params = {"batch_id": params["batch_id"]}
+    elif data["kind"] == "archive_batches":
+        batch_ids, days = params.get("batch_ids"), params.get("days")
+        if not (batch_ids is None or isinstance(batch_ids, list) and all(isinstance(b, int) for b in batch_ids)):
+            return api_error(400, "batch_ids must be a list of integers")
+        if not (days is None or isinstance(days, int)):
+            return api_error(400, "days must be an integer")
+        params = {"batch_ids": batch_ids, "days": days}
+    else:
+        params = {}
+    return api_job_accepted(enqueue_job(conn, data["kind"], **params))
+
+
+@app.route("/api/v1/jobs/<int:job_id>")
+def api_job(job_id):
+    row = get_db().execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    if row is None:
+        abort(404)
+    return jsonify(job_dict(row))
+
+
+# =========================
+# 🗄️ أرشيف الدفعات المكتملة
+# =========================
+# every connection attaches the archive file as "archive"; a batch lives in exactly one of the two
+ARCHIVE_TABLES = ("batches", "batch_totals", "period_totals") + LEDGER_TABLES + ("growth",)
+
+
+MAIN_TABLES_SQL = full_scan_query(
+    "SELECT name, sql FROM main.sqlite_master WHERE type = 'table'", "the archive copies the definition of every table"
+)
+
+
+def init_archive(c):
+    # the same tables as main, minus the triggers: archived rows are only read
+    schema = {r["name"]: r["sql"] for r in c.execute(MAIN_TABLES_SQL)}
+    for table in ARCHIVE_TABLES:
+        c.execute(schema[table].replace(f"CREATE TABLE {table}", f"CREATE TABLE IF NOT EXISTS archive.{table}", 1))
+        # columns main gained after the archive was made go on the end, as they did in main
+        have = {r["name"] for r in c.execute(f"PRAGMA archive.table_info({table})")}
+        for col in c.execute(f"PRAGMA main.table_info({table})").fetchall():
+            if col["name"] not in have:
+                default = f" DEFAULT {col['dflt_value']}" if col["dflt_value"] is not None else ""
+                c.execute(f"ALTER TABLE archive.{table} ADD COLUMN {col['name']} {col['type']}{default}")
+    for table in LEDGER_TABLES + ("growth",):
+        c.execute(f"CREATE INDEX IF NOT EXISTS archive.idx_{table}_batch_date ON {table}(batch_id, date, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS archive.idx_period_totals_batch ON period_totals (batch_id, day)")
+    c.execute('''CREATE TABLE IF NOT EXISTS archive.archive_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        batches INTEGER NOT NULL DEFAULT 0,
+        chicks INTEGER NOT NULL DEFAULT 0,
+        expenses REAL NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    )''')
+    c.execute("INSERT OR IGNORE INTO archive.archive_totals (id) VALUES (1)")
+
+
+def batch_schema(c, batch_id):
+    if c.execute("SELECT 1 FROM main.batches WHERE id = ?", (batch_id,)).fetchone():
+        return "main"
+    if c.execute("SELECT 1 FROM archive.batches WHERE id = ?", (batch_id,)).fetchone():
+        return "archive"
+    return None
+
+
+ARCHIVE_TOTALS_REFRESH = full_scan_query(
+    """
+    INSERT OR REPLACE INTO archive.archive_totals (id, batches, chicks, expenses, revenue)
+    SELECT 1, COUNT(*), COALESCE(SUM(b.initial_count), 0),
+           COALESCE(SUM(b.chick_price * b.initial_count
+                        + COALESCE(t.feed_cost, 0) + COALESCE(t.med_cost, 0) + COALESCE(t.extra_cost, 0)), 0),
+           COALESCE(SUM(t.sales_revenue), 0)
+    FROM archive.batches b LEFT JOIN archive.batch_totals t ON t.batch_id = b.id
+    """,
+    "rebuild-totals recounts every archived batch",
+)
+# adds one archived batch to archive_totals, or takes it away with -1 as the first four parameters
+ARCHIVE_TOTALS_ADD = full_scan_query(
+    """
+    UPDATE archive.archive_totals SET
+        batches = batches + ?, chicks = chicks + ? * s.batch_chicks, expenses = expenses + ? * s.batch_expenses,
+        revenue = revenue + ? * s.batch_revenue
+    FROM (
+        SELECT COALESCE(b.initial_count, 0) AS batch_chicks,
+               COALESCE(b.chick_price * b.initial_count
+                        + COALESCE(t.feed_cost, 0) + COALESCE(t.med_cost, 0) + COALESCE(t.extra_cost, 0), 0) AS batch_expenses,
+               COALESCE(t.sales_revenue, 0) AS batch_revenue
+        FROM archive.batches b LEFT JOIN archive.batch_totals t ON t.batch_id = b.id
+        WHERE b.id = ?
+    ) s
+    WHERE id = 1
+    """,
+    "archive_totals holds a single row; once analyzed, SQLite reads it rather than look it up",
+)
+ARCHIVABLE_BATCHES = full_scan_query(
+    """
+    SELECT id FROM batches
+    WHERE (is_completed = 1 OR end_date IS NOT NULL)
+      AND COALESCE(end_date, start_date) <= date('now', 'localtime', ?)
+    ORDER BY id
+    """,
+    "the archive job looks through every batch in main once per run",
+)
+ARCHIVABLE_BATCH = plan_query("SELECT 1 FROM batches WHERE id = ? AND (is_completed = 1 OR end_date IS NOT NULL)")
+ARCHIVE_LIST = full_scan_query(
+    """
+    SELECT b.*, COALESCE(t.feed_cost + t.med_cost + t.extra_cost, 0) AS ledger_cost,
+           COALESCE(t.sales_revenue, 0) AS sales_revenue
+    FROM archive.batches b LEFT JOIN archive.batch_totals t ON t.batch_id = b.id
+    ORDER BY b.id DESC
+    """,
+    "the archive page lists every archived batch",
+)
+
+
+def _copy_batch(c, batch_id, src, dst, tables):
+    for table in tables:
+        # by name, so an archive made before a column was added still lines up
+        have = {r["name"] for r in c.execute(f"PRAGMA {src}.table_info({table})")}
+        cols = ", ".join(r["name"] for r in c.execute(f"PRAGMA {dst}.table_info({table})") if r["name"] in have)
+        key = "id" if table == "batches" else "batch_id"
+        c.execute(f"INSERT INTO {dst}.{table} ({cols}) SELECT {cols} FROM {src}.{table} WHERE {key} = ?", (batch_id,))
+
+
+def _drop_archived(c, batch_id):
+    c.execute(ARCHIVE_TOTALS_ADD, (-1, -1, -1, -1, batch_id))
+    for table in LEDGER_TABLES + ("growth", "batch_totals", "period_totals"):
+        c.execute(f"DELETE FROM archive.{table} WHERE batch_id = ?", (batch_id,))
+    c.execute("DELETE FROM archive.batches WHERE id = ?", (batch_id,))
+
+
+def archive_batch(conn, batch_id):
+    # one transaction per batch. WAL commits are atomic per file only, so a crash can leave
+    # the batch in both; main wins and the next run replaces the archived copy.
+    # IMMEDIATE: a read transaction cannot become a write one once another connection has written
+    conn.execute("BEGIN IMMEDIATE")
+    c = conn.cursor()
+    if c.execute("SELECT 1 FROM main.batches WHERE id = ?", (batch_id,)).fetchone() is None:
+        conn.rollback()
+        return False
+    _drop_archived(c, batch_id)
+    _copy_batch(c, batch_id, "main", "archive", ARCHIVE_TABLES)
+    c.execute(ARCHIVE_TOTALS_ADD, (1, 1, 1, 1, batch_id))
+    # sync clients keep the rows: the deletes below are not logged as deletes
+    c.execute("INSERT OR IGNORE INTO archive_moves (batch_id) VALUES (?)", (batch_id,))
+    for table in BATCH_CHILD_TABLES:
+        c.execute(f"DELETE FROM main.{table} WHERE batch_id = ?", (batch_id,))
+    c.execute("DELETE FROM main.batches WHERE id = ?", (batch_id,))
+    c.execute("DELETE FROM archive_moves WHERE batch_id = ?", (batch_id,))
+    conn.commit()
+    return True
+
+
+def restore_batch(conn, batch_id):
+    conn.execute("BEGIN IMMEDIATE")
+    c = conn.cursor()
+    if c.execute("SELECT 1 FROM archive.batches WHERE id = ?", (batch_id,)).fetchone() is None:
+        conn.rollback()
+        return False
+    if c.execute("SELECT 1 FROM main.batches WHERE id = ?", (batch_id,)).fetchone() is None:
+        # parents first; the main triggers rebuild batch_totals and the growth columns
+        _copy_batch(c, batch_id, "archive", "main", ("batches",) + LEDGER_TABLES + ("growth",))
+    _drop_archived(c, batch_id)
+    conn.commit()
+    return True
+
+
+def archive_batches(conn, batch_ids=None, days=None, progress=None):
+    days = app.config["ARCHIVE_AFTER_DAYS"] if days is None else days
+    eligible = [r["id"] for r in conn.execute(ARCHIVABLE_BATCHES, (f"-{days} days",))]
+    if batch_ids is not None:
+        # an explicit batch only needs to be completed, however recently
+        eligible = [b for b in batch_ids if conn.execute(ARCHIVABLE_BATCH, (b,)).fetchone()]
+    archived = []
+    for i, batch_id in enumerate(eligible, 1):
+        if archive_batch(conn, batch_id):
+            archived.append(batch_id)
+        if progress:
+            progress(i, len(eligible))
+            conn.commit()
+    return {"archived": archived}
+
+
+@job_handler("archive_batches", resumable=True)
+def archive_batches_job(conn, params, progress):
+    return archive_batches(conn, params.get("batch_ids"), params.get("days"), progress)
+
+
+@job_handler("restore_batch", resumable=True)
+def restore_batch_job(conn, params, progress):
+    return {"batch_id": params["batch_id"], "restored": restore_batch(conn, params["batch_id"])}
+
+
+@app.cli.command("archive-batches")
+@click.option("--days", type=int, help="Completed at least this many days ago (default ARCHIVE_AFTER_DAYS).")
+@click.option("--batch-id", "batch_ids", type=int, multiple=True, help="Archive these completed batches only.")
+def archive_batches_command(days, batch_ids):
+    """Move completed batches and their records into the archive file."""
+    conn = connect_db()
+    result = archive_batches(conn, list(batch_ids) or None, days)
+    conn.close()
+    click.echo(f"{len(result['archived'])} batches archived")
+
+
+@app.route("/archive")
+def archive_view():
+    c = get_db().cursor()
+    batches = c.execute(ARCHIVE_LIST).fetchall()
+    totals = c.execute("SELECT * FROM archive.archive_totals WHERE id = 1").fetchone()
+    return render_template("archive.html", batches=batches, totals=totals)
+
+
+@app.route("/batch/archive/<int:batch_id>")
+def archive_batch_view(batch_id):
+    job_id = enqueue_job(get_db(), "archive_batches", batch_ids=[batch_id])
+    flash(f"🗄️ جارِ نقل الدفعة إلى الأرشيف (مهمة رقم {job_id})", "info")
+    return redirect(url_for("index"))
+
+
+@app.route("/batch/restore/<int:batch_id>")
+def restore_batch_view(batch_id):
+    job_id = enqueue_job(get_db(), "restore_batch", batch_id=batch_id)
+    flash(f"♻️ جارِ استرجاع الدفعة من الأرشيف (مهمة رقم {job_id})", "info")
+    return redirect(url_for("archive_view"))
+
+
+# =========================
+# 📸 اللقطات
+# =========================
+# A snapshot is a consistent copy of a farm's database and its archive, written with the online
+# backup API a few pages per step, so writers keep going while it runs. Copies go to
+# <SNAPSHOT_DIR>/<database name>/<UTC time>.db (and .archive.db), appear there complete (written
+# under .tmp, then renamed) and the oldest beyond SNAPSHOT_KEEP are removed. They are taken by the
+# "snapshot" job: `flask snapshot`, POST /api/v1/jobs, or every SNAPSHOT_INTERVAL seconds by the
+# process that writes. With SNAPSHOT_READS set, the heavy read-only pages below read the newest
+# snapshot when it is at most that many seconds old; their data can be that far behind.
+app.config.update(
+    # default: a "snapshots" directory next to the database
+    SNAPSHOT_DIR=os.environ.get("SNAPSHOT_DIR"),
+    SNAPSHOT_KEEP=int(os.environ.get("SNAPSHOT_KEEP", 7)),
+    # pages copied per backup step; -1 copies everything in one step
+    SNAPSHOT_PAGES=int(os.environ.get("SNAPSHOT_PAGES", 1024)),
+    # a step that finds the source changed restarts the copy (writes from other connections do
+    # not, take_snapshot's read transaction hides them); after this many restarts the rest is
+    # copied in one step
+    SNAPSHOT_MAX_RESTARTS=int(os.environ.get("SNAPSHOT_MAX_RESTARTS", 3)),
+    # 0 = only on demand
+    SNAPSHOT_INTERVAL=int(os.environ.get("SNAPSHOT_INTERVAL", 0)),
+    # 0 = always read the live database
+    SNAPSHOT_READS=int(os.environ.get("SNAPSHOT_READS", 0)),
+)
+SNAPSHOT_STAMP = "%Y%m%dT%H%M%S%fZ"
+SNAPSHOT_ENDPOINTS = ("report", "period_report_view", "analytics", "api_analytics", "export_csv", "export_xlsx")
+SNAPSHOT_PENDING = "SELECT 1 FROM jobs WHERE status IN ('queued', 'running') AND kind = 'snapshot' LIMIT 1"
+PLAN_QUERIES.append(SNAPSHOT_PENDING)
+
+# database path -> (snapshot directory mtime, newest snapshot); refreshed when the directory changes
+_snapshot_latest = {}
+# snapshot file -> pool of read-only connections; replaced when a newer snapshot appears
+_snapshot_pools = {}
+_snapshot_lock = threading.Lock()
+_snapshot_thread = None
+
+
+def snapshot_dir(path):
+    path = os.path.abspath(path)
+    root = app.config["SNAPSHOT_DIR"] or os.path.join(os.path.dirname(path), "snapshots")
+    return os.path.join(root, os.path.splitext(os.path.basename(path))[0])
+
+
+def archive_path_of_snapshot(snapshot):
+    return snapshot[:-3] + ".archive.db"
+
+
+def list_snapshots(path):
+    # newest first; a snapshot counts once its archive copy is next to it
+    directory = snapshot_dir(path)
+    try:
+        names = set(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    stamps = sorted((n[:-3] for n in names if n.endswith(".db") and not n.endswith(".archive.db")), reverse=True)
+    return [os.path.join(directory, s + ".db") for s in stamps if s + ".archive.db" in names]
+
+
+def snapshot_taken(snapshot):
+    stamp = os.path.splitext(os.path.basename(snapshot))[0]
+    return datetime.strptime(stamp, SNAPSHOT_STAMP).replace(tzinfo=timezone.utc)
+
+
+def prune_snapshots(path, keep=None):
+    keep = app.config["SNAPSHOT_KEEP"] if keep is None else keep
+    removed = list_snapshots(path)[max(keep, 1):]
+    for snapshot in removed:
+        for name in (snapshot, archive_path_of_snapshot(snapshot)):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+class _BackupRestarting(Exception):
+    pass
+
+
+def backup_schema(conn, out, schema):
+    # returns how many times the stepped copy started over
+    restarts, last = 0, None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last
+        if last is not None and remaining > last:
+            restarts += 1
+            if restarts > app.config["SNAPSHOT_MAX_RESTARTS"]:
+                raise _BackupRestarting()
+        last = remaining
+
+    try:
+        conn.backup(out, pages=app.config["SNAPSHOT_PAGES"], name=schema, progress=progress, sleep=0)
+    except _BackupRestarting:
+        conn.backup(out, pages=-1, name=schema)
+    return restarts
+
+
+def take_snapshot(conn):
+    files = {r["name"]: r["file"] for r in conn.execute("PRAGMA database_list")}
+    directory = snapshot_dir(files["main"])
+    os.makedirs(directory, exist_ok=True)
+    snapshot = os.path.join(directory, datetime.now(timezone.utc).strftime(SNAPSHOT_STAMP) + ".db")
+    copies = [("archive", archive_path_of_snapshot(snapshot)), ("main", snapshot)]
+    pages = restarts = 0
+    # both files are copied in one read transaction, so they are of the same moment however long
+    # the copy takes. In WAL mode a transaction writing both (archiving a batch) commits them one
+    # after the other, so the read transaction starts while another connection briefly holds the
+    # write lock on both.
+    try:
+        gate = connect_db(files["main"])
+        try:
+            gate.execute("BEGIN IMMEDIATE")
+            conn.execute("BEGIN")
+            for schema in ("main", "archive"):
+                conn.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master").fetchone()
+        finally:
+            gate.close()
+        for schema, target in copies:
+            out = sqlite3.connect(target + ".tmp")
+            try:
+                restarts += backup_schema(conn, out, schema)
+                # the copy keeps the source's WAL flag; as a plain file it opens anywhere, read-only too
+                out.execute("PRAGMA journal_mode=DELETE")
+                pages += out.execute("PRAGMA page_count").fetchone()[0]
+            finally:
+                out.close()
+    finally:
+        conn.rollback()
+    # archive first: a snapshot only counts once both files are in place
+    for _, target in copies:
+        os.replace(target + ".tmp", target)
+    removed = prune_snapshots(files["main"])
+    return {
+        "snapshot": os.path.basename(snapshot), "pages": pages, "restarts": restarts,
+        "removed": [os.path.basename(r) for r in removed],
+    }
+
+
+@job_handler("snapshot", resumable=True)
+def snapshot_job(conn, params, progress):
+    result = take_snapshot(conn)
+    progress(1, 1)
+    conn.commit()
+    return result
+
+
+@app.cli.command("snapshot")
+def snapshot_command():
+    """Copy the database and its archive into SNAPSHOT_DIR without stopping writers."""
+    conn = connect_db()
+    result = take_snapshot(conn)
+    conn.close()
+    click.echo(f"{result['snapshot']}: {result['pages']} pages, {len(result['removed'])} old snapshots removed")
+
+
+def snapshot_scheduler(stop, interval):
+    # a snapshot job per database whenever its newest snapshot is older than the interval
+    while not stop.wait(min(interval, 60)):
+        for path in database_paths():
+            snapshots = list_snapshots(path)
+            if snapshots and (datetime.now(timezone.utc) - snapshot_taken(snapshots[0])).total_seconds() < interval:
+                continue
+            pool = get_pool(path)
+            conn = pool.acquire()
+            try:
+                if conn.execute(SNAPSHOT_PENDING).fetchone() is None:
+                    enqueue_job(conn, "snapshot", db_path=path)
+            except Exception:
+                app.logger.exception("could not schedule a snapshot of %s", path)
+            finally:
+                pool.release(conn)
+
+
+def start_snapshot_scheduler():
+    # call from the process that writes: the development server, or serve.py's writer
+    global _snapshot_thread
+    interval = app.config["SNAPSHOT_INTERVAL"]
+    if interval <= 0 or _snapshot_thread is not None and _snapshot_thread.is_alive():
+        return None
+    stop = threading.Event()
+    _snapshot_thread = threading.Thread(target=snapshot_scheduler, args=(stop, interval), name="snapshots", daemon=True)
+    _snapshot_thread.start()
+    return stop
+
+
+def connect_snapshot(path):
+    # snapshots never change once renamed into place; immutable skips locking altogether
+    factory = TimedConnection if app.config["METRICS_ENABLED"] else sqlite3.Connection
+    conn = sqlite3.connect(f"file:{quote(path)}?immutable=1", uri=True, check_same_thread=False, factory=factory)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA cache_size=%d" % int(app.config["SQLITE_CACHE_SIZE"]))
+    conn.execute("PRAGMA mmap_size=%d" % int(app.config["SQLITE_MMAP_SIZE"]))
+    conn.execute("ATTACH DATABASE ? AS archive", (f"file:{quote(archive_path_of_snapshot(path))}?immutable=1",))
+    return conn
+
+
+def latest_snapshot(path):
+    try:
+        mtime = os.stat(snapshot_dir(path)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _snapshot_latest.get(path)
+    if cached is None or cached[0] != mtime:
+        snapshots = list_snapshots(path)
+        cached = _snapshot_latest[path] = (mtime, snapshots[0] if snapshots else None)
+    return cached[1]
+
+
+def snapshot_pool():
+    # the pool for this request's reads when it may come from a snapshot, else None
+    max_age = app.config["SNAPSHOT_READS"]
+    if max_age <= 0 or not has_request_context() or request.endpoint not in SNAPSHOT_ENDPOINTS:
+        return None
+    snapshot = latest_snapshot(current_db_path())
+    if snapshot is None or (datetime.now(timezone.utc) - snapshot_taken(snapshot)).total_seconds() > max_age:
+        return None
+    with _snapshot_lock:
+        pool = _snapshot_pools.get(snapshot)
+        if pool is None:
+            for old in [s for s in _snapshot_pools if os.path.dirname(s) == os.path.dirname(snapshot)]:
+                _snapshot_pools.pop(old).close_all()
+            pool = _snapshot_pools[snapshot] = ConnectionPool(snapshot, app.config["DB_POOL_SIZE"], connect_snapshot)
+    g.snapshot = snapshot
+    return pool
+
+
+def live_db():
+    # for a request on a snapshot that needs something newer than it, e.g. a batch added since
+    if g.pop("snapshot", None) is not None and "db" in g:
+        g.pop("db_pool").release(g.pop("db"))
+        g.db_pool = get_pool()
+        g.db = g.db_pool.acquire()
+    return get_db()
+
+
+@app.after_request
+def note_snapshot(response):
+    if g.get("snapshot"):
+        response.headers["X-Snapshot"] = snapshot_taken(g.snapshot).isoformat()
+    return response
+
+
+# =========================
+# 🔎 فحص خطط الاستعلام
+# =========================
+
+PLAN_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "INSERT", "REPLACE", "WITH")
+TRIGGERS_SQL = full_scan_query(
+    "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name",
+    "sqlite_master has no index; check-plans reads every trigger",
+)
+
+
+def collect_queries(path=None):
+    path = path or __file__
+    with open(path, encoding="utf-8") as fh:
+        tree = ast.parse(fh.read(), path)
+    queries = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in ("execute", "executemany") and node.args
+                and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+            sql = " ".join(node.args[0].value.split())
+            if sql.split(" ", 1)[0].upper() in PLAN_STATEMENTS:
+                queries.append((f"app.py:{node.lineno}", sql))
+    return sorted(set(queries))
+
+
+def module_queries():
+    # SQL kept in module constants, the ones built with f-strings included; templates and
+    # fragments are checked through the queries made from them
+    queries = []
+
+    def visit(where, value):
+        if isinstance(value, str):
+            sql = " ".join(value.split())
+            complete = " " in sql and "{" not in sql and sqlite3.complete_statement(sql + ";")
+            if sql.split(" ", 1)[0].upper() in PLAN_STATEMENTS and complete:
+                queries.append((where, sql))
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                visit(f"{where}[{key!r}]", item)
+        elif isinstance(value, (tuple, list)):
+            for item in value:
+                visit(where, item)
+
+    for name, value in list(globals().items()):
+        if name.lstrip("_").isupper():
+            visit(name, value)
+    return sorted(set(queries))
+
+
+def trigger_queries(conn):
+    # the statements in every trigger body, with NEW./OLD. columns as parameters
+    queries = []
+    for name, sql in conn.execute(TRIGGERS_SQL).fetchall():
+        body = re.split(r"\bBEGIN\b", sql, maxsplit=1, flags=re.I)[1]
+        body = body[:body.upper().rindex("END")]
+        statement = ""
+        for part in body.split(";"):
+            statement += part + ";"
+            if sqlite3.complete_statement(statement):
+                statement = re.sub(r"\b(?:NEW|OLD)\.\w+", "?", " ".join(statement.split())).rstrip(";")
+                if statement:
+                    queries.append((f"trigger {name}", statement))
+                statement = ""
+    return queries
+
+
+def check_query_plans(conn, queries):
+    failures = []
+    for where, sql in queries:
+        params = (1,) * sql.count("?")
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        if sql in PLAN_SCAN_ALLOWED:
+            continue
+        # a subquery SQLite already ran into a co-routine or a temp table is read whole by design;
+        # the plan lines under it show how it was built
+        built = {m.group(1) for d in plan for m in [re.match(r"(?:CO-ROUTINE|MATERIALIZE) (\S+)", d)] if m}
+        for detail in plan:
+            if detail.startswith("SCAN ") and detail.split(" ")[1] in built:
+                continue
+            # SCAN CONSTANT ROW is a FROM-less SELECT, nothing to read
+            # a virtual table with an index string (FTS5 MATCH, rowid =) is not read whole
+            indexed_vtab = " VIRTUAL TABLE INDEX " in detail and not detail.endswith(":")
+            is_scan = (
+                detail.startswith("SCAN ") and " USING " not in detail and detail != "SCAN CONSTANT ROW"
+                and not indexed_vtab
+            )
+            if is_scan or "USE TEMP B-TREE" in detail:
+                failures.append((where, sql, detail))
+    return failures
+
+
+@app.cli.command("check-plans")
+def check_plans_command():
+    """Run EXPLAIN QUERY PLAN on the queries in app.py and every trigger, and fail on full scans."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "plans.db")
+        init_db(path)
+        conn = connect_db(path)
+        conn.execute("ANALYZE")
+        queries = collect_queries()
+        queries += [("PLAN_QUERIES", sql) for sql in PLAN_QUERIES]
+        queries += module_queries() + trigger_queries(conn)
+        failures = check_query_plans(conn, queries)
+        conn.close()
+    for where, sql, detail in failures:
+        click.echo(f"{where}: {detail}\n    {sql}", err=True)
+    if failures:
+        raise SystemExit(1)
+    click.echo(f"{len(queries)} queries checked, no full table scans")
+
+
 # =========================
 # 🧩 تشغيل التطبيق
 # =========================
 if __name__ == "__main__":
-    init_db()
+    for path in database_paths():
+        init_db(path)
+        resume_jobs(path)
+    start_snapshot_scheduler()
+    warm_templates()
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
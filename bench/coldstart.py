@@ -0,0 +1,135 @@
+"""Worker cold start: importing the app and serving its first request.
+
+    python -m bench.coldstart --batches 50 --runs 10
+
+Every run is a new Python process, so nothing is cached between runs. Three
+databases are timed:
+
+- "current" is already at the latest schema version.
+- "fresh" is an empty file that gets every migration.
+- "legacy" holds the current tables but reports user_version 0, like a
+  database created before versioned migrations. Every step re-runs on it.
+
+The report also checks that "fresh" and "legacy" end up with the same schema.
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench.generate import build
+from bench.routes import _commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# runs in the child: import time, then the first request, which opens the pool and checks the schema
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get("/")
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_request_ms": (done - imported) * 1000}))
+"""
+SCHEMA_SQL = "SELECT type, name, tbl_name, sql FROM {schema}.sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name"
+
+
+def _remove(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _archive(path):
+    # app.archive_path() without ARCHIVE_PATH
+    return os.path.splitext(path)[0] + ".archive.db"
+
+
+def _copy(source, path):
+    for src, dst in ((source, path), (_archive(source), _archive(path))):
+        _remove(dst)
+        shutil.copyfile(src, dst)
+
+
+def _set_version(path, version):
+    conn = sqlite3.connect(path)
+    conn.execute("ATTACH DATABASE ? AS archive", (_archive(path),))
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.execute(f"PRAGMA archive.user_version = {version}")
+    conn.close()
+
+
+def _schema(path):
+    conn = sqlite3.connect(path)
+    conn.execute("ATTACH DATABASE ? AS archive", (_archive(path),))
+    schema = {s: conn.execute(SCHEMA_SQL.format(schema=s)).fetchall() for s in ("main", "archive")}
+    versions = [conn.execute(f"PRAGMA {s}.user_version").fetchone()[0] for s in ("main", "archive")]
+    conn.close()
+    return schema, versions
+
+
+def start(path):
+    env = dict(os.environ, DB_PATH=path, ARCHIVE_PATH="", FARMS_DIR="", WRITER_SOCKET="")
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def measure(prepare, path, runs):
+    timings = []
+    for _ in range(runs):
+        prepare(path)
+        timings.append(start(path))
+    return {
+        key: round(statistics.median(t[key] for t in timings), 2)
+        for key in ("import_ms", "first_request_ms")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.db")
+        build(source, args.batches, args.seed)
+        path = os.path.join(tmp, "farm.db")
+        scenarios = {
+            "current": lambda p: _copy(source, p),
+            "fresh": lambda p: (_remove(p), _remove(_archive(p))),
+            "legacy": lambda p: (_copy(source, p), _set_version(p, 0)),
+        }
+        timings = {name: measure(prepare, path, args.runs) for name, prepare in scenarios.items()}
+
+        schemas = {}
+        for name in ("fresh", "legacy"):
+            scenarios[name](path)
+            start(path)
+            schemas[name] = _schema(path)
+        report = {
+            "commit": _commit(),
+            "batches": args.batches,
+            "runs": args.runs,
+            "timings": timings,
+            "schema_version": schemas["fresh"][1],
+            "schema_matches": schemas["fresh"] == schemas["legacy"],
+        }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Peak Python memory while streaming exports at growing row counts.
+
+    python -m bench.export_memory --rows 1000 10000 100000
+
+Each scale gets a fresh database; the response body is consumed chunk by
+chunk and thrown away, so the peak reflects what the server holds.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+
+def fill(conn, rows):
+    conn.execute(
+        "INSERT INTO batches (name, breed, start_date, initial_count, chick_price) VALUES ('bench', 'cobb', '2026-01-01', ?, 10)",
+        (rows,),
+    )
+    conn.executemany(
+        "INSERT INTO feed (batch_id, date, feed_type, quantity, price) VALUES (1, ?, 'بادي', ?, ?)",
+        ((f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}", i % 50, i % 50 * 20.5) for i in range(rows)),
+    )
+    conn.commit()
+
+
+def measure(app_module, url, rows):
+    app_module.init_db()
+    conn = app_module.connect_db()
+    fill(conn, rows)
+    conn.close()
+
+    client = app_module.app.test_client()
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"url": url, "rows": rows, "bytes": size, "seconds": round(elapsed, 3), "peak_kib": peak // 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--urls", nargs="+", default=["/export.xlsx", "/export/feed.csv"])
+    args = parser.parse_args()
+
+    import app as app_module
+    results = []
+    for rows in args.rows:
+        for url in args.urls:
+            with tempfile.TemporaryDirectory() as tmp:
+                app_module.app.config["DB_PATH"] = os.path.join(tmp, "bench.db")
+                results.append(measure(app_module, url, rows))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Seeded synthetic farm data.
+
+    python -m bench.generate farm.db --batches 200 --seed 1
+
+Batches start every few days and run a normal broiler cycle: daily feed
+scaled to the flock's intake, vaccinations and the odd vitamin course,
+weekly running costs, daily mortality (heavier in the first week), weekly
+weighings and sales spread over the last days of the cycle. Batches whose
+cycle reaches past today are left open with data up to today. The same seed
+always produces the same rows.
+"""
+import argparse
+import math
+import os
+import random
+from datetime import date, timedelta
+
+BREEDS = ("Cobb 500", "Ross 308", "Hubbard", "Arbor Acres")
+FEED_TYPES = ((10, "بادي"), (24, "نامي"), (None, "ناهي"))
+VACCINES = {7: "هتشنر", 14: "جامبورو", 21: "لاسوتا"}
+VITAMINS = ("فيتامين AD3E", "أملاح", "مضاد حيوي")
+RUNNING_COSTS = (("غاز", 900, 1600), ("كهرباء", 400, 800), ("نشارة", 600, 1200), ("عمالة", 1500, 2500))
+
+
+def weight_kg(age):
+    # close enough to a commercial broiler curve: ~1.7 kg at 35 days, ~2.4 kg at 42
+    return 0.042 + 0.00195 * age ** 1.9
+
+
+def intake_kg(age):
+    return (18 + 4.6 * age) / 1000
+
+
+def feed_type(age):
+    return next(name for last, name in FEED_TYPES if last is None or age <= last)
+
+
+def _count(rng, mean):
+    return max(0, round(rng.gauss(mean, math.sqrt(mean)))) if mean > 0 else 0
+
+
+def batch_records(rng, number, start, today):
+    """One batch and its ledgers as form dicts, the shape the parsers accept."""
+    birds = rng.randrange(2000, 10001, 500)
+    cycle = rng.randint(35, 45)
+    end = start + timedelta(days=cycle)
+    completed = end <= today
+    batch = {
+        "name": f"دفعة {number}",
+        "breed": rng.choice(BREEDS),
+        "start_date": start.isoformat(),
+        "initial_count": str(birds),
+        "chick_price": f"{rng.uniform(12, 22):.2f}",
+        "is_completed": "1" if completed else "",
+        "end_date": end.isoformat() if completed else "",
+    }
+    ledgers = {"feed": [], "medications": [], "extra_expenses": [], "mortality": [], "sales": [], "growth": []}
+    feed_price = rng.uniform(24, 30)
+    sale_days = sorted(rng.sample(range(cycle - 6, cycle), rng.randint(2, 4))) + [cycle]
+    alive = birds
+
+    for age in range(cycle + 1):
+        day = start + timedelta(days=age)
+        if day > today:
+            break
+        d = day.isoformat()
+        if age == 0:
+            ledgers["extra_expenses"].append({"date": d, "name": "فرشة أول الدورة", "price": f"{rng.uniform(1500, 3000):.2f}"})
+            continue
+
+        quantity = round(alive * intake_kg(age) * rng.uniform(0.95, 1.05), 1)
+        ledgers["feed"].append({"date": d, "feed_type": feed_type(age), "quantity": str(quantity), "price": f"{quantity * feed_price:.2f}"})
+
+        dead = min(alive, _count(rng, alive * (0.004 if age <= 7 else 0.0007)))
+        if dead:
+            alive -= dead
+            ledgers["mortality"].append({"date": d, "count": str(dead), "note": "إجهاد حراري" if rng.random() < 0.05 else ""})
+
+        if age in VACCINES:
+            ledgers["medications"].append({"date": d, "name": VACCINES[age], "purpose": "تحصين", "price": f"{birds * rng.uniform(0.15, 0.3):.2f}"})
+        elif rng.random() < 0.08:
+            ledgers["medications"].append({"date": d, "name": rng.choice(VITAMINS), "purpose": "دعم", "price": f"{rng.uniform(150, 900):.2f}"})
+
+        if age % 7 == 0:
+            for name, low, high in RUNNING_COSTS:
+                ledgers["extra_expenses"].append({"date": d, "name": name, "price": f"{rng.uniform(low, high):.2f}"})
+            ledgers["growth"].append({
+                "date": d,
+                "avg_weight": f"{weight_kg(age) * rng.uniform(0.93, 1.07):.3f}",
+                "dead_count": str(dead),
+                "notes": "",
+            })
+
+        if age in sale_days and alive:
+            sold = alive if age == cycle else min(alive, round(alive * rng.uniform(0.15, 0.35)))
+            alive -= sold
+            ledgers["sales"].append({
+                "date": d,
+                "quantity": str(sold),
+                "average_weight_kg": f"{weight_kg(age) * rng.uniform(0.95, 1.05):.3f}",
+                "price_per_kg": f"{rng.uniform(60, 78):.2f}",
+                "note": "",
+            })
+    return batch, ledgers
+
+
+def generate(conn, batches, seed=1, spacing=7, today=None):
+    """Fill an initialized database through the app's own parsers and INSERTs.
+
+    Returns the number of rows written per table."""
+    from app import LEDGER_INSERTS, parse_batch_edit, refit_forecasts
+
+    rng = random.Random(seed)
+    today = today or date.today()
+    first = today - timedelta(days=spacing * (batches - 1) + 20)
+    written = dict.fromkeys(("batches",) + tuple(LEDGER_INSERTS), 0)
+    c = conn.cursor()
+    for n in range(batches):
+        batch, ledgers = batch_records(rng, n + 1, first + timedelta(days=n * spacing), today)
+        c.execute(
+            "INSERT INTO batches (name, breed, start_date, initial_count, chick_price, is_completed, end_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            parse_batch_edit(batch),
+        )
+        batch_id = c.lastrowid
+        written["batches"] += 1
+        for table, rows in ledgers.items():
+            parse, sql = LEDGER_INSERTS[table]
+            c.executemany(sql, ((batch_id,) + parse(r) for r in rows))
+            written[table] += len(rows)
+        refit_forecasts(conn)
+        conn.commit()
+    return written
+
+
+def build(path, batches, seed=1, spacing=7):
+    """Create a fresh database at `path` and fill it."""
+    import app as app_module
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    app_module.init_db(path)
+    conn = app_module.connect_db(path)
+    try:
+        written = generate(conn, batches, seed, spacing)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--spacing", type=int, default=7, help="days between batch start dates")
+    args = parser.parse_args()
+    written = build(args.path, args.batches, args.seed, args.spacing)
+    print(", ".join(f"{table}: {n}" for table, n in written.items()))
+
+
+if __name__ == "__main__":
+    main()
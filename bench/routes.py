@@ -0,0 +1,316 @@
+"""Latency of every route against a generated farm.
+
+    python -m bench.routes --batches 200 --requests 30 --output before.json
+    python -m bench.routes --compare before.json after.json
+
+A fresh database is generated with bench.generate and every route is driven
+through the Flask test client. Per route the report gives p50/p95/p99 wall
+time (response body included), SQL statements per request and the process
+peak RSS once the route has run; routes the script does not know about are
+listed under "uncovered" so new endpoints get added here. Writes go to
+throwaway rows set up outside the timed part, so the data keeps its shape.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import date
+
+from flask import url_for
+
+from bench.generate import batch_records, build
+
+ADD_ENDPOINTS = {
+    "feed": ("add_feed", "edit_feed", "delete_feed"),
+    "medications": ("add_med", "edit_med", "delete_med"),
+    "extra_expenses": ("add_extra", "edit_extra", "delete_extra"),
+    "mortality": ("add_mortality", "edit_mortality", "delete_mortality"),
+    "sales": ("add_sale", "edit_sale", "delete_sale"),
+    "growth": ("add_growth", "edit_growth", "delete_growth"),
+}
+TABS = ("feed", "meds", "extras", "mortality", "sales", "growth")
+
+
+def _form(row):
+    return {k: "" if v is None else str(v) for k, v in dict(row).items()}
+
+
+class Fixture:
+    """Picks ids and prepares request bodies; everything here runs untimed."""
+
+    def __init__(self, app_module, path, seed):
+        self.app_module = app_module
+        self.app = app_module.app
+        self.conn = app_module.connect_db(path)
+        self.rng = random.Random(seed)
+        self.batches = [r[0] for r in self.conn.execute("SELECT id FROM batches")]
+        self.rows = {
+            t: [tuple(r) for r in self.conn.execute(f"SELECT id, batch_id FROM {t}")] for t in ADD_ENDPOINTS
+        }
+        _, self.samples = batch_records(self.rng, 0, date(2026, 1, 1), date(2026, 3, 1))
+
+    def url(self, endpoint, **values):
+        with self.app.test_request_context():
+            return url_for(endpoint, **values)
+
+    def batch(self):
+        return self.rng.choice(self.batches)
+
+    def row(self, table):
+        return self.rng.choice(self.rows[table])
+
+    def record(self, table):
+        return dict(self.rng.choice(self.samples[table]))
+
+    def ledger_form(self, table, id):
+        return _form(self.conn.execute(f"SELECT * FROM {table} WHERE id=?", (id,)).fetchone())
+
+    def batch_form(self, batch_id):
+        return _form(self.conn.execute("SELECT * FROM batches WHERE id=?", (batch_id,)).fetchone())
+
+    def spare(self, table):
+        batch_id = self.batch()
+        parse, sql = self.app_module.LEDGER_INSERTS[table]
+        with self.conn:
+            id = self.conn.execute(sql, (batch_id,) + parse(self.record(table))).lastrowid
+        return id, batch_id
+
+    def recent_seq(self, back):
+        return max(self.conn.execute("SELECT MAX(seq) FROM changes").fetchone()[0] - back, 1)
+
+    def spare_batch(self, completed=False):
+        batch, _ = batch_records(self.rng, 0, date.today(), date.today())
+        with self.conn:
+            c = self.conn.execute(self.app_module.BATCH_INSERT, self.app_module.parse_batch(batch))
+            batch_id = c.lastrowid
+            if completed:
+                c.execute("UPDATE batches SET is_completed = 1, end_date = date('now') WHERE id = ?", (batch_id,))
+            for table in ADD_ENDPOINTS:
+                parse, sql = self.app_module.LEDGER_INSERTS[table]
+                for _ in range(5):
+                    c.execute(sql, (batch_id,) + parse(self.record(table)))
+        return batch_id
+
+
+def routes(f):
+    """(name, endpoint, prepare) where prepare() -> (method, url, request kwargs)."""
+    out = [
+        ("index", "index", lambda: ("GET", "/", {})),
+        ("static", "static", lambda: ("GET", f.url("static", filename="style.css"), {})),
+        ("add_batch GET", "add_batch", lambda: ("GET", f.url("add_batch"), {})),
+        ("add_batch POST", "add_batch", lambda: ("POST", f.url("add_batch"), {"data": f.batch_form(f.batch())})),
+        ("view_batch", "view_batch", lambda: ("GET", f.url("view_batch", batch_id=f.batch()), {})),
+        ("batch_tab", "batch_tab", lambda: ("GET", f.url("batch_tab", batch_id=f.batch(), tab=f.rng.choice(TABS)), {})),
+        ("edit_batch GET", "edit_batch", lambda: ("GET", f.url("edit_batch", batch_id=f.batch()), {})),
+        ("edit_batch POST", "edit_batch", lambda: (
+            "POST", f.url("edit_batch", batch_id=(b := f.batch())), {"data": f.batch_form(b)})),
+        ("delete_batch", "delete_batch", lambda: ("GET", f.url("delete_batch", batch_id=f.spare_batch()), {})),
+        ("report GET", "report", lambda: ("GET", f.url("report", batch_id=f.batch()), {})),
+        ("report POST", "report", lambda: ("POST", f.url("report", batch_id=f.batch()), {
+            "data": {"average_weight_kg": "2.1", "price_per_kg": "70", "mortality_count": "50"}})),
+        ("report grid", "report", lambda: ("POST", f.url("report", batch_id=f.batch()), {"data": {
+            "mode": "grid", "weight_from": "1.6", "weight_to": "2.6", "weight_steps": "20",
+            "price_from": "55", "price_to": "80", "price_steps": "20", "mortality_levels": "0,100,300"}})),
+        ("analytics", "analytics", lambda: ("GET", f.url("analytics"), {})),
+        ("period month", "period_report_view", lambda: ("GET", f.url("period_report_view", **{"from": "2000-01-01"}), {})),
+        ("period week", "period_report_view", lambda: (
+            "GET", f.url("period_report_view", granularity="week", **{"from": "2000-01-01"}), {})),
+        ("api_analytics", "api_analytics", lambda: ("GET", f.url("api_analytics"), {})),
+        ("api_batches GET", "api_batches", lambda: ("GET", f.url("api_batches"), {})),
+        ("api_batches POST", "api_batches", lambda: ("POST", f.url("api_batches"), {"json": f.batch_form(f.batch())})),
+        ("api_batch GET", "api_batch", lambda: ("GET", f.url("api_batch", batch_id=f.batch()), {})),
+        ("api_batch PUT", "api_batch", lambda: (
+            "PUT", f.url("api_batch", batch_id=(b := f.batch())), {"json": f.batch_form(b)})),
+        ("api_batch DELETE", "api_batch", lambda: ("DELETE", f.url("api_batch", batch_id=f.spare_batch()), {})),
+        ("api_growth_series", "api_growth_series", lambda: ("GET", f.url("api_growth_series", batch_id=f.batch()), {})),
+        ("api_bulk_records", "api_bulk_records", lambda: ("POST", f.url("api_bulk_records"), {"json": {
+            t: [dict(f.record(t), batch_id=f.batch()) for _ in range(10)] for t in ("feed", "mortality")}})),
+        ("export_csv farm", "export_csv", lambda: ("GET", f.url("export_csv", table="feed"), {})),
+        ("export_csv batch", "export_csv", lambda: ("GET", f.url("export_csv", table="sales", batch_id=f.batch()), {})),
+        ("export_xlsx farm", "export_xlsx", lambda: ("GET", f.url("export_xlsx"), {})),
+        ("export_xlsx batch", "export_xlsx", lambda: ("GET", f.url("export_xlsx", batch_id=f.batch()), {})),
+        ("metrics", "metrics", lambda: ("GET", f.url("metrics"), {})),
+        ("search", "search", lambda: ("GET", f.url("search", q=f.rng.choice(("مضاد", "هتشنر", "نامي", "إجهاد", "دفعة 1"))), {})),
+        ("sync full", "sync", lambda: ("GET", f.url("sync", since=0), {})),
+        ("sync delta", "sync", lambda: ("GET", f.url("sync", since=f.recent_seq(200)), {})),
+        ("jobs_view", "jobs_view", lambda: ("GET", f.url("jobs_view"), {})),
+        ("api_jobs GET", "api_jobs", lambda: ("GET", f.url("api_jobs"), {})),
+        ("api_jobs POST", "api_jobs", lambda: ("POST", f.url("api_jobs"), {
+            "json": {"kind": "delete_batch", "params": {"batch_id": f.spare_batch()}}})),
+        ("api_job", "api_job", lambda: ("GET", f.url("api_job", job_id=1), {})),
+        ("import_view GET", "import_view", lambda: ("GET", f.url("import_view"), {})),
+        ("import_view POST", "import_view", lambda: ("POST", f.url("import_view"), {"data": {
+            "table": "feed", "batch_id": str(f.batch()), "file": (io.BytesIO(_csv(f, "feed", 50)), "feed.csv")}})),
+    ]
+    for table, (add, edit, delete) in ADD_ENDPOINTS.items():
+        out += [
+            (f"{add} GET", add, lambda add=add: ("GET", f.url(add, batch_id=f.batch()), {})),
+            (f"{add} POST", add, lambda add=add, t=table: ("POST", f.url(add, batch_id=f.batch()), {"data": f.record(t)})),
+            (f"{edit} GET", edit, lambda edit=edit, t=table: ("GET", f.url(edit, id=(r := f.row(t))[0], batch_id=r[1]), {})),
+            (f"{edit} POST", edit, lambda edit=edit, t=table: (
+                "POST", f.url(edit, id=(r := f.row(t))[0], batch_id=r[1]), {"data": f.ledger_form(t, r[0])})),
+            (f"{delete}", delete, lambda delete=delete, t=table: (
+                "GET", f.url(delete, id=(r := f.spare(t))[0], batch_id=r[1]), {})),
+            (f"api_batch_ledger GET {table}", "api_batch_ledger", lambda t=table: (
+                "GET", f.url("api_batch_ledger", batch_id=f.batch(), table=t), {})),
+            (f"api_batch_ledger POST {table}", "api_batch_ledger", lambda t=table: (
+                "POST", f.url("api_batch_ledger", batch_id=f.batch(), table=t), {"json": [f.record(t) for _ in range(5)]})),
+            (f"api_ledger_record GET {table}", "api_ledger_record", lambda t=table: (
+                "GET", f.url("api_ledger_record", table=t, id=f.row(t)[0]), {})),
+            (f"api_ledger_record PUT {table}", "api_ledger_record", lambda t=table: (
+                "PUT", f.url("api_ledger_record", table=t, id=(r := f.row(t))[0]), {"json": f.ledger_form(t, r[0])})),
+            (f"api_ledger_record DELETE {table}", "api_ledger_record", lambda t=table: (
+                "DELETE", f.url("api_ledger_record", table=t, id=f.spare(t)[0]), {})),
+        ]
+    # last: archiving moves batches out from under the routes above
+    out += [
+        ("archive_view", "archive_view", lambda: ("GET", f.url("archive_view"), {})),
+        ("archive_batch_view", "archive_batch_view", lambda: (
+            "GET", f.url("archive_batch_view", batch_id=f.spare_batch(completed=True)), {})),
+        ("restore_batch_view", "restore_batch_view", lambda: (
+            "GET", f.url("restore_batch_view", batch_id=f.spare_batch()), {})),
+    ]
+    return out
+
+
+def _csv(f, table, n):
+    records = [f.record(table) for _ in range(n)]
+    lines = [",".join(records[0])] + [",".join(r.values()) for r in records]
+    return "\n".join(lines).encode()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def run(batches, requests, seed, only=None):
+    import app as app_module
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        written = build(path, batches, seed)
+        app_module.app.config["DB_PATH"] = path
+
+        statements = [0]
+        connect_db = app_module.connect_db
+
+        request_thread = threading.get_ident()
+
+        def trace(sql):
+            # trigger bodies are reported as "-- trigger_name"; count what the route sent,
+            # not what background jobs run meanwhile
+            if not sql.startswith("--") and threading.get_ident() == request_thread:
+                statements[0] += 1
+
+        def counted_connect(*args, **kwargs):
+            conn = connect_db(*args, **kwargs)
+            conn.set_trace_callback(trace)
+            return conn
+
+        app_module.connect_db = counted_connect
+        fixture = Fixture(app_module, path, seed)
+        # no cookies: flashed messages would otherwise pile up in the session
+        client = app_module.app.test_client(use_cookies=False)
+        results, covered = {}, set()
+        try:
+            for name, endpoint, prepare in routes(fixture):
+                covered.add(endpoint)
+                if only and not any(o in name for o in only):
+                    continue
+                times, queries, errors = [], [], 0
+                for _ in range(requests):
+                    method, url, kwargs = prepare()
+                    statements[0] = 0
+                    started = time.perf_counter()
+                    response = client.open(url, method=method, **kwargs)
+                    response.get_data()
+                    times.append((time.perf_counter() - started) * 1000)
+                    queries.append(statements[0])
+                    errors += response.status_code >= 400
+                    response.close()
+                results[name] = {
+                    "p50_ms": round(percentile(times, 50), 3),
+                    "p95_ms": round(percentile(times, 95), 3),
+                    "p99_ms": round(percentile(times, 99), 3),
+                    "queries": round(sum(queries) / len(queries), 1),
+                    "errors": errors,
+                    "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                }
+        finally:
+            app_module.connect_db = connect_db
+            fixture.conn.close()
+            app_module.get_pool(path).close_all()
+
+    endpoints = {r.endpoint for r in app_module.app.url_map.iter_rules()}
+    return {
+        "commit": _commit(),
+        "batches": batches,
+        "rows": written,
+        "requests": requests,
+        "seed": seed,
+        "routes": results,
+        "uncovered": sorted(endpoints - covered),
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before, after):
+    """p95 and query count per route, old -> new."""
+    with open(before) as f:
+        old = json.load(f)["routes"]
+    with open(after) as f:
+        new = json.load(f)["routes"]
+    width = max(map(len, new))
+    for name, r in new.items():
+        o = old.get(name)
+        if o is None:
+            print(f"{name:<{width}}  {'new':>24}  p95 {r['p95_ms']:.2f} ms")
+            continue
+        change = (r["p95_ms"] - o["p95_ms"]) / o["p95_ms"] * 100 if o["p95_ms"] else 0
+        print(
+            f"{name:<{width}}  p95 {o['p95_ms']:8.2f} -> {r['p95_ms']:8.2f} ms ({change:+6.1f}%)"
+            f"  queries {o['queries']:g} -> {r['queries']:g}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20, help="timed requests per route")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="+", help="run routes whose name contains any of these")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two saved reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = json.dumps(run(args.batches, args.requests, args.seed, args.only), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
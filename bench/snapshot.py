@@ -0,0 +1,108 @@
+"""Write latency while a snapshot is taken.
+
+    python -m bench.snapshot --batches 200 --pages 64 1024 -1
+
+A separate process commits one feed row at a time for the whole run. Each
+--pages setting takes a snapshot after a quiet second, then another second
+passes before the next setting. The report gives the snapshot's duration and
+size, and write latency percentiles while idle and while the backup ran. A
+backup step that had to restart because of a concurrent write shows up as a
+longer duration and in "restarts", not as blocked writes; past
+SNAPSHOT_MAX_RESTARTS the rest is copied in one step.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from bench.generate import build
+from bench.routes import _commit, percentile
+
+
+def _writer(path, stop, out):
+    import app as app_module
+
+    conn = app_module.connect_db(path)
+    batch_id = conn.execute("SELECT MAX(id) FROM batches").fetchone()[0]
+    samples = []
+    while not stop.is_set():
+        started = time.time()
+        conn.execute(
+            "INSERT INTO feed (batch_id, date, feed_type, quantity, price) VALUES (?, date('now'), 'نامي', 100, 2500)",
+            (batch_id,),
+        )
+        conn.commit()
+        samples.append((started, (time.time() - started) * 1000))
+    conn.close()
+    out.put(samples)
+
+
+def _summary(times):
+    times = times or [0]
+    return {
+        "writes": len(times),
+        "p50_ms": round(percentile(times, 50), 3),
+        "p99_ms": round(percentile(times, 99), 3),
+        "max_ms": round(max(times), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--pages", type=int, nargs="+", default=[64, 1024, -1], help="pages per backup step")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "farm.db")
+        build(path, args.batches, args.seed)
+        os.environ.update(DB_PATH=path, ARCHIVE_PATH="", FARMS_DIR="", SNAPSHOT_DIR=os.path.join(tmp, "snapshots"))
+        import app as app_module
+
+        stop, out = multiprocessing.Event(), multiprocessing.Queue()
+        writer = multiprocessing.Process(target=_writer, args=(path, stop, out))
+        writer.start()
+        conn = app_module.connect_db(path)
+        windows = []
+        for pages in args.pages:
+            time.sleep(1)
+            app_module.app.config["SNAPSHOT_PAGES"] = pages
+            started = time.time()
+            result = app_module.take_snapshot(conn)
+            windows.append((pages, started, time.time(), result))
+        time.sleep(1)
+        stop.set()
+        samples = out.get()
+        writer.join()
+        conn.close()
+
+    during = lambda t: any(start <= t <= end for _, start, end, _ in windows)
+    report = {
+        "commit": _commit(),
+        "batches": args.batches,
+        "idle": _summary([ms for t, ms in samples if not during(t)]),
+        "snapshots": [
+            {
+                "pages_per_step": pages,
+                "seconds": round(end - start, 3),
+                "pages": result["pages"],
+                "restarts": result["restarts"],
+                "writes": _summary([ms for t, ms in samples if start <= t <= end]),
+            }
+            for pages, start, end, result in windows
+        ],
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
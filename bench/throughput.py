@@ -0,0 +1,200 @@
+"""Requests per second of the development server against serve.py.
+
+    python -m bench.throughput --batches 50 --seconds 10 --clients 16 --writes 0.2
+
+Each server gets its own copy of one generated farm and is driven over HTTP by
+client threads spread across a few processes, for a fixed time, with a mix of
+page reads and ledger inserts. The report gives requests per second, latency
+percentiles and responses by status; with the development server concurrent
+inserts can fail with "database is locked" (500), serve.py hands them all to
+one writer.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date
+
+from bench.generate import build
+from bench.routes import _commit, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = {
+    "dev": lambda args: [sys.executable, "app.py"],
+    "serve": lambda args: [sys.executable, "serve.py", "--workers", str(args.workers)],
+}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+def _requests(rng, batches, writes):
+    """Endless (method, url, form) picks: mostly page reads, `writes` of them inserts."""
+    today = date.today().isoformat()
+    while True:
+        b = rng.choice(batches)
+        if rng.random() < writes:
+            if rng.random() < 0.5:
+                yield "POST", f"/feed/add/{b}", {"date": today, "feed_type": "نامي", "quantity": "120", "price": "3300"}
+            else:
+                yield "POST", f"/mortality/add/{b}", {"date": today, "count": "3", "note": ""}
+        else:
+            yield rng.choice((
+                ("GET", "/", None),
+                ("GET", f"/batch/{b}", None),
+                ("GET", f"/batch/{b}/tab/{rng.choice(('feed', 'mortality', 'sales'))}", None),
+                ("GET", f"/report/{b}", None),
+                ("GET", "/analytics", None),
+            ))
+
+
+def _client(port, threads, seconds, batches, writes, seed, out):
+    import threading
+    from urllib.parse import urlencode
+
+    results = []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def loop(n):
+        picks = _requests(random.Random(seed * 1000 + n), batches, writes)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        mine = []
+        while time.monotonic() < stop:
+            method, url, form = next(picks)
+            body = urlencode(form).encode() if form else None
+            headers = {"Content-Type": "application/x-www-form-urlencoded"} if form else {}
+            started = time.perf_counter()
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader("Connection", "").lower() == "close" or response.version == 10:
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                status = "error"
+                conn.close()
+            mine.append((status, (time.perf_counter() - started) * 1000))
+        with lock:
+            results.extend(mine)
+
+    workers = [threading.Thread(target=loop, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    out.put(results)
+
+
+def measure(name, args, source, tmp):
+    path = os.path.join(tmp, f"{name}.db")
+    shutil.copyfile(source, path)
+    port = _free_port()
+    env = dict(os.environ, DB_PATH=path, PORT=str(port), ARCHIVE_PATH="", FARMS_DIR="", WRITER_SOCKET="")
+    proc = subprocess.Popen(
+        SERVERS[name](args), cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        _wait_ready(port, proc)
+        import sqlite3
+        conn = sqlite3.connect(path)
+        batches = [r[0] for r in conn.execute("SELECT id FROM batches")]
+        conn.close()
+
+        processes = min(args.processes, args.clients)
+        out = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=_client, args=(
+                port, args.clients // processes + (i < args.clients % processes), args.seconds,
+                batches, args.writes, args.seed + i, out,
+            ))
+            for i in range(processes)
+        ]
+        for c in clients:
+            c.start()
+        results = [r for _ in clients for r in out.get()]
+        for c in clients:
+            c.join()
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    times = [ms for _, ms in results] or [0]
+    return {
+        "requests": len(results),
+        "rps": round(len(results) / args.seconds, 1),
+        "p50_ms": round(percentile(times, 50), 2),
+        "p95_ms": round(percentile(times, 95), 2),
+        "p99_ms": round(percentile(times, 99), 2),
+        "status": {str(k): v for k, v in sorted(Counter(s for s, _ in results).items(), key=str)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent client connections")
+    parser.add_argument("--processes", type=int, default=4, help="client processes the connections are spread over")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="serve.py reader processes")
+    parser.add_argument("--writes", type=float, default=0.2, help="share of requests that insert a record")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--servers", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.db")
+        build(source, args.batches, args.seed)
+        report = {
+            "commit": _commit(),
+            "cpus": os.cpu_count(),
+            "batches": args.batches,
+            "clients": args.clients,
+            "seconds": args.seconds,
+            "writes": args.writes,
+            "servers": {name: measure(name, args, source, tmp) for name in args.servers},
+        }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
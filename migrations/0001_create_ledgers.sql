@@ -0,0 +1,71 @@
+-- step 1: create_ledgers. Frozen as shipped; a schema change is a new step.
+
+CREATE TABLE IF NOT EXISTS batches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        breed TEXT NOT NULL,
+        start_date TEXT NOT NULL,
+        initial_count INTEGER NOT NULL,
+        chick_price REAL DEFAULT 0
+    );
+
+CREATE TABLE IF NOT EXISTS feed (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER,
+        date TEXT,
+        feed_type TEXT,
+        quantity REAL,
+        price REAL,
+        FOREIGN KEY(batch_id) REFERENCES batches(id)
+    );
+
+CREATE TABLE IF NOT EXISTS medications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER,
+        date TEXT,
+        name TEXT,
+        purpose TEXT,
+        price REAL,
+        FOREIGN KEY(batch_id) REFERENCES batches(id)
+    );
+
+CREATE TABLE IF NOT EXISTS extra_expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER,
+        date TEXT,
+        name TEXT,
+        price REAL,
+        FOREIGN KEY(batch_id) REFERENCES batches(id)
+    );
+
+CREATE TABLE IF NOT EXISTS mortality (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER,
+        date TEXT,
+        count INTEGER,
+        note TEXT,
+        FOREIGN KEY(batch_id) REFERENCES batches(id)
+    );
+
+CREATE TABLE IF NOT EXISTS sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER,
+        date TEXT,
+        quantity INTEGER,
+        average_weight_kg REAL,
+        price_per_kg REAL,
+        total_weight_kg REAL,
+        total_price REAL,
+        note TEXT,
+        FOREIGN KEY(batch_id) REFERENCES batches(id)
+    );
+
+CREATE INDEX IF NOT EXISTS idx_feed_batch_date ON feed (batch_id, date, id);
+
+CREATE INDEX IF NOT EXISTS idx_medications_batch_date ON medications (batch_id, date, id);
+
+CREATE INDEX IF NOT EXISTS idx_extra_expenses_batch_date ON extra_expenses (batch_id, date, id);
+
+CREATE INDEX IF NOT EXISTS idx_mortality_batch_date ON mortality (batch_id, date, id);
+
+CREATE INDEX IF NOT EXISTS idx_sales_batch_date ON sales (batch_id, date, id);
@@ -0,0 +1,89 @@
+-- step 2: create_batch_totals. Frozen as shipped; a schema change is a new step.
+
+CREATE TABLE IF NOT EXISTS batch_totals (
+        batch_id INTEGER PRIMARY KEY,
+        feed_cost REAL NOT NULL DEFAULT 0,
+        med_cost REAL NOT NULL DEFAULT 0,
+        extra_cost REAL NOT NULL DEFAULT 0,
+        mortality_count INTEGER NOT NULL DEFAULT 0,
+        sold_qty INTEGER NOT NULL DEFAULT 0,
+        sold_weight REAL NOT NULL DEFAULT 0,
+        sales_revenue REAL NOT NULL DEFAULT 0
+    );
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_totals_ins AFTER INSERT ON batches BEGIN
+        INSERT OR IGNORE INTO batch_totals (batch_id) VALUES (NEW.id);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_totals_del AFTER DELETE ON batches BEGIN
+        DELETE FROM batch_totals WHERE batch_id = OLD.id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_totals_ins AFTER INSERT ON feed BEGIN
+            UPDATE batch_totals SET feed_cost = feed_cost + COALESCE(NEW.price, 0) WHERE batch_id = NEW.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_totals_del AFTER DELETE ON feed BEGIN
+            UPDATE batch_totals SET feed_cost = feed_cost - COALESCE(OLD.price, 0) WHERE batch_id = OLD.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_totals_upd AFTER UPDATE OF batch_id, price ON feed BEGIN
+            UPDATE batch_totals SET feed_cost = feed_cost - COALESCE(OLD.price, 0) WHERE batch_id = OLD.batch_id;
+            UPDATE batch_totals SET feed_cost = feed_cost + COALESCE(NEW.price, 0) WHERE batch_id = NEW.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_totals_ins AFTER INSERT ON medications BEGIN
+            UPDATE batch_totals SET med_cost = med_cost + COALESCE(NEW.price, 0) WHERE batch_id = NEW.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_totals_del AFTER DELETE ON medications BEGIN
+            UPDATE batch_totals SET med_cost = med_cost - COALESCE(OLD.price, 0) WHERE batch_id = OLD.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_totals_upd AFTER UPDATE OF batch_id, price ON medications BEGIN
+            UPDATE batch_totals SET med_cost = med_cost - COALESCE(OLD.price, 0) WHERE batch_id = OLD.batch_id;
+            UPDATE batch_totals SET med_cost = med_cost + COALESCE(NEW.price, 0) WHERE batch_id = NEW.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_totals_ins AFTER INSERT ON extra_expenses BEGIN
+            UPDATE batch_totals SET extra_cost = extra_cost + COALESCE(NEW.price, 0) WHERE batch_id = NEW.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_totals_del AFTER DELETE ON extra_expenses BEGIN
+            UPDATE batch_totals SET extra_cost = extra_cost - COALESCE(OLD.price, 0) WHERE batch_id = OLD.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_totals_upd AFTER UPDATE OF batch_id, price ON extra_expenses BEGIN
+            UPDATE batch_totals SET extra_cost = extra_cost - COALESCE(OLD.price, 0) WHERE batch_id = OLD.batch_id;
+            UPDATE batch_totals SET extra_cost = extra_cost + COALESCE(NEW.price, 0) WHERE batch_id = NEW.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_totals_ins AFTER INSERT ON mortality BEGIN
+            UPDATE batch_totals SET mortality_count = mortality_count + COALESCE(NEW.count, 0) WHERE batch_id = NEW.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_totals_del AFTER DELETE ON mortality BEGIN
+            UPDATE batch_totals SET mortality_count = mortality_count - COALESCE(OLD.count, 0) WHERE batch_id = OLD.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_totals_upd AFTER UPDATE OF batch_id, count ON mortality BEGIN
+            UPDATE batch_totals SET mortality_count = mortality_count - COALESCE(OLD.count, 0) WHERE batch_id = OLD.batch_id;
+            UPDATE batch_totals SET mortality_count = mortality_count + COALESCE(NEW.count, 0) WHERE batch_id = NEW.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_totals_ins AFTER INSERT ON sales BEGIN
+            UPDATE batch_totals SET sold_qty = sold_qty + COALESCE(NEW.quantity, 0), sold_weight = sold_weight + COALESCE(NEW.total_weight_kg, 0), sales_revenue = sales_revenue + COALESCE(NEW.total_price, 0) WHERE batch_id = NEW.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_totals_del AFTER DELETE ON sales BEGIN
+            UPDATE batch_totals SET sold_qty = sold_qty - COALESCE(OLD.quantity, 0), sold_weight = sold_weight - COALESCE(OLD.total_weight_kg, 0), sales_revenue = sales_revenue - COALESCE(OLD.total_price, 0) WHERE batch_id = OLD.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_totals_upd AFTER UPDATE OF batch_id, quantity, total_weight_kg, total_price ON sales BEGIN
+            UPDATE batch_totals SET sold_qty = sold_qty - COALESCE(OLD.quantity, 0), sold_weight = sold_weight - COALESCE(OLD.total_weight_kg, 0), sales_revenue = sales_revenue - COALESCE(OLD.total_price, 0) WHERE batch_id = OLD.batch_id;
+            UPDATE batch_totals SET sold_qty = sold_qty + COALESCE(NEW.quantity, 0), sold_weight = sold_weight + COALESCE(NEW.total_weight_kg, 0), sales_revenue = sales_revenue + COALESCE(NEW.total_price, 0) WHERE batch_id = NEW.batch_id;
+        END;
+
+DELETE FROM batch_totals;
+
+INSERT INTO batch_totals (batch_id, feed_cost, med_cost, extra_cost, mortality_count, sold_qty, sold_weight, sales_revenue) SELECT b.id AS batch_id, (SELECT COALESCE(SUM(price), 0) FROM feed WHERE batch_id = b.id) AS feed_cost, (SELECT COALESCE(SUM(price), 0) FROM medications WHERE batch_id = b.id) AS med_cost, (SELECT COALESCE(SUM(price), 0) FROM extra_expenses WHERE batch_id = b.id) AS extra_cost, (SELECT COALESCE(SUM(count), 0) FROM mortality WHERE batch_id = b.id) AS mortality_count, (SELECT COALESCE(SUM(quantity), 0) FROM sales WHERE batch_id = b.id) AS sold_qty, (SELECT COALESCE(SUM(total_weight_kg), 0) FROM sales WHERE batch_id = b.id) AS sold_weight, (SELECT COALESCE(SUM(total_price), 0) FROM sales WHERE batch_id = b.id) AS sales_revenue FROM batches b;
@@ -0,0 +1,147 @@
+-- step 3: create_growth. Frozen as shipped; a schema change is a new step.
+
+CREATE TABLE IF NOT EXISTS growth (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER,
+        date TEXT,
+        avg_weight REAL,
+        dead_count INTEGER DEFAULT 0,
+        notes TEXT,
+        prev_date TEXT,
+        prev_weight REAL,
+        feed_kg REAL NOT NULL DEFAULT 0,
+        birds INTEGER,
+        FOREIGN KEY(batch_id) REFERENCES batches(id)
+    );
+
+CREATE INDEX IF NOT EXISTS idx_growth_batch_date ON growth (batch_id, date, id);
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_ins AFTER INSERT ON growth BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE id IN (NEW.id, (SELECT n.id FROM growth n WHERE n.batch_id = NEW.batch_id AND (n.date, n.id) > (NEW.date, NEW.id) ORDER BY n.date, n.id LIMIT 1)); END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_upd AFTER UPDATE OF batch_id, date, avg_weight ON growth BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE id IN (NEW.id, (SELECT n.id FROM growth n WHERE n.batch_id = NEW.batch_id AND (n.date, n.id) > (NEW.date, NEW.id) ORDER BY n.date, n.id LIMIT 1), (SELECT n.id FROM growth n WHERE n.batch_id = OLD.batch_id AND (n.date, n.id) > (OLD.date, OLD.id) ORDER BY n.date, n.id LIMIT 1)); END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_del AFTER DELETE ON growth BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE id = (SELECT n.id FROM growth n WHERE n.batch_id = OLD.batch_id AND (n.date, n.id) > (OLD.date, OLD.id) ORDER BY n.date, n.id LIMIT 1); END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_growth_ins AFTER INSERT ON feed BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE id = (SELECT g.id FROM growth g WHERE g.batch_id = NEW.batch_id AND g.date >= NEW.date ORDER BY g.date, g.id LIMIT 1); END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_growth_upd AFTER UPDATE OF batch_id, date, quantity ON feed BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE id IN ((SELECT g.id FROM growth g WHERE g.batch_id = NEW.batch_id AND g.date >= NEW.date ORDER BY g.date, g.id LIMIT 1), (SELECT g.id FROM growth g WHERE g.batch_id = OLD.batch_id AND g.date >= OLD.date ORDER BY g.date, g.id LIMIT 1)); END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_growth_del AFTER DELETE ON feed BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE id = (SELECT g.id FROM growth g WHERE g.batch_id = OLD.batch_id AND g.date >= OLD.date ORDER BY g.date, g.id LIMIT 1); END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_growth_ins AFTER INSERT ON mortality BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE batch_id = NEW.batch_id AND date >= NEW.date; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_growth_upd AFTER UPDATE OF batch_id, date, count ON mortality BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE (batch_id = NEW.batch_id AND date >= NEW.date) OR (batch_id = OLD.batch_id AND date >= OLD.date); END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_growth_del AFTER DELETE ON mortality BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE batch_id = OLD.batch_id AND date >= OLD.date; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_growth_ins AFTER INSERT ON sales BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE batch_id = NEW.batch_id AND date >= NEW.date; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_growth_upd AFTER UPDATE OF batch_id, date, quantity ON sales BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE (batch_id = NEW.batch_id AND date >= NEW.date) OR (batch_id = OLD.batch_id AND date >= OLD.date); END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_growth_del AFTER DELETE ON sales BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE batch_id = OLD.batch_id AND date >= OLD.date; END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_growth_upd AFTER UPDATE OF initial_count ON batches BEGIN UPDATE growth SET
+    prev_date = (SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    prev_weight = (SELECT p.avg_weight FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1),
+    feed_kg = (SELECT COALESCE(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = growth.batch_id
+               AND f.date <= growth.date AND f.date > COALESCE((SELECT p.date FROM growth p WHERE p.batch_id = growth.batch_id AND (p.date, p.id) < (growth.date, growth.id) ORDER BY p.date DESC, p.id DESC LIMIT 1), '')),
+    birds = (SELECT b.initial_count FROM batches b WHERE b.id = growth.batch_id)
+        - (SELECT COALESCE(SUM(m.count), 0) FROM mortality m WHERE m.batch_id = growth.batch_id AND m.date <= growth.date)
+        - (SELECT COALESCE(SUM(s.quantity), 0) FROM sales s WHERE s.batch_id = growth.batch_id AND s.date <= growth.date)
+    WHERE batch_id = NEW.id; END;
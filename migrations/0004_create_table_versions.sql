@@ -0,0 +1,105 @@
+-- step 4: create_table_versions. Frozen as shipped; a schema change is a new step.
+
+CREATE TABLE IF NOT EXISTS table_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        changed_at INTEGER NOT NULL DEFAULT 0
+    );
+
+INSERT OR IGNORE INTO table_versions (name, changed_at) VALUES ('batches', strftime('%s','now'));
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_version_ins AFTER INSERT ON batches BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'batches';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_version_upd AFTER UPDATE ON batches BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'batches';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_version_del AFTER DELETE ON batches BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'batches';
+            END;
+
+INSERT OR IGNORE INTO table_versions (name, changed_at) VALUES ('feed', strftime('%s','now'));
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_version_ins AFTER INSERT ON feed BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'feed';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_version_upd AFTER UPDATE ON feed BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'feed';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_version_del AFTER DELETE ON feed BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'feed';
+            END;
+
+INSERT OR IGNORE INTO table_versions (name, changed_at) VALUES ('medications', strftime('%s','now'));
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_version_ins AFTER INSERT ON medications BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'medications';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_version_upd AFTER UPDATE ON medications BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'medications';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_version_del AFTER DELETE ON medications BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'medications';
+            END;
+
+INSERT OR IGNORE INTO table_versions (name, changed_at) VALUES ('extra_expenses', strftime('%s','now'));
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_version_ins AFTER INSERT ON extra_expenses BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'extra_expenses';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_version_upd AFTER UPDATE ON extra_expenses BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'extra_expenses';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_version_del AFTER DELETE ON extra_expenses BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'extra_expenses';
+            END;
+
+INSERT OR IGNORE INTO table_versions (name, changed_at) VALUES ('mortality', strftime('%s','now'));
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_version_ins AFTER INSERT ON mortality BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'mortality';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_version_upd AFTER UPDATE ON mortality BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'mortality';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_version_del AFTER DELETE ON mortality BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'mortality';
+            END;
+
+INSERT OR IGNORE INTO table_versions (name, changed_at) VALUES ('sales', strftime('%s','now'));
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_version_ins AFTER INSERT ON sales BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'sales';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_version_upd AFTER UPDATE ON sales BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'sales';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_version_del AFTER DELETE ON sales BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'sales';
+            END;
+
+INSERT OR IGNORE INTO table_versions (name, changed_at) VALUES ('growth', strftime('%s','now'));
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_version_ins AFTER INSERT ON growth BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'growth';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_version_upd AFTER UPDATE ON growth BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'growth';
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_version_del AFTER DELETE ON growth BEGIN
+                UPDATE table_versions SET version = version + 1, changed_at = strftime('%s','now') WHERE name = 'growth';
+            END;
@@ -0,0 +1,95 @@
+-- step 6: create_changes. Frozen as shipped; a schema change is a new step.
+
+CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tbl TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        at INTEGER NOT NULL DEFAULT (strftime('%s','now'))
+    );
+
+CREATE INDEX IF NOT EXISTS idx_changes_tbl_seq ON changes (tbl, seq, op, row_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_changes_i AFTER INSERT ON batches  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('batches', NEW.id, 'i');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_changes_u AFTER UPDATE ON batches WHEN OLD.id IS NOT NEW.id OR OLD.name IS NOT NEW.name OR OLD.breed IS NOT NEW.breed OR OLD.start_date IS NOT NEW.start_date OR OLD.initial_count IS NOT NEW.initial_count OR OLD.chick_price IS NOT NEW.chick_price OR OLD.is_completed IS NOT NEW.is_completed OR OLD.end_date IS NOT NEW.end_date BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('batches', NEW.id, 'u');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_changes_d AFTER DELETE ON batches  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('batches', OLD.id, 'd');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_changes_i AFTER INSERT ON feed  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('feed', NEW.id, 'i');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_changes_u AFTER UPDATE ON feed WHEN OLD.id IS NOT NEW.id OR OLD.batch_id IS NOT NEW.batch_id OR OLD.date IS NOT NEW.date OR OLD.feed_type IS NOT NEW.feed_type OR OLD.quantity IS NOT NEW.quantity OR OLD.price IS NOT NEW.price BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('feed', NEW.id, 'u');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_changes_d AFTER DELETE ON feed  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('feed', OLD.id, 'd');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_changes_i AFTER INSERT ON medications  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('medications', NEW.id, 'i');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_changes_u AFTER UPDATE ON medications WHEN OLD.id IS NOT NEW.id OR OLD.batch_id IS NOT NEW.batch_id OR OLD.date IS NOT NEW.date OR OLD.name IS NOT NEW.name OR OLD.purpose IS NOT NEW.purpose OR OLD.price IS NOT NEW.price BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('medications', NEW.id, 'u');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_changes_d AFTER DELETE ON medications  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('medications', OLD.id, 'd');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_changes_i AFTER INSERT ON extra_expenses  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('extra_expenses', NEW.id, 'i');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_changes_u AFTER UPDATE ON extra_expenses WHEN OLD.id IS NOT NEW.id OR OLD.batch_id IS NOT NEW.batch_id OR OLD.date IS NOT NEW.date OR OLD.name IS NOT NEW.name OR OLD.price IS NOT NEW.price BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('extra_expenses', NEW.id, 'u');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_changes_d AFTER DELETE ON extra_expenses  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('extra_expenses', OLD.id, 'd');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_changes_i AFTER INSERT ON mortality  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('mortality', NEW.id, 'i');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_changes_u AFTER UPDATE ON mortality WHEN OLD.id IS NOT NEW.id OR OLD.batch_id IS NOT NEW.batch_id OR OLD.date IS NOT NEW.date OR OLD.count IS NOT NEW.count OR OLD.note IS NOT NEW.note BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('mortality', NEW.id, 'u');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_changes_d AFTER DELETE ON mortality  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('mortality', OLD.id, 'd');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_changes_i AFTER INSERT ON sales  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('sales', NEW.id, 'i');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_changes_u AFTER UPDATE ON sales WHEN OLD.id IS NOT NEW.id OR OLD.batch_id IS NOT NEW.batch_id OR OLD.date IS NOT NEW.date OR OLD.quantity IS NOT NEW.quantity OR OLD.average_weight_kg IS NOT NEW.average_weight_kg OR OLD.price_per_kg IS NOT NEW.price_per_kg OR OLD.total_weight_kg IS NOT NEW.total_weight_kg OR OLD.total_price IS NOT NEW.total_price OR OLD.note IS NOT NEW.note BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('sales', NEW.id, 'u');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_changes_d AFTER DELETE ON sales  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('sales', OLD.id, 'd');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_changes_i AFTER INSERT ON growth  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('growth', NEW.id, 'i');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_changes_u AFTER UPDATE ON growth WHEN OLD.id IS NOT NEW.id OR OLD.batch_id IS NOT NEW.batch_id OR OLD.date IS NOT NEW.date OR OLD.avg_weight IS NOT NEW.avg_weight OR OLD.dead_count IS NOT NEW.dead_count OR OLD.notes IS NOT NEW.notes OR OLD.prev_date IS NOT NEW.prev_date OR OLD.prev_weight IS NOT NEW.prev_weight OR OLD.feed_kg IS NOT NEW.feed_kg OR OLD.birds IS NOT NEW.birds BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('growth', NEW.id, 'u');
+            END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_changes_d AFTER DELETE ON growth  BEGIN
+                INSERT INTO changes (tbl, row_id, op) VALUES ('growth', OLD.id, 'd');
+            END;
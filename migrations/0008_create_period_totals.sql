@@ -0,0 +1,103 @@
+-- step 8: create_period_totals. Frozen as shipped; a schema change is a new step.
+
+CREATE TABLE IF NOT EXISTS period_totals (
+        day TEXT NOT NULL,
+        batch_id INTEGER NOT NULL,
+        chick_cost REAL NOT NULL DEFAULT 0,
+        feed_cost REAL NOT NULL DEFAULT 0, med_cost REAL NOT NULL DEFAULT 0, extra_cost REAL NOT NULL DEFAULT 0, mortality_count INTEGER NOT NULL DEFAULT 0, sold_qty INTEGER NOT NULL DEFAULT 0, sold_weight REAL NOT NULL DEFAULT 0, sales_revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, batch_id)
+    ) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_period_totals_batch ON period_totals (batch_id, day);
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_period_ins AFTER INSERT ON batches BEGIN
+        INSERT INTO period_totals (day, batch_id, chick_cost) SELECT date(NEW.start_date), NEW.id, COALESCE(NEW.chick_price, 0) * COALESCE(NEW.initial_count, 0) WHERE date(NEW.start_date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET chick_cost = chick_cost + excluded.chick_cost;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_period_upd AFTER UPDATE OF start_date, initial_count, chick_price ON batches BEGIN
+        UPDATE period_totals SET chick_cost = chick_cost - COALESCE(OLD.chick_price, 0) * COALESCE(OLD.initial_count, 0) WHERE day = date(OLD.start_date) AND batch_id = OLD.id;
+        INSERT INTO period_totals (day, batch_id, chick_cost) SELECT date(NEW.start_date), NEW.id, COALESCE(NEW.chick_price, 0) * COALESCE(NEW.initial_count, 0) WHERE date(NEW.start_date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET chick_cost = chick_cost + excluded.chick_cost;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_period_del AFTER DELETE ON batches BEGIN
+        DELETE FROM period_totals WHERE batch_id = OLD.id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_period_ins AFTER INSERT ON feed BEGIN
+            INSERT INTO period_totals (day, batch_id, feed_cost) SELECT date(NEW.date), NEW.batch_id, COALESCE(NEW.price, 0) WHERE date(NEW.date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET feed_cost = feed_cost + excluded.feed_cost;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_period_del AFTER DELETE ON feed BEGIN
+            UPDATE period_totals SET feed_cost = feed_cost - COALESCE(OLD.price, 0) WHERE day = date(OLD.date) AND batch_id = OLD.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_period_upd AFTER UPDATE OF batch_id, date, price ON feed BEGIN
+            UPDATE period_totals SET feed_cost = feed_cost - COALESCE(OLD.price, 0) WHERE day = date(OLD.date) AND batch_id = OLD.batch_id;
+            INSERT INTO period_totals (day, batch_id, feed_cost) SELECT date(NEW.date), NEW.batch_id, COALESCE(NEW.price, 0) WHERE date(NEW.date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET feed_cost = feed_cost + excluded.feed_cost;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_period_ins AFTER INSERT ON medications BEGIN
+            INSERT INTO period_totals (day, batch_id, med_cost) SELECT date(NEW.date), NEW.batch_id, COALESCE(NEW.price, 0) WHERE date(NEW.date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET med_cost = med_cost + excluded.med_cost;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_period_del AFTER DELETE ON medications BEGIN
+            UPDATE period_totals SET med_cost = med_cost - COALESCE(OLD.price, 0) WHERE day = date(OLD.date) AND batch_id = OLD.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_period_upd AFTER UPDATE OF batch_id, date, price ON medications BEGIN
+            UPDATE period_totals SET med_cost = med_cost - COALESCE(OLD.price, 0) WHERE day = date(OLD.date) AND batch_id = OLD.batch_id;
+            INSERT INTO period_totals (day, batch_id, med_cost) SELECT date(NEW.date), NEW.batch_id, COALESCE(NEW.price, 0) WHERE date(NEW.date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET med_cost = med_cost + excluded.med_cost;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_period_ins AFTER INSERT ON extra_expenses BEGIN
+            INSERT INTO period_totals (day, batch_id, extra_cost) SELECT date(NEW.date), NEW.batch_id, COALESCE(NEW.price, 0) WHERE date(NEW.date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET extra_cost = extra_cost + excluded.extra_cost;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_period_del AFTER DELETE ON extra_expenses BEGIN
+            UPDATE period_totals SET extra_cost = extra_cost - COALESCE(OLD.price, 0) WHERE day = date(OLD.date) AND batch_id = OLD.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_period_upd AFTER UPDATE OF batch_id, date, price ON extra_expenses BEGIN
+            UPDATE period_totals SET extra_cost = extra_cost - COALESCE(OLD.price, 0) WHERE day = date(OLD.date) AND batch_id = OLD.batch_id;
+            INSERT INTO period_totals (day, batch_id, extra_cost) SELECT date(NEW.date), NEW.batch_id, COALESCE(NEW.price, 0) WHERE date(NEW.date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET extra_cost = extra_cost + excluded.extra_cost;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_period_ins AFTER INSERT ON mortality BEGIN
+            INSERT INTO period_totals (day, batch_id, mortality_count) SELECT date(NEW.date), NEW.batch_id, COALESCE(NEW.count, 0) WHERE date(NEW.date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET mortality_count = mortality_count + excluded.mortality_count;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_period_del AFTER DELETE ON mortality BEGIN
+            UPDATE period_totals SET mortality_count = mortality_count - COALESCE(OLD.count, 0) WHERE day = date(OLD.date) AND batch_id = OLD.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_period_upd AFTER UPDATE OF batch_id, date, count ON mortality BEGIN
+            UPDATE period_totals SET mortality_count = mortality_count - COALESCE(OLD.count, 0) WHERE day = date(OLD.date) AND batch_id = OLD.batch_id;
+            INSERT INTO period_totals (day, batch_id, mortality_count) SELECT date(NEW.date), NEW.batch_id, COALESCE(NEW.count, 0) WHERE date(NEW.date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET mortality_count = mortality_count + excluded.mortality_count;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_period_ins AFTER INSERT ON sales BEGIN
+            INSERT INTO period_totals (day, batch_id, sold_qty, sold_weight, sales_revenue) SELECT date(NEW.date), NEW.batch_id, COALESCE(NEW.quantity, 0), COALESCE(NEW.total_weight_kg, 0), COALESCE(NEW.total_price, 0) WHERE date(NEW.date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET sold_qty = sold_qty + excluded.sold_qty, sold_weight = sold_weight + excluded.sold_weight, sales_revenue = sales_revenue + excluded.sales_revenue;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_period_del AFTER DELETE ON sales BEGIN
+            UPDATE period_totals SET sold_qty = sold_qty - COALESCE(OLD.quantity, 0), sold_weight = sold_weight - COALESCE(OLD.total_weight_kg, 0), sales_revenue = sales_revenue - COALESCE(OLD.total_price, 0) WHERE day = date(OLD.date) AND batch_id = OLD.batch_id;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_period_upd AFTER UPDATE OF batch_id, date, quantity, total_weight_kg, total_price ON sales BEGIN
+            UPDATE period_totals SET sold_qty = sold_qty - COALESCE(OLD.quantity, 0), sold_weight = sold_weight - COALESCE(OLD.total_weight_kg, 0), sales_revenue = sales_revenue - COALESCE(OLD.total_price, 0) WHERE day = date(OLD.date) AND batch_id = OLD.batch_id;
+            INSERT INTO period_totals (day, batch_id, sold_qty, sold_weight, sales_revenue) SELECT date(NEW.date), NEW.batch_id, COALESCE(NEW.quantity, 0), COALESCE(NEW.total_weight_kg, 0), COALESCE(NEW.total_price, 0) WHERE date(NEW.date) IS NOT NULL ON CONFLICT (day, batch_id) DO UPDATE SET sold_qty = sold_qty + excluded.sold_qty, sold_weight = sold_weight + excluded.sold_weight, sales_revenue = sales_revenue + excluded.sales_revenue;
+        END;
+
+DELETE FROM main.period_totals;
+
+INSERT INTO main.period_totals (day, batch_id, chick_cost) SELECT date(start_date), id, COALESCE(chick_price, 0) * COALESCE(initial_count, 0) FROM main.batches WHERE date(start_date) IS NOT NULL;
+
+INSERT INTO main.period_totals (day, batch_id, feed_cost) SELECT date(date) AS d, batch_id, COALESCE(SUM(price), 0) FROM main.feed WHERE d IS NOT NULL GROUP BY d, batch_id ON CONFLICT (day, batch_id) DO UPDATE SET feed_cost = feed_cost + excluded.feed_cost;
+
+INSERT INTO main.period_totals (day, batch_id, med_cost) SELECT date(date) AS d, batch_id, COALESCE(SUM(price), 0) FROM main.medications WHERE d IS NOT NULL GROUP BY d, batch_id ON CONFLICT (day, batch_id) DO UPDATE SET med_cost = med_cost + excluded.med_cost;
+
+INSERT INTO main.period_totals (day, batch_id, extra_cost) SELECT date(date) AS d, batch_id, COALESCE(SUM(price), 0) FROM main.extra_expenses WHERE d IS NOT NULL GROUP BY d, batch_id ON CONFLICT (day, batch_id) DO UPDATE SET extra_cost = extra_cost + excluded.extra_cost;
+
+INSERT INTO main.period_totals (day, batch_id, mortality_count) SELECT date(date) AS d, batch_id, COALESCE(SUM(count), 0) FROM main.mortality WHERE d IS NOT NULL GROUP BY d, batch_id ON CONFLICT (day, batch_id) DO UPDATE SET mortality_count = mortality_count + excluded.mortality_count;
+
+INSERT INTO main.period_totals (day, batch_id, sold_qty, sold_weight, sales_revenue) SELECT date(date) AS d, batch_id, COALESCE(SUM(quantity), 0), COALESCE(SUM(total_weight_kg), 0), COALESCE(SUM(total_price), 0) FROM main.sales WHERE d IS NOT NULL GROUP BY d, batch_id ON CONFLICT (day, batch_id) DO UPDATE SET sold_qty = sold_qty + excluded.sold_qty, sold_weight = sold_weight + excluded.sold_weight, sales_revenue = sales_revenue + excluded.sales_revenue;
@@ -0,0 +1,289 @@
+-- step 9: create_forecasts. Frozen as shipped; a schema change is a new step.
+
+CREATE TABLE IF NOT EXISTS forecasts (
+        batch_id INTEGER PRIMARY KEY,
+        samples INTEGER NOT NULL DEFAULT 0,
+        last_date TEXT,
+        weight REAL,
+        daily_gain REAL,
+        fcr REAL,
+        feed_price REAL
+    );
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_forecast_ins AFTER INSERT ON batches BEGIN
+            DELETE FROM forecasts WHERE batch_id = NEW.id;
+            INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(w.date) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                WHERE b.end_date IS NULL AND b.id = NEW.id
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND g.date >= date(l.last_date, '-14 days')
+        )
+        GROUP BY id
+    ) s;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_forecast_upd AFTER UPDATE OF start_date, end_date ON batches BEGIN
+            DELETE FROM forecasts WHERE batch_id = NEW.id;
+            INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(w.date) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                WHERE b.end_date IS NULL AND b.id = NEW.id
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND g.date >= date(l.last_date, '-14 days')
+        )
+        GROUP BY id
+    ) s;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_forecast_del AFTER DELETE ON batches BEGIN
+        DELETE FROM forecasts WHERE batch_id = OLD.id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_forecast_ins AFTER INSERT ON growth BEGIN
+            DELETE FROM forecasts WHERE batch_id = NEW.batch_id;
+            INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(w.date) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                WHERE b.end_date IS NULL AND b.id = NEW.batch_id
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND g.date >= date(l.last_date, '-14 days')
+        )
+        GROUP BY id
+    ) s;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_forecast_del AFTER DELETE ON growth BEGIN
+            DELETE FROM forecasts WHERE batch_id = OLD.batch_id;
+            INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(w.date) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                WHERE b.end_date IS NULL AND b.id = OLD.batch_id
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND g.date >= date(l.last_date, '-14 days')
+        )
+        GROUP BY id
+    ) s;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_forecast_upd AFTER UPDATE OF batch_id, date, avg_weight, prev_weight, feed_kg, birds ON growth WHEN OLD.batch_id IS NOT NEW.batch_id OR OLD.date IS NOT NEW.date OR OLD.avg_weight IS NOT NEW.avg_weight OR OLD.prev_weight IS NOT NEW.prev_weight OR OLD.feed_kg IS NOT NEW.feed_kg OR OLD.birds IS NOT NEW.birds BEGIN
+            DELETE FROM forecasts WHERE batch_id = NEW.batch_id;
+            INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(w.date) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                WHERE b.end_date IS NULL AND b.id = NEW.batch_id
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND g.date >= date(l.last_date, '-14 days')
+        )
+        GROUP BY id
+    ) s;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_growth_forecast_move AFTER UPDATE OF batch_id ON growth WHEN OLD.batch_id IS NOT NEW.batch_id BEGIN
+            DELETE FROM forecasts WHERE batch_id = OLD.batch_id;
+            INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(w.date) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                WHERE b.end_date IS NULL AND b.id = OLD.batch_id
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND g.date >= date(l.last_date, '-14 days')
+        )
+        GROUP BY id
+    ) s;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_forecast_ins AFTER INSERT ON feed BEGIN
+            DELETE FROM forecasts WHERE batch_id = NEW.batch_id;
+            INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(w.date) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                WHERE b.end_date IS NULL AND b.id = NEW.batch_id
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND g.date >= date(l.last_date, '-14 days')
+        )
+        GROUP BY id
+    ) s;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_forecast_del AFTER DELETE ON feed BEGIN
+            DELETE FROM forecasts WHERE batch_id = OLD.batch_id;
+            INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(w.date) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                WHERE b.end_date IS NULL AND b.id = OLD.batch_id
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND g.date >= date(l.last_date, '-14 days')
+        )
+        GROUP BY id
+    ) s;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_forecast_upd AFTER UPDATE OF batch_id, date, quantity, price ON feed WHEN OLD.batch_id IS NOT NEW.batch_id OR OLD.date IS NOT NEW.date OR OLD.quantity IS NOT NEW.quantity OR OLD.price IS NOT NEW.price BEGIN
+            DELETE FROM forecasts WHERE batch_id = NEW.batch_id;
+            INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(w.date) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                WHERE b.end_date IS NULL AND b.id = NEW.batch_id
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND g.date >= date(l.last_date, '-14 days')
+        )
+        GROUP BY id
+    ) s;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_forecast_move AFTER UPDATE OF batch_id ON feed WHEN OLD.batch_id IS NOT NEW.batch_id BEGIN
+            DELETE FROM forecasts WHERE batch_id = OLD.batch_id;
+            INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price)
+    SELECT id, n, last_date,
+           CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END,
+           (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0),
+           feed_kg / NULLIF(gain_kg, 0),
+           (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id)
+    FROM (
+        SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx,
+               SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg
+        FROM (
+            SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x,
+                   g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds
+            FROM (
+                SELECT b.id, MAX(w.date) AS last_date
+                FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL
+                WHERE b.end_date IS NULL AND b.id = OLD.batch_id
+                GROUP BY b.id
+            ) l
+            LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL
+                AND g.date >= date(l.last_date, '-14 days')
+        )
+        GROUP BY id
+    ) s;
+        END;
+
+DELETE FROM forecasts;
+
+INSERT OR REPLACE INTO forecasts (batch_id, samples, last_date, weight, daily_gain, fcr, feed_price) SELECT id, n, last_date, CASE WHEN n * sxx - sx * sx > 0 THEN (sy - (n * sxy - sx * sy) / (n * sxx - sx * sx) * sx) / n ELSE sy / n END, (n * sxy - sx * sy) / NULLIF(n * sxx - sx * sx, 0), feed_kg / NULLIF(gain_kg, 0), (SELECT SUM(f.price) / NULLIF(SUM(f.quantity), 0) FROM feed f WHERE f.batch_id = s.id) FROM ( SELECT id, last_date, COUNT(x) AS n, SUM(x) AS sx, SUM(y) AS sy, SUM(x * y) AS sxy, SUM(x * x) AS sxx, SUM(CASE WHEN gain IS NOT NULL THEN feed_kg END) AS feed_kg, SUM(gain * birds) AS gain_kg FROM ( SELECT l.id, l.last_date, g.avg_weight AS y, julianday(g.date) - julianday(l.last_date) AS x, g.avg_weight - g.prev_weight AS gain, g.feed_kg, g.birds FROM ( SELECT b.id, MAX(w.date) AS last_date FROM batches b LEFT JOIN growth w ON w.batch_id = b.id AND w.avg_weight IS NOT NULL WHERE b.end_date IS NULL AND 1 GROUP BY b.id ) l LEFT JOIN growth g ON g.batch_id = l.id AND g.avg_weight IS NOT NULL AND g.date >= date(l.last_date, '-14 days') ) GROUP BY id ) s;
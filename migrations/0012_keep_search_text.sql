@@ -0,0 +1,138 @@
+-- step 12: keep_search_text. Frozen as shipped; a schema change is a new step.
+
+DROP TRIGGER IF EXISTS trg_batches_search_ins;
+
+DROP TRIGGER IF EXISTS trg_batches_search_del;
+
+DROP TRIGGER IF EXISTS trg_batches_search_upd;
+
+DROP TRIGGER IF EXISTS trg_feed_search_ins;
+
+DROP TRIGGER IF EXISTS trg_feed_search_del;
+
+DROP TRIGGER IF EXISTS trg_feed_search_upd;
+
+DROP TRIGGER IF EXISTS trg_medications_search_ins;
+
+DROP TRIGGER IF EXISTS trg_medications_search_del;
+
+DROP TRIGGER IF EXISTS trg_medications_search_upd;
+
+DROP TRIGGER IF EXISTS trg_extra_expenses_search_ins;
+
+DROP TRIGGER IF EXISTS trg_extra_expenses_search_del;
+
+DROP TRIGGER IF EXISTS trg_extra_expenses_search_upd;
+
+DROP TRIGGER IF EXISTS trg_mortality_search_ins;
+
+DROP TRIGGER IF EXISTS trg_mortality_search_del;
+
+DROP TRIGGER IF EXISTS trg_mortality_search_upd;
+
+DROP TRIGGER IF EXISTS trg_sales_search_ins;
+
+DROP TRIGGER IF EXISTS trg_sales_search_del;
+
+DROP TRIGGER IF EXISTS trg_sales_search_upd;
+
+DROP TABLE IF EXISTS search_index;
+
+CREATE VIRTUAL TABLE search_index USING fts5(
+        folded, body UNINDEXED, batch_id UNINDEXED, date UNINDEXED,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_search_ins AFTER INSERT ON batches BEGIN
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 1, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.breed, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.breed, ''), NEW.id, NEW.start_date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.breed, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_search_del AFTER DELETE ON batches BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 1;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_batches_search_upd AFTER UPDATE OF name, breed, start_date ON batches BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 1;
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 1, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.breed, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.breed, ''), NEW.id, NEW.start_date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.breed, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_search_ins AFTER INSERT ON feed BEGIN
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 2, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.feed_type, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.feed_type, ''), NEW.batch_id, NEW.date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.feed_type, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_search_del AFTER DELETE ON feed BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 2;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feed_search_upd AFTER UPDATE OF feed_type, batch_id, date ON feed BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 2;
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 2, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.feed_type, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.feed_type, ''), NEW.batch_id, NEW.date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.feed_type, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_search_ins AFTER INSERT ON medications BEGIN
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 3, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.purpose, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.purpose, ''), NEW.batch_id, NEW.date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.purpose, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_search_del AFTER DELETE ON medications BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 3;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_medications_search_upd AFTER UPDATE OF name, purpose, batch_id, date ON medications BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 3;
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 3, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.purpose, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.purpose, ''), NEW.batch_id, NEW.date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, '') || ' ' || COALESCE(NEW.purpose, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_search_ins AFTER INSERT ON extra_expenses BEGIN
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 4, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.name, ''), NEW.batch_id, NEW.date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_search_del AFTER DELETE ON extra_expenses BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 4;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_extra_expenses_search_upd AFTER UPDATE OF name, batch_id, date ON extra_expenses BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 4;
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 4, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.name, ''), NEW.batch_id, NEW.date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.name, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_search_ins AFTER INSERT ON mortality BEGIN
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 5, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.note, ''), NEW.batch_id, NEW.date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_search_del AFTER DELETE ON mortality BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 5;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_mortality_search_upd AFTER UPDATE OF note, batch_id, date ON mortality BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 5;
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 5, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.note, ''), NEW.batch_id, NEW.date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_search_ins AFTER INSERT ON sales BEGIN
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 6, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.note, ''), NEW.batch_id, NEW.date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_search_del AFTER DELETE ON sales BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 6;
+        END;
+
+CREATE TRIGGER IF NOT EXISTS trg_sales_search_upd AFTER UPDATE OF note, batch_id, date ON sales BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 8 + 6;
+            INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT NEW.id * 8 + 6, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(NEW.note, ''), NEW.batch_id, NEW.date  WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(NEW.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+        END;
+
+DELETE FROM search_index;
+
+INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT t.id * 8 + 1, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.name, '') || ' ' || COALESCE(t.breed, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(t.name, '') || ' ' || COALESCE(t.breed, ''), t.id, t.start_date FROM batches t WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.name, '') || ' ' || COALESCE(t.breed, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+
+INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT t.id * 8 + 2, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.feed_type, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(t.feed_type, ''), t.batch_id, t.date FROM feed t WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.feed_type, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+
+INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT t.id * 8 + 3, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.name, '') || ' ' || COALESCE(t.purpose, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(t.name, '') || ' ' || COALESCE(t.purpose, ''), t.batch_id, t.date FROM medications t WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.name, '') || ' ' || COALESCE(t.purpose, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+
+INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT t.id * 8 + 4, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.name, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(t.name, ''), t.batch_id, t.date FROM extra_expenses t WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.name, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+
+INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT t.id * 8 + 5, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(t.note, ''), t.batch_id, t.date FROM mortality t WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+
+INSERT INTO search_index (rowid, folded, body, batch_id, date) SELECT t.id * 8 + 6, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي'), COALESCE(t.note, ''), t.batch_id, t.date FROM sales t WHERE trim(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(COALESCE(t.note, ''), 'ً', ''), 'ٌ', ''), 'ٍ', ''), 'َ', ''), 'ُ', ''), 'ِ', ''), 'ّ', ''), 'ْ', ''), 'ٰ', ''), 'ـ', ''), 'أ', 'ا'), 'إ', 'ا'), 'آ', 'ا'), 'ٱ', 'ا'), 'ة', 'ه'), 'ى', 'ي')) != '';
+
+INSERT INTO search_index (search_index) VALUES ('optimize');
@@ -0,0 +1,241 @@
+"""Production launcher: pre-forked reader workers and one writer.
+
+    python serve.py --workers 4 --port 5000
+
+The master binds the port, prepares the databases and forks. Readers share the
+listening socket and serve requests on threads; every writing request is handed
+to the single writer process over a unix socket (see WRITER_SOCKET in app.py),
+which serves one request at a time.
+
+The master never imports the app, so `kill -HUP <master pid>` starts a new set
+of workers on the current code and then drains the old ones: requests already
+accepted are finished, new connections go to the new workers. The new writer
+binds its socket but waits until the old writer has drained, so there is never
+more than one writer; writes meanwhile queue on its socket. A writer whose
+socket does not appear fails the new generation. TERM or INT stops everything
+the same way.
+"""
+import argparse
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from werkzeug.serving import make_server
+
+STOP_TIMEOUT = 30
+# seconds a new writer has to import the app and bind its socket
+WRITER_START_TIMEOUT = 10
+
+
+def log(message):
+    print(f"[serve {os.getpid()}] {message}", file=sys.stderr, flush=True)
+
+
+def prepare():
+    import app as app_module
+
+    for path in app_module.database_paths():
+        app_module.init_db(path)
+    app_module.warm_templates()
+
+
+def run_worker(role, listen_fd, writer_socket, args, resume, standby=False):
+    # WRITER_SOCKET is read when app.py is imported, so it goes in first
+    if role == "reader":
+        os.environ["WRITER_SOCKET"] = writer_socket
+    import app as app_module
+
+    if role == "writer":
+        if standby:
+            # blocked before the socket exists: the master only sends USR1 once it sees the socket
+            signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGUSR1})
+        server = make_server("unix://" + writer_socket, 0, app_module.app, threaded=False)
+        if standby:
+            # bound, so readers can already queue writes; jobs and requests wait for the old writer to go
+            signal.sigwait({signal.SIGUSR1})
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGUSR1})
+        if resume:
+            for path in app_module.database_paths():
+                app_module.resume_jobs(path)
+        app_module.start_snapshot_scheduler()
+    else:
+        server = make_server(args.host, args.port, app_module.app, threaded=True, fd=listen_fd)
+    # on TERM: stop accepting, then wait for the requests already being served
+    server.daemon_threads = False
+    server.block_on_close = True
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    server.serve_forever()
+    server.server_close()
+    # background jobs run on the writer; let them finish before the process goes
+    if app_module._job_executor is not None:
+        app_module._job_executor.shutdown(wait=True)
+
+
+class Master:
+    def __init__(self, args):
+        self.args = args
+        self.sock = socket.create_server((args.host, args.port), backlog=args.backlog)
+        self.runtime = tempfile.mkdtemp(prefix="poultry-serve-")
+        self.generation = 0
+        # pid -> (generation, role, writer socket, started at)
+        self.workers = {}
+        self.pending = []
+
+    def fork(self, target, *params):
+        pid = os.fork()
+        if pid:
+            return pid
+        # the terminal's INT and HUP are for the master; it stops workers in order
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            target(*params)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def spawn(self, role, writer_socket, resume=False, standby=False):
+        pid = self.fork(run_worker, role, self.sock.fileno(), writer_socket, self.args, resume, standby)
+        self.workers[pid] = (self.generation, role, writer_socket, time.monotonic())
+        return pid
+
+    def start_writer(self, writer_socket, resume, standby):
+        # the writer's pid once its socket is there, None if it exited or ran out of time first
+        pid = self.spawn("writer", writer_socket, resume, standby)
+        deadline = time.monotonic() + WRITER_START_TIMEOUT
+        while not os.path.exists(writer_socket):
+            if os.waitpid(pid, os.WNOHANG)[0]:
+                self.workers.pop(pid, None)
+                return None
+            if time.monotonic() > deadline:
+                self.stop([pid])
+                return None
+            time.sleep(0.05)
+        return pid
+
+    def start_generation(self, resume, standby=False):
+        # the new writer's pid, or None when the generation failed and nothing of it is left running
+        pid = self.fork(prepare)
+        if os.waitpid(pid, 0)[1] != 0:
+            log("preparing the databases failed")
+            return None
+        self.generation += 1
+        writer_socket = os.path.join(self.runtime, f"writer-{self.generation}.sock")
+        writer = self.start_writer(writer_socket, resume, standby)
+        if writer is None:
+            log(f"generation {self.generation}: the writer did not open {writer_socket}")
+            if os.path.exists(writer_socket):
+                os.unlink(writer_socket)
+            self.generation -= 1
+            return None
+        for _ in range(self.args.workers):
+            self.spawn("reader", writer_socket)
+        log(f"generation {self.generation}: writer and {self.args.workers} readers on {self.args.host}:{self.args.port}")
+        return writer
+
+    def stop(self, pids):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + STOP_TIMEOUT
+        waiting = set(pids)
+        while waiting:
+            for pid in list(waiting):
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    waiting.discard(pid)
+                    self.workers.pop(pid, None)
+            if waiting and time.monotonic() > deadline:
+                for pid in waiting:
+                    os.kill(pid, signal.SIGKILL)
+                deadline = float("inf")
+            time.sleep(0.05)
+
+    def stop_generation(self, generations):
+        # readers first: they may still be handing writes to their writer
+        mine = [(pid, w) for pid, w in self.workers.items() if w[0] in generations]
+        self.stop([pid for pid, w in mine if w[1] == "reader"])
+        self.stop([pid for pid, w in mine if w[1] == "writer"])
+
+    def reload(self):
+        old = {w[0] for w in self.workers.values()}
+        writer = self.start_generation(resume=False, standby=True)
+        if writer is None:
+            log("reload failed, the old workers keep serving")
+            return
+        # the old writer finishes its requests and jobs before the new one takes over
+        self.stop_generation(old)
+        try:
+            os.kill(writer, signal.SIGUSR1)
+        except ProcessLookupError:
+            pass
+        for gen in old:
+            path = os.path.join(self.runtime, f"writer-{gen}.sock")
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            generation, role, writer_socket, started = worker
+            if generation != self.generation:
+                continue
+            log(f"{role} {pid} exited with status {status}, starting another")
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            self.spawn(role, writer_socket)
+
+    def run(self):
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self.pending.append(signum))
+        if self.start_generation(resume=True) is None:
+            return 1
+        try:
+            while True:
+                while self.pending:
+                    signum = self.pending.pop(0)
+                    if signum == signal.SIGHUP:
+                        log("reloading")
+                        self.reload()
+                    else:
+                        log("stopping")
+                        return 0
+                self.reap()
+                time.sleep(0.2)
+        finally:
+            self.stop_generation({w[0] for w in self.workers.values()})
+            self.sock.close()
+            shutil.rmtree(self.runtime, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="reader processes")
+    parser.add_argument("--backlog", type=int, default=128)
+    args = parser.parse_args()
+    sys.exit(Master(args).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# read once when app is imported; every test then points DB_PATH at its own directory
+os.environ.update(
+    DB_PATH=os.path.join(tempfile.mkdtemp(prefix="poultry-tests-"), "farm.db"),
+    ARCHIVE_PATH="", FARMS_DIR="", WRITER_SOCKET="", SNAPSHOT_INTERVAL="0",
+)
+
+import app as app_module  # noqa: E402
+from bench.generate import build  # noqa: E402
+
+
+def _reset(module):
+    with module._job_executor_lock:
+        if module._job_executor is not None:
+            module._job_executor.shutdown(wait=True)
+        module._job_executor = None
+    with module._pools_lock:
+        for pool in module._pools.values():
+            pool.close_all()
+        module._pools.clear()
+    module._initialized.clear()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app module on an empty database in tmp_path."""
+    path = str(tmp_path / "farm.db")
+    monkeypatch.setitem(app_module.app.config, "DB_PATH", path)
+    monkeypatch.setitem(app_module.app.config, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setitem(app_module.app.config, "JOB_UPLOAD_DIR", str(tmp_path / "jobs"))
+    app_module.init_db(path)
+    yield app_module
+    _reset(app_module)
+
+
+@pytest.fixture
+def farm(app):
+    """The app module on a small generated farm."""
+    build(app.app.config["DB_PATH"], 12, seed=3)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
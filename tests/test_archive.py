@@ -0,0 +1,72 @@
+import csv
+import io
+
+
+def deletes_logged(conn):
+    return conn.execute("SELECT COUNT(*) FROM changes WHERE op = 'd'").fetchone()[0]
+
+
+def export_rows(client, url):
+    return list(csv.DictReader(io.StringIO(client.get(url).get_data(as_text=True).lstrip("\ufeff"))))
+
+
+def archive(app, *batch_ids):
+    conn = app.connect_db(app.app.config["DB_PATH"])
+    with conn:
+        conn.executemany("UPDATE batches SET is_completed = 1 WHERE id = ?", [(b,) for b in batch_ids])
+    for batch_id in batch_ids:
+        assert app.archive_batch(conn, batch_id)
+    return conn
+
+
+def test_archiving_is_not_logged_as_deletes(farm):
+    conn = farm.connect_db(farm.app.config["DB_PATH"])
+    before = deletes_logged(conn)
+    conn.close()
+    conn = archive(farm, 1)
+    assert deletes_logged(conn) == before
+    assert conn.execute("SELECT COUNT(*) FROM archive_moves").fetchone()[0] == 0
+    # a real delete still is
+    with conn:
+        conn.execute("DELETE FROM feed WHERE id = (SELECT MIN(id) FROM feed)")
+    assert deletes_logged(conn) == before + 1
+    conn.close()
+
+
+def test_archive_totals_follow_each_move(farm):
+    conn = archive(farm, 1, 2, 3)
+    assert farm.restore_batch(conn, 2)
+    moved = tuple(conn.execute("SELECT batches, chicks, expenses, revenue FROM archive.archive_totals").fetchone())
+    with conn:
+        conn.execute(farm.ARCHIVE_TOTALS_REFRESH)
+    recounted = tuple(conn.execute("SELECT batches, chicks, expenses, revenue FROM archive.archive_totals").fetchone())
+    conn.close()
+    assert moved[:2] == recounted[:2] == (2, moved[1])
+    assert all(abs(a - b) < 1e-6 for a, b in zip(moved[2:], recounted[2:]))
+
+
+def test_exports_and_analytics_include_archived_batches(farm):
+    conn = archive(farm, 1)
+    feed_rows = conn.execute("SELECT COUNT(*) FROM archive.feed WHERE batch_id = 1").fetchone()[0]
+    conn.close()
+    assert feed_rows
+    client = farm.app.test_client()
+
+    rows = export_rows(client, "/export/feed.csv")
+    assert sum(r["batch_id"] == "1" for r in rows) == feed_rows
+    assert len(export_rows(client, "/batch/1/export/feed.csv")) == feed_rows
+
+    analytics = client.get("/api/v1/analytics").get_json()
+    assert 1 in {b["id"] for b in analytics["batches"]}
+    assert "1" in analytics["mortality_curves"]
+
+
+def test_api_reads_archived_batches(farm):
+    client = farm.app.test_client()
+    before = client.get("/api/v1/batches/1/feed?limit=500").get_json()
+    assert before["rows"]
+    archive(farm, 1).close()
+
+    assert client.get("/api/v1/batches/1").get_json()["id"] == 1
+    assert client.get("/api/v1/batches/1/feed?limit=500").get_json() == before
+    assert client.get("/api/v1/batches/999/feed").status_code == 404
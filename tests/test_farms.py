@@ -0,0 +1,44 @@
+import re
+from collections import OrderedDict
+
+import pytest
+
+from bench.generate import build
+
+
+@pytest.fixture
+def farms(app, tmp_path, monkeypatch):
+    """Two farms built from the same seed, so their databases match row for row."""
+    (tmp_path / "farms").mkdir()
+    monkeypatch.setitem(app.app.config, "FARMS_DIR", str(tmp_path / "farms"))
+    monkeypatch.setitem(app.app.config, "FARM_DOMAIN", "farms.test")
+    for name in ("a", "b"):
+        build(app.farm_path(name), 4, seed=5)
+    return app
+
+
+def edit_links(response):
+    assert response.status_code == 200
+    return set(re.findall(r'href="([^"]*/feed/edit/[^"]*)"', response.get_data(as_text=True)))
+
+
+def test_tab_fragments_follow_the_farm_url(farms):
+    client = farms.app.test_client()
+    by_prefix = {farm: edit_links(client.get(f"/f/{farm}/batch/1?tab=feed")) for farm in ("a", "b")}
+    by_host = edit_links(client.get("/batch/1?tab=feed", base_url="http://a.farms.test"))
+    fragment = edit_links(client.get("/f/b/batch/1/tab/feed"))
+
+    assert by_prefix["a"] and all(link.startswith("/f/a/") for link in by_prefix["a"])
+    assert by_prefix["b"] and all(link.startswith("/f/b/") for link in by_prefix["b"])
+    assert by_host and all(link.startswith("/feed/edit/") for link in by_host)
+    assert fragment and all(link.startswith("/f/b/") for link in fragment)
+
+
+def test_dashboard_cache_keeps_at_most_max_tenants_farms(farms, monkeypatch):
+    build(farms.farm_path("c"), 2, seed=5)
+    monkeypatch.setitem(farms.app.config, "DB_MAX_TENANTS", 2)
+    monkeypatch.setattr(farms, "_dashboard_cache", OrderedDict())
+    client = farms.app.test_client()
+    for farm in ("a", "b", "c", "b"):
+        assert client.get(f"/f/{farm}/").status_code == 200
+    assert list(farms._dashboard_cache) == [farms.farm_path("c"), farms.farm_path("b")]
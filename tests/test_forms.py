@@ -0,0 +1,105 @@
+import pytest
+
+from bench.routes import ADD_ENDPOINTS
+
+ERROR = "المدخلات غير صحيحة."
+
+
+def first_row(farm, table):
+    conn = farm.connect_db(farm.app.config["DB_PATH"])
+    row = dict(conn.execute(f"SELECT * FROM {table} ORDER BY id LIMIT 1").fetchone())
+    conn.close()
+    return row
+
+
+def form(row):
+    return {k: "" if v is None else str(v) for k, v in row.items()}
+
+
+@pytest.mark.parametrize("table", ADD_ENDPOINTS)
+def test_edit_stores_parsed_date(farm, table):
+    row = first_row(farm, table)
+    edit = ADD_ENDPOINTS[table][1]
+    client = farm.app.test_client()
+    with farm.app.test_request_context():
+        url = farm.url_for(edit, id=row["id"], batch_id=row["batch_id"])
+    response = client.post(url, data=dict(form(row), date="٠٣/٠٢/٢٠٢٦"))
+    assert response.status_code == 302
+    assert first_row(farm, table)["date"] == "2026-02-03"
+
+
+@pytest.mark.parametrize("table", ADD_ENDPOINTS)
+def test_edit_rejects_bad_input(farm, table):
+    row = first_row(farm, table)
+    edit = ADD_ENDPOINTS[table][1]
+    client = farm.app.test_client()
+    with farm.app.test_request_context():
+        url = farm.url_for(edit, id=row["id"], batch_id=row["batch_id"])
+    response = client.post(url, data=dict(form(row), date="قريبا"))
+    assert response.status_code == 400
+    assert ERROR in response.get_data(as_text=True)
+    assert first_row(farm, table) == row
+
+
+@pytest.mark.parametrize("table", ADD_ENDPOINTS)
+def test_add_rejects_bad_input(farm, table):
+    add = ADD_ENDPOINTS[table][0]
+    client = farm.app.test_client()
+    with farm.app.test_request_context():
+        url = farm.url_for(add, batch_id=1)
+    response = client.post(url, data={"date": "2026-02-30"})
+    assert response.status_code == 400
+    assert ERROR in response.get_data(as_text=True)
+
+
+def test_batch_forms_reject_bad_input(farm):
+    client = farm.app.test_client()
+    response = client.post("/batches/add", data={"name": "ج", "breed": "روس", "start_date": "2026-01-01"})
+    assert response.status_code == 400
+    assert ERROR in response.get_data(as_text=True)
+    response = client.post("/batch/edit/1", data={"name": "ج", "breed": "روس", "start_date": "أمس"})
+    assert response.status_code == 400
+    assert ERROR in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize("table", ADD_ENDPOINTS)
+def test_add_for_unknown_batch_is_not_found(farm, table):
+    add = ADD_ENDPOINTS[table][0]
+    client = farm.app.test_client()
+    with farm.app.test_request_context():
+        url = farm.url_for(add, batch_id=999)
+    assert client.get(url).status_code == 404
+    response = client.post(url, data=dict(form(first_row(farm, table)), date="2026-02-03"))
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("table", ADD_ENDPOINTS)
+def test_add_for_a_batch_gone_since_the_lookup(farm, table, monkeypatch):
+    # the foreign key turns the row away; the form shows the error instead of a 500
+    monkeypatch.setattr(farm, "require_batch", lambda batch_id: None)
+    add = ADD_ENDPOINTS[table][0]
+    client = farm.app.test_client()
+    with farm.app.test_request_context():
+        url = farm.url_for(add, batch_id=999)
+    response = client.post(url, data=dict(form(first_row(farm, table)), date="2026-02-03"))
+    assert response.status_code == 400
+    assert ERROR in response.get_data(as_text=True)
+
+
+def test_import_skips_rows_of_a_batch_deleted_during_the_import(farm):
+    conn = farm.connect_db(farm.app.config["DB_PATH"])
+    with conn:
+        gone = conn.execute(
+            "INSERT INTO batches (name, breed, start_date, initial_count) VALUES ('م', 'روس', '2026-01-01', 10)"
+        ).lastrowid
+
+    def rows():
+        yield 1, {"batch_id": gone, "date": "2026-01-02", "count": 1}
+        with conn:
+            conn.execute("DELETE FROM batches WHERE id = ?", (gone,))
+        yield 2, {"batch_id": 1, "date": "2026-01-02", "count": 1}
+
+    report = farm.import_records(conn, "mortality", rows())
+    conn.close()
+    assert report["inserted"] == 1
+    assert report["errors"] == [{"line": 1, "error": f"unknown batch {gone}"}]
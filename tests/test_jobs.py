@@ -0,0 +1,70 @@
+import io
+import json
+import os
+
+
+def spool(app, name):
+    upload_dir = app.job_upload_dir(app.app.config["DB_PATH"])
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, name)
+    with open(path, "w") as fh:
+        fh.write('{"date": "2026-01-02", "count": 3}\n')
+    return path
+
+
+def add_job(app, kind, status, **params):
+    conn = app.connect_db(app.app.config["DB_PATH"])
+    with conn:
+        job_id = conn.execute(
+            "INSERT INTO jobs (kind, params, status) VALUES (?, ?, ?)", (kind, json.dumps(params), status)
+        ).lastrowid
+    conn.close()
+    return job_id
+
+
+def job(app, job_id):
+    conn = app.connect_db(app.app.config["DB_PATH"])
+    status = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+    conn.close()
+    return status
+
+
+def test_background_import_removes_its_upload(farm):
+    client = farm.app.test_client()
+    body = io.BytesIO(b'{"date": "2026-01-02", "count": 3}\n')
+    response = client.post(
+        "/import?table=mortality&batch_id=1&background=1", data=body, content_type="application/x-ndjson"
+    )
+    assert response.status_code == 202
+    farm.job_executor().shutdown(wait=True)
+    assert job(farm, response.get_json()["id"]) == "done"
+    assert os.listdir(farm.job_upload_dir(farm.app.config["DB_PATH"])) == []
+
+
+def test_failed_import_removes_its_upload(app):
+    path = spool(app, "bad.jsonl")
+    job_id = add_job(app, "import_records", "queued", table="no_such_table", path=path, format="jsonl")
+    app.run_job(app.app.config["DB_PATH"], job_id)
+    assert job(app, job_id) == "failed"
+    assert not os.path.exists(path)
+
+
+def test_resume_removes_interrupted_and_orphaned_uploads(app):
+    interrupted = spool(app, "interrupted.jsonl")
+    orphan = spool(app, "orphan.jsonl")
+    job_id = add_job(app, "import_records", "running", table="mortality", path=interrupted, format="jsonl", batch_id=1)
+    assert app.resume_jobs() == 0
+    assert job(app, job_id) == "failed"
+    assert not os.path.exists(interrupted)
+    assert not os.path.exists(orphan)
+
+
+def test_sweep_keeps_pending_uploads(app):
+    path = spool(app, "pending.jsonl")
+    orphan = spool(app, "orphan.jsonl")
+    add_job(app, "import_records", "queued", table="mortality", path=path, format="jsonl", batch_id=1)
+    conn = app.connect_db(app.app.config["DB_PATH"])
+    assert app.sweep_job_uploads(conn, app.app.config["DB_PATH"]) == 1
+    conn.close()
+    assert os.path.exists(path)
+    assert not os.path.exists(orphan)
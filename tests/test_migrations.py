@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA_SQL = "SELECT type, name, tbl_name, sql FROM {schema}.sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name"
+TRIGGERS_SQL = "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name"
+# a step that has shipped is never edited
+SHIPPED = {
+    "0001_create_ledgers.sql": "50c8bd5084742e61",
+    "0002_create_batch_totals.sql": "c8a4ea976e5e95a0",
+    "0003_create_growth.sql": "5bfedc31ec09ca8c",
+    "0004_create_table_versions.sql": "9a33cb45b76db5cb",
+    "0005_create_jobs.sql": "94262408328d69fa",
+    "0006_create_changes.sql": "81ba42f671d0748a",
+    "0007_create_search_index.sql": "8f52efa7e3a573dc",
+    "0008_create_period_totals.sql": "321a064eac90d137",
+    "0009_create_forecasts.sql": "c0cf7d75b38304d8",
+    "0010_queue_forecast_refits.sql": "52698055bb7ba9ca",
+    "0011_quiet_archive_moves.sql": "1ebf6b4709e115c4",
+    "0012_keep_search_text.sql": "f78bdc1c3e133703",
+}
+
+
+def schema(app, path):
+    conn = app.connect_db(path)
+    found = {s: [tuple(r) for r in conn.execute(SCHEMA_SQL.format(schema=s))] for s in ("main", "archive")}
+    versions = [conn.execute(f"PRAGMA {s}.user_version").fetchone()[0] for s in ("main", "archive")]
+    conn.close()
+    return found, versions
+
+
+def test_shipped_steps_are_not_edited(app):
+    files = sorted(os.listdir(app.MIGRATIONS_DIR))
+    assert files == [f"{i:04d}_{fn.__name__}.sql" for i, fn in enumerate(app.MIGRATIONS, 1)]
+    for name, digest in SHIPPED.items():
+        with open(os.path.join(app.MIGRATIONS_DIR, name), "rb") as fh:
+            assert hashlib.sha256(fh.read()).hexdigest()[:16] == digest, name
+
+
+def test_steps_one_at_a_time_match_init_db(app, tmp_path, monkeypatch):
+    path = str(tmp_path / "stepped.db")
+    steps = list(app.MIGRATIONS)
+    migrate_archive = app.migrate_archive
+    for count in range(1, len(steps) + 1):
+        monkeypatch.setattr(app, "MIGRATIONS", steps[:count])
+        # the archive copies main's tables as they are at the latest version
+        monkeypatch.setattr(app, "migrate_archive", migrate_archive if count == len(steps) else lambda c: None)
+        conn = app.connect_db(path)
+        assert app.migrate(conn) == 1
+        conn.close()
+    assert schema(app, path) == schema(app, app.app.config["DB_PATH"])
+
+
+def test_legacy_database_matches_init_db(farm, tmp_path):
+    # the current tables with user_version 0, like a database from before the versions
+    path = farm.app.config["DB_PATH"]
+    fresh = schema(farm, path)
+    conn = farm.connect_db(path)
+    conn.execute("PRAGMA user_version = 0")
+    conn.execute("PRAGMA archive.user_version = 0")
+    conn.close()
+    farm.init_db(path)
+    assert schema(farm, path) == fresh
+    conn = farm.connect_db(path)
+    assert farm.verify_batch_totals(conn) == []
+    assert farm.search_records(conn, "ross")[1] > 0
+    conn.close()
+
+
+def test_trigger_helpers_match_the_steps(app):
+    # a helper edited without a new step would build triggers no migrated database has
+    conn = app.connect_db(app.app.config["DB_PATH"])
+    migrated = conn.execute(TRIGGERS_SQL).fetchall()
+    conn.execute("BEGIN")
+    c = conn.cursor()
+    for name, _ in migrated:
+        c.execute(f"DROP TRIGGER {name}")
+    app.create_totals_triggers(c)
+    app.create_growth_triggers(c)
+    app.create_version_triggers(c)
+    app.create_version_triggers(c, ("forecasts",))
+    app.create_change_triggers(c)
+    app.create_search_triggers(c)
+    app.create_period_triggers(c)
+    app.create_forecast_triggers(c)
+    helpers = conn.execute(TRIGGERS_SQL).fetchall()
+    conn.rollback()
+    conn.close()
+    assert [tuple(r) for r in helpers] == [tuple(r) for r in migrated]
+
+
+def test_migration_holds_up_only_its_own_database(app, tmp_path, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    migrate = app.migrate
+    slow = str(tmp_path / "slow.db")
+
+    def wait_then_migrate(conn):
+        if conn.execute("PRAGMA database_list").fetchone()["file"] == slow:
+            started.set()
+            release.wait(10)
+        return migrate(conn)
+
+    monkeypatch.setattr(app, "migrate", wait_then_migrate)
+    opening = threading.Thread(target=app.get_pool, args=(slow,))
+    opening.start()
+    try:
+        assert started.wait(10)
+        other = str(tmp_path / "other.db")
+        app.get_pool(other)
+        assert other in app._pools and slow not in app._pools
+    finally:
+        release.set()
+        opening.join()
+    assert slow in app._pools
+
+
+# runs in a fresh process: import time, then the first request, which opens the pool and checks the schema
+COLD_START = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+statements = []
+migrate = app.migrate
+
+def traced(conn):
+    conn.set_trace_callback(statements.append)
+    try:
+        return migrate(conn)
+    finally:
+        conn.set_trace_callback(None)
+
+app.migrate = traced
+response = app.app.test_client().get("/")
+done = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code, "statements": statements,
+    "import_ms": (imported - started) * 1000, "first_request_ms": (done - imported) * 1000,
+}))
+"""
+
+
+def test_cold_start_on_a_current_database(farm):
+    env = dict(os.environ, DB_PATH=farm.app.config["DB_PATH"], ARCHIVE_PATH="", FARMS_DIR="", WRITER_SOCKET="")
+    out = subprocess.run(
+        [sys.executable, "-c", COLD_START], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    started = json.loads(out.stdout)
+    print(f"cold start: import {started['import_ms']:.0f} ms, first request {started['first_request_ms']:.0f} ms")
+    assert started["status"] == 200
+    # the version of main and of the archive, nothing else
+    assert started["statements"] == ["PRAGMA user_version", "PRAGMA archive.user_version"]
+    assert started["import_ms"] + started["first_request_ms"] < 5000
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from bench.routes import Fixture, routes
+
+
+def analyzed(app, path=None):
+    # like check-plans: an analyzed database, so plans do not hinge on how much test data there is
+    conn = app.connect_db(path or app.app.config["DB_PATH"])
+    conn.execute("ANALYZE")
+    return conn
+
+
+def report(failures):
+    return "\n".join(f"{where}: {detail}\n    {sql}" for where, sql, detail in failures)
+
+
+def test_literal_and_module_queries(app):
+    conn = analyzed(app)
+    queries = app.collect_queries() + app.module_queries() + [("PLAN_QUERIES", sql) for sql in app.PLAN_QUERIES]
+    failures = app.check_query_plans(conn, queries)
+    conn.close()
+    assert not failures, report(failures)
+
+
+def test_trigger_statements(app):
+    conn = analyzed(app)
+    queries = app.trigger_queries(conn)
+    assert any(where == "trigger trg_feed_totals_ins" for where, _ in queries)
+    failures = app.check_query_plans(conn, queries)
+    conn.close()
+    assert not failures, report(failures)
+
+
+def test_statements_routes_run(farm, tmp_path, monkeypatch):
+    # catches SQL built in f-strings, which collect_queries cannot read
+    executed = set()
+    record_sql = farm._record_sql
+
+    def record(sql, elapsed, n):
+        # statements of requests and of the jobs they start, not the fixture's own lookups
+        in_request = getattr(farm._request_sql, "stats", None) is not None
+        if n and (in_request or threading.current_thread().name.startswith("job")):
+            executed.add(" ".join(sql.split()))
+        record_sql(sql, elapsed, n)
+
+    monkeypatch.setattr(farm, "_record_sql", record)
+    path = farm.app.config["DB_PATH"]
+    fixture = Fixture(farm, path, seed=3)
+    client = farm.app.test_client(use_cookies=False)
+    try:
+        for name, _, prepare in routes(fixture):
+            method, url, kwargs = prepare()
+            response = client.open(url, method=method, **kwargs)
+            response.get_data()
+            assert response.status_code < 400, name
+            response.close()
+        farm.job_executor().shutdown(wait=True)
+    finally:
+        fixture.conn.close()
+
+    empty = str(tmp_path / "plans.db")
+    farm.init_db(empty)
+    conn = analyzed(farm, empty)
+    queries = sorted(
+        ("executed", sql) for sql in executed if sql.split(" ", 1)[0].upper() in farm.PLAN_STATEMENTS
+    )
+    assert len(queries) > 100
+    failures = farm.check_query_plans(conn, queries)
+    conn.close()
+    assert not failures, report(failures)
+
+
+def test_allowed_scans_are_reviewed(app, monkeypatch):
+    allowed = dict(app.PLAN_SCAN_ALLOWED)
+    assert all(reason.strip() for reason in allowed.values())
+    # an entry whose query stopped scanning should be dropped, not kept around
+    monkeypatch.setattr(app, "PLAN_SCAN_ALLOWED", {})
+    conn = analyzed(app)
+    for sql in allowed:
+        assert app.check_query_plans(conn, [("allowed", sql)]), sql
+    conn.close()
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM feed WHERE quantity > ?",
+    "SELECT batch_id, SUM(total_price) FROM sales GROUP BY quantity",
+])
+def test_scans_fail(app, sql):
+    conn = analyzed(app)
+    assert app.check_query_plans(conn, [("test", sql)])
+    conn.close()
@@ -0,0 +1,42 @@
+def add_sale_note(app, note):
+    conn = app.connect_db(app.app.config["DB_PATH"])
+    with conn:
+        batch_id = conn.execute(
+            "INSERT INTO batches (name, breed, start_date, initial_count) VALUES ('دفعة', 'روس', '2026-01-01', 100)"
+        ).lastrowid
+        conn.execute(
+            "INSERT INTO sales (batch_id, date, quantity, total_price, note) VALUES (?, '2026-02-01', 1, 1, ?)",
+            (batch_id, note),
+        )
+    conn.close()
+
+
+def search(app, q):
+    conn = app.connect_db(app.app.config["DB_PATH"])
+    results, _ = app.search_records(conn, q)
+    conn.close()
+    return [r["snippet"] for r in results]
+
+
+def test_search_keeps_the_article(app):
+    add_sale_note(app, "بيع للشركة الوطنيّة")
+    add_sale_note(app, "تاجر وطني")
+    add_sale_note(app, "سوق الوطن")
+    assert search(app, "الوطنية") == ["بيع للشركة \x02الوطنيّة\x03"]
+
+
+def test_snippet_shows_the_text_as_written(app):
+    add_sale_note(app, "دفعةٌ مُمتازة إلى مؤسسة الأمل")
+    assert search(app, "ممتازه") == ["دفعةٌ \x02مُمتازة\x03 إلى مؤسسة الأمل"]
+    assert search(app, "امل") == []
+    assert search(app, "الامل") == ["دفعةٌ مُمتازة إلى مؤسسة \x02الأمل\x03"]
+
+
+def test_snippet_is_cut_around_the_match(app):
+    words = [f"كلمة{i}" for i in range(40)]
+    words[20] = "علف"
+    add_sale_note(app, " ".join(words))
+    (snippet,) = search(app, "علف")
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert "\x02علف\x03" in snippet
+    assert len(snippet.strip("…").split()) == app.SNIPPET_WORDS
@@ -0,0 +1,41 @@
+import sqlite3
+
+
+def batches(snapshot, schema):
+    conn = sqlite3.connect(snapshot)
+    conn.execute("ATTACH DATABASE ? AS archive", (snapshot[:-3] + ".archive.db",))
+    ids = {r[0] for r in conn.execute(f"SELECT id FROM {schema}.batches")}
+    totals = conn.execute("SELECT batches FROM archive.archive_totals").fetchone()[0]
+    conn.close()
+    return ids, totals
+
+
+def test_snapshot_copies_main_and_archive_of_one_moment(farm, monkeypatch):
+    # a batch archived between the archive copy and the main copy is in one of them, not neither
+    path = farm.app.config["DB_PATH"]
+    writer = farm.connect_db(path)
+    with writer:
+        writer.execute("UPDATE batches SET is_completed = 1 WHERE id = 1")
+    backup_schema = farm.backup_schema
+
+    def archive_between_copies(conn, out, schema):
+        restarts = backup_schema(conn, out, schema)
+        if schema == "archive":
+            assert farm.archive_batch(writer, 1)
+        return restarts
+
+    monkeypatch.setattr(farm, "backup_schema", archive_between_copies)
+    source = farm.connect_db(path)
+    result = farm.take_snapshot(source)
+    assert not source.in_transaction
+    source.close()
+    assert writer.execute("SELECT COUNT(*) FROM archive.batches WHERE id = 1").fetchone()[0] == 1
+    writer.close()
+
+    snapshot = farm.list_snapshots(path)[0]
+    assert snapshot.endswith(result["snapshot"])
+    main, _ = batches(snapshot, "main")
+    archived, archived_total = batches(snapshot, "archive")
+    assert 1 in main and 1 not in archived
+    assert len(main) + len(archived) == 12
+    assert archived_total == len(archived)